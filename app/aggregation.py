@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import numpy as np
+
+from app.metrics import stage
+from app.scoring import SignalSummary
+from app.telemetry_store import DeviceSeries
+
+BACKENDS = ("python", "numpy")
+HEAVY_CATEGORIES = frozenset({"CAD", "ML", "VIDEO", "IDE", "BI"})
+DEFAULT_VRAM_MB = 8192.0
+SAMPLE_MINUTES = 5
+
+_P95_COLUMNS = ("gpu_util", "cpu_util", "ram_used", "disk_latency", "disk_queue")
+
+
+def p95_rank(n: int) -> int:
+    return int(0.95 * (n - 1))
+
+
+def light_app_mix(app_minutes: dict[str, int]) -> float:
+    total_app_minutes = sum(app_minutes.values()) or 1
+    heavy_minutes = sum(m for c, m in app_minutes.items() if c in HEAVY_CATEGORIES)
+    return max(0.0, min(1.0, 1 - heavy_minutes / total_app_minutes))
+
+
+def summarize_device_python(series: DeviceSeries) -> SignalSummary:
+    rank = p95_rank(len(series))
+    vram_p95_mb = sorted(series.vram_used_mb)[rank]
+    return SignalSummary(
+        gpu_util_p95=sorted(series.gpu_util)[rank],
+        vram_used_p95_pct=min(100.0, vram_p95_mb / DEFAULT_VRAM_MB * 100.0),
+        cpu_util_p95=sorted(series.cpu_util)[rank],
+        ram_used_p95=sorted(series.ram_used)[rank],
+        paging_pressure_minutes=sum(series.paging_pressure),
+        disk_latency_p95_ms=sorted(series.disk_latency)[rank],
+        disk_busy_minutes=sum((x / 100.0) * SAMPLE_MINUTES for x in series.disk_busy),
+        disk_queue_p95=sorted(series.disk_queue)[rank],
+        thermal_throttle_events=sum(series.throttle),
+        active_minutes=sum(series.gpu_active_minutes),
+        light_app_mix_factor=light_app_mix(series.app_minutes),
+        vram_used_p95_mb=vram_p95_mb,
+    )
+
+
+def _grouped(devices: list[DeviceSeries], name: str, dtype: type) -> np.ndarray:
+    return np.concatenate([np.frombuffer(getattr(s, name), dtype=dtype) for s in devices])
+
+
+def _grouped_p95(values: np.ndarray, group_ids: np.ndarray, picks: np.ndarray) -> list[float]:
+    order = np.lexsort((values, group_ids))
+    return values[order[picks]].tolist()
+
+
+def summarize_devices_numpy(devices: list[DeviceSeries]) -> list[SignalSummary]:
+    counts = np.fromiter((len(s) for s in devices), dtype=np.int64, count=len(devices))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    group_ids = np.repeat(np.arange(len(devices)), counts)
+    picks = starts + (0.95 * (counts - 1)).astype(np.int64)
+
+    p95 = {name: _grouped_p95(_grouped(devices, name, np.float64), group_ids, picks) for name in _P95_COLUMNS}
+    vram_p95_mb = _grouped_p95(_grouped(devices, "vram_used_mb", np.float64), group_ids, picks)
+
+    paging = np.add.reduceat(_grouped(devices, "paging_pressure", np.int64), starts).tolist()
+    active = np.add.reduceat(_grouped(devices, "gpu_active_minutes", np.int64), starts).tolist()
+    throttle = np.add.reduceat(_grouped(devices, "throttle", np.int8).astype(np.int64), starts).tolist()
+    # Float sums stay in Python so results match the sequential reference bit for bit.
+    busy = ((_grouped(devices, "disk_busy", np.float64) / 100.0) * SAMPLE_MINUTES).tolist()
+    bounds = np.append(starts, len(busy)).tolist()
+
+    return [
+        SignalSummary(
+            gpu_util_p95=p95["gpu_util"][i],
+            vram_used_p95_pct=min(100.0, vram_p95_mb[i] / DEFAULT_VRAM_MB * 100.0),
+            cpu_util_p95=p95["cpu_util"][i],
+            ram_used_p95=p95["ram_used"][i],
+            paging_pressure_minutes=paging[i],
+            disk_latency_p95_ms=p95["disk_latency"][i],
+            disk_busy_minutes=sum(busy[bounds[i] : bounds[i + 1]]),
+            disk_queue_p95=p95["disk_queue"][i],
+            thermal_throttle_events=throttle[i],
+            active_minutes=active[i],
+            light_app_mix_factor=light_app_mix(s.app_minutes),
+            vram_used_p95_mb=vram_p95_mb[i],
+        )
+        for i, s in enumerate(devices)
+    ]
+
+
+def summarize_devices(devices: dict[str, DeviceSeries], backend: str = "numpy") -> dict[str, SignalSummary]:
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown aggregation backend: {backend}")
+    series = [s for s in devices.values() if len(s)]
+    if not series:
+        return {}
+    with stage("percentiles"):
+        if backend == "python":
+            return {s.device_key: summarize_device_python(s) for s in series}
+        return {s.device_key: summary for s, summary in zip(series, summarize_devices_numpy(series))}
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from array import array
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from app.schemas import CapabilityBatchIn, CapabilitySnapshot
+from app.scoring import SignalArrays
+
+CapabilityListener = Callable[[str, set[str]], None]
+
+
+@dataclass
+class DeviceCapabilities:
+    """Hardware columns aligned with a list of device keys; NaN where no snapshot is known."""
+
+    vram_gb: np.ndarray
+    ram_gb: np.ndarray
+    cores: np.ndarray
+
+    @property
+    def known(self) -> np.ndarray:
+        return ~np.isnan(self.cores)
+
+
+class _TenantCapabilities:
+    __slots__ = ("rows", "snapshots", "vram_gb", "ram_gb", "cores")
+
+    def __init__(self) -> None:
+        self.rows: dict[str, int] = {}
+        self.snapshots: list[CapabilitySnapshot] = []
+        self.vram_gb = array("d")
+        self.ram_gb = array("d")
+        self.cores = array("d")
+
+    def put(self, snapshot: CapabilitySnapshot) -> bool:
+        row = self.rows.get(snapshot.device_key)
+        if row is None:
+            self.rows[snapshot.device_key] = len(self.snapshots)
+            self.snapshots.append(snapshot)
+            self.vram_gb.append(snapshot.gpu.vram_gb)
+            self.ram_gb.append(snapshot.ram_gb)
+            self.cores.append(snapshot.cpu.cores)
+            return True
+        if snapshot.captured_at < self.snapshots[row].captured_at:
+            return False
+        self.snapshots[row] = snapshot
+        self.vram_gb[row] = snapshot.gpu.vram_gb
+        self.ram_gb[row] = snapshot.ram_gb
+        self.cores[row] = snapshot.cpu.cores
+        return True
+
+
+class CapabilityIndex:
+    """Latest snapshot per device by `captured_at`; older snapshots are dropped on arrival.
+
+    Hardware fields are also kept as per-tenant columns so `columns` joins a whole tenant with one
+    gather instead of a model lookup per device.
+    """
+
+    def __init__(self) -> None:
+        self._tenants: dict[str, _TenantCapabilities] = {}
+        self._listeners: list[CapabilityListener] = []
+
+    def subscribe(self, listener: CapabilityListener) -> None:
+        self._listeners.append(listener)
+
+    def add_batch(self, payload: CapabilityBatchIn) -> int:
+        tenant = self._tenants.setdefault(payload.tenant_id, _TenantCapabilities())
+        changed = {s.device_key for s in payload.snapshots if tenant.put(s)}
+        if changed:
+            for listener in self._listeners:
+                listener(payload.tenant_id, changed)
+        return len(payload.snapshots)
+
+    def get(self, tenant_id: str, device_key: str) -> CapabilitySnapshot | None:
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            return None
+        row = tenant.rows.get(device_key)
+        return None if row is None else tenant.snapshots[row]
+
+    def columns(self, tenant_id: str, device_keys: Sequence[str]) -> DeviceCapabilities:
+        tenant = self._tenants.get(tenant_id) or _TenantCapabilities()
+        rows = tenant.rows
+        index = np.fromiter((rows.get(k, -1) for k in device_keys), dtype=np.int64, count=len(device_keys))
+        missing = index < 0
+        index[missing] = 0
+
+        def gather(values: array) -> np.ndarray:
+            if not len(values):
+                return np.full(len(device_keys), np.nan)
+            gathered = np.frombuffer(values, dtype=np.float64)[index]
+            gathered[missing] = np.nan
+            return gathered
+
+        return DeviceCapabilities(gather(tenant.vram_gb), gather(tenant.ram_gb), gather(tenant.cores))
+
+
+def apply_vram(signals: SignalArrays, capabilities: DeviceCapabilities | None) -> SignalArrays:
+    """Re-expresses VRAM use against each device's real VRAM where a snapshot reports one.
+
+    Devices without a snapshot, or with no dedicated VRAM, keep the default-denominator percentage.
+    """
+    if capabilities is None:
+        return signals
+    vram_mb = capabilities.vram_gb * 1024.0
+    real = vram_mb > 0
+    if not real.any():
+        return signals
+    pct = np.minimum(100.0, signals.vram_used_p95_mb / np.where(real, vram_mb, 1.0) * 100.0)
+    return replace(signals, vram_used_p95_pct=np.where(real, pct, signals.vram_used_p95_pct))
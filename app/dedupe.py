@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import struct
+import sys
+import threading
+from collections.abc import Callable
+from datetime import UTC, date, datetime, timedelta
+
+import numpy as np
+
+from app.rollups import summary_date
+from app.schemas import TelemetryBatchIn, TelemetryRecord
+
+# Keys are the first 16 bytes of a SHA-256 digest; a collision among 10^12 keys has odds below 10^-14.
+KEY_DTYPE = np.dtype("S16")
+_TIMESTAMP = struct.Struct("<d")
+_HALVES = struct.Struct("<QQ")
+_U64 = (1 << 64) - 1
+
+
+def batch_key(tenant_id: str, source: str, batch_id: str) -> bytes:
+    return hashlib.sha256("\0".join((tenant_id, source, batch_id)).encode()).digest()[:16]
+
+
+def record_key(tenant_id: str, record: TelemetryRecord) -> bytes:
+    """Hash of (tenant, device_key, observed_at, metric payload); observed_at as a UTC timestamp."""
+    h = hashlib.sha256(tenant_id.encode() + b"\0")
+    h.update(record.model_dump_json(exclude={"observed_at"}).encode())
+    h.update(_TIMESTAMP.pack(record.observed_at.timestamp()))
+    return h.digest()[:16]
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, fp_rate: float = 0.01) -> None:
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2 / 8) * 8)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = np.zeros(self.size // 8, dtype=np.uint8)
+
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        # Keys are already uniform hashes: two 64-bit halves give k probes (Kirsch-Mitzenmacher).
+        halves = np.frombuffer(np.ascontiguousarray(keys, dtype=KEY_DTYPE).tobytes(), dtype="<u8").reshape(-1, 2)
+        steps = np.arange(self.hashes, dtype=np.uint64)[:, None]
+        return (halves[:, 0] + steps * (halves[:, 1] | np.uint64(1))) % np.uint64(self.size)
+
+    def add(self, keys: np.ndarray) -> None:
+        positions = self._positions(keys).ravel()
+        masks = np.left_shift(1, positions & np.uint64(7)).astype(np.uint8)
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), masks)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        positions = self._positions(keys)
+        return ((self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=0)
+
+    def contains_key(self, key: bytes) -> bool:
+        first, step = _HALVES.unpack(key.ljust(16, b"\0"))
+        step |= 1
+        bits = self.bits
+        for i in range(self.hashes):
+            position = ((first + i * step) & _U64) % self.size
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+
+class _Bucket:
+    __slots__ = ("keys", "pending", "bloom")
+
+    def __init__(self, bloom: BloomFilter | None) -> None:
+        self.keys = np.empty(0, dtype=KEY_DTYPE)
+        # Recent inserts, as bytes from `ndarray.tolist()` (trailing NULs stripped, same as lookups).
+        self.pending: set[bytes] = set()
+        self.bloom = bloom
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self.pending)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(keys), dtype=bool)
+        candidates = np.flatnonzero(self.bloom.contains(keys)) if self.bloom is not None else np.arange(len(keys))
+        if not len(candidates):
+            return found
+        query = keys[candidates]
+        if len(self.keys):
+            positions = np.searchsorted(self.keys, query).clip(max=len(self.keys) - 1)
+            found[candidates] = self.keys[positions] == query
+        if self.pending:
+            pending = self.pending
+            found[candidates] |= np.fromiter((k in pending for k in query.tolist()), dtype=bool, count=len(query))
+        return found
+
+    def contains_key(self, key: bytes) -> bool:
+        if self.bloom is not None and not self.bloom.contains_key(key):
+            return False
+        # Array elements come back with trailing NULs stripped, as pending entries do.
+        key = key.rstrip(b"\0")
+        if key in self.pending:
+            return True
+        position = int(np.searchsorted(self.keys, key))
+        return position < len(self.keys) and self.keys[position] == key
+
+    def insert(self, keys: np.ndarray, merge_every: int, fp_rate: float) -> None:
+        if self.bloom is not None:
+            self.bloom.add(keys)
+        self.pending.update(keys.tolist())
+        if len(self.pending) < merge_every:
+            return
+        recent = np.array(list(self.pending), dtype=KEY_DTYPE)
+        recent.sort()
+        merged = self.keys = np.insert(self.keys, np.searchsorted(self.keys, recent), recent)
+        self.pending = set()
+        if self.bloom is not None and len(merged) > self.bloom.capacity:
+            self.bloom = BloomFilter(2 * len(merged), fp_rate)
+            self.bloom.add(merged)
+
+    def discard(self, keys: np.ndarray) -> None:
+        # The Bloom filter keeps their bits; a lookup then just falls through to the exact check.
+        self.pending.difference_update(keys.tolist())
+        if len(self.keys):
+            self.keys = self.keys[~np.isin(self.keys, keys)]
+
+    def nbytes(self) -> int:
+        pending = sys.getsizeof(self.pending) + sum(sys.getsizeof(k) for k in self.pending)
+        return self.keys.nbytes + pending + (self.bloom.bits.nbytes if self.bloom is not None else 0)
+
+
+class ExpiringKeyIndex:
+    """16-byte keys in per-day buckets; buckets more than `horizon_days` before the newest day are dropped.
+
+    A bucket is a sorted array plus a set of recent inserts, merged every `merge_every` keys, with an
+    optional Bloom filter in front so most new keys never reach the exact lookup.
+    """
+
+    def __init__(
+        self, horizon_days: int = 30, bloom: bool = True, fp_rate: float = 0.01, merge_every: int = 16384
+    ) -> None:
+        self.horizon_days = horizon_days
+        self.bloom = bloom
+        self.fp_rate = fp_rate
+        self.merge_every = merge_every
+        self.newest: date | None = None
+        self.late = 0
+        self._buckets: dict[date, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(b) for b in self._buckets.values())
+
+    def days(self) -> list[date]:
+        return sorted(self._buckets)
+
+    def _expire(self) -> None:
+        cutoff = self.newest - timedelta(days=self.horizon_days)
+        for day in [d for d in self._buckets if d < cutoff]:
+            del self._buckets[day]
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """Membership in any live bucket."""
+        keys = np.asarray(keys, dtype=KEY_DTYPE)
+        found = np.zeros(len(keys), dtype=bool)
+        with self._lock:
+            for bucket in self._buckets.values():
+                found |= bucket.contains(keys)
+        return found
+
+    def contains_key(self, key: bytes) -> bool:
+        """Single-key `contains` without per-bucket array overhead."""
+        with self._lock:
+            return any(bucket.contains_key(key) for bucket in self._buckets.values())
+
+    def _bucket(self, day: date) -> _Bucket | None:
+        if self.newest is not None and day < self.newest - timedelta(days=self.horizon_days):
+            return None
+        if self.newest is None or day > self.newest:
+            self.newest = day
+            self._expire()
+        bucket = self._buckets.get(day)
+        if bucket is None:
+            bloom = BloomFilter(self.merge_every, self.fp_rate) if self.bloom else None
+            bucket = self._buckets[day] = _Bucket(bloom)
+        return bucket
+
+    def add(self, day: date, keys: np.ndarray) -> np.ndarray:
+        """Inserts keys under `day` and returns which were new (first occurrence, not in `day`'s bucket).
+
+        Keys for a day already past the horizon cannot be checked and are reported new.
+        """
+        keys = np.asarray(keys, dtype=KEY_DTYPE)
+        with self._lock:
+            bucket = self._bucket(day)
+            if bucket is None:
+                self.late += len(keys)
+                return np.ones(len(keys), dtype=bool)
+            unique, first = np.unique(keys, return_index=True)
+            seen = bucket.contains(unique)
+            new = np.zeros(len(keys), dtype=bool)
+            new[first[~seen]] = True
+            if not seen.all():
+                bucket.insert(unique[~seen], self.merge_every, self.fp_rate)
+            return new
+
+    def add_key(self, day: date, key: bytes) -> bool:
+        """Inserts one key under `day`; False if any live bucket already holds it."""
+        with self._lock:
+            bucket = self._bucket(day)
+            if any(b.contains_key(key) for b in self._buckets.values()):
+                return False
+            if bucket is None:
+                self.late += 1
+            else:
+                bucket.insert(np.array([key], dtype=KEY_DTYPE), self.merge_every, self.fp_rate)
+            return True
+
+    def discard(self, day: date | None, keys: np.ndarray) -> None:
+        """Forgets keys inserted under `day`, or under any day when `day` is None."""
+        keys = np.asarray(keys, dtype=KEY_DTYPE)
+        with self._lock:
+            buckets = self._buckets.values() if day is None else [self._buckets.get(day)]
+            for bucket in buckets:
+                if bucket is not None:
+                    bucket.discard(keys)
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(b.nbytes() for b in self._buckets.values())
+
+
+def _today() -> date:
+    return datetime.now(UTC).date()
+
+
+def _positions_by_day(records: list[TelemetryRecord]) -> dict[date, list[int]]:
+    by_day: dict[date, list[int]] = {}
+    for i, r in enumerate(records):
+        by_day.setdefault(summary_date(r.observed_at), []).append(i)
+    return by_day
+
+
+class DedupeIndex:
+    """Batch idempotency keys, bucketed by ingestion day, and record hashes, bucketed by observed day.
+
+    Batch keys are looked up one at a time across every bucket, where the Bloom front pays off for
+    new batches; record lookups are vectorized per day, where it does not.
+    """
+
+    def __init__(
+        self,
+        horizon_days: int = 30,
+        batch_bloom: bool = True,
+        record_bloom: bool = False,
+        fp_rate: float = 0.01,
+        clock: Callable[[], date] = _today,
+    ) -> None:
+        self.batches = ExpiringKeyIndex(horizon_days, batch_bloom, fp_rate)
+        self.records = ExpiringKeyIndex(horizon_days, record_bloom, fp_rate)
+        self.clock = clock
+
+    def has_batch(self, tenant_id: str, source: str, batch_id: str) -> bool:
+        return self.batches.contains_key(batch_key(tenant_id, source, batch_id))
+
+    def claim_batch(self, tenant_id: str, source: str, batch_id: str) -> bool:
+        """Marks the batch seen; False if it already was."""
+        return self.batches.add_key(self.clock(), batch_key(tenant_id, source, batch_id))
+
+    def new_records(self, payload: TelemetryBatchIn) -> list[TelemetryRecord]:
+        """Records of the batch whose hash has not been seen, in batch order."""
+        by_day = _positions_by_day(payload.records)
+        keep = np.zeros(len(payload.records), dtype=bool)
+        for day, positions in by_day.items():
+            keys = [record_key(payload.tenant_id, payload.records[i]) for i in positions]
+            keep[positions] = self.records.add(day, keys)
+        return [r for r, new in zip(payload.records, keep.tolist()) if new]
+
+    def release(self, payload: TelemetryBatchIn) -> None:
+        """Undoes `claim_batch` and `new_records` for a batch that was not stored, so a resend is accepted.
+
+        `payload` holds just the records `new_records` returned; others belong to earlier batches.
+        """
+        self.batches.discard(None, [batch_key(payload.tenant_id, payload.source, payload.batch_id)])
+        for day, positions in _positions_by_day(payload.records).items():
+            self.records.discard(day, [record_key(payload.tenant_id, payload.records[i]) for i in positions])
+
+    def memory_usage(self) -> dict[str, int]:
+        return {"dedupe_batch_bytes": self.batches.nbytes(), "dedupe_record_bytes": self.records.nbytes()}
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from app.scoring import SignalArrays
+
+# The blueprint's workload vector. VRAM is the absolute p95 so a fingerprint does not depend on the device's
+# card, and the app-category distribution is carried by the light/heavy app mix the signals already keep.
+FINGERPRINT_FIELDS = (
+    "gpu_util_p95",
+    "vram_used_p95_mb",
+    "cpu_util_p95",
+    "ram_used_p95",
+    "disk_latency_p95_ms",
+    "active_minutes",
+    "light_app_mix_factor",
+)
+# Below this many rows an exact scan beats building IVF lists.
+IVF_MIN_ROWS = 20_000
+_KMEANS_SAMPLE_PER_CLUSTER = 64
+# Distance-matrix cells computed per chunk (float32), bounding a search's scratch memory at about 32 MiB.
+_CHUNK_CELLS = 8_000_000
+
+
+def fingerprints(signals: SignalArrays) -> np.ndarray:
+    """(devices, len(FINGERPRINT_FIELDS)) float32, each column standardized over the fleet so no unit dominates."""
+    raw = np.column_stack([getattr(signals, name) for name in FINGERPRINT_FIELDS])
+    std = raw.std(axis=0)
+    return ((raw - raw.mean(axis=0)) / np.where(std > 0, std, 1.0)).astype(np.float32)
+
+
+def _sq_distances(queries: np.ndarray, rows: np.ndarray, row_norms: np.ndarray) -> np.ndarray:
+    d = row_norms[None, :] - 2.0 * (queries @ rows.T)
+    d += np.einsum("ij,ij->i", queries, queries)[:, None]
+    return np.maximum(d, 0.0, out=d)
+
+
+def _top_k(d: np.ndarray, ids: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """The `k` smallest of each row of `d` (labelled by `ids`), nearest first; short rows pad with -1/inf."""
+    if d.shape[1] < k:
+        pad = k - d.shape[1]
+        d = np.hstack([d, np.full((len(d), pad), np.inf, dtype=d.dtype)])
+        ids = np.hstack([ids, np.full((len(ids), pad), -1, dtype=ids.dtype)])
+    if k == 1:
+        part = d.argmin(axis=1)[:, None]
+        return np.take_along_axis(ids, part, axis=1), np.take_along_axis(d, part, axis=1)
+    part = np.argpartition(d, k - 1, axis=1)[:, :k]
+    d = np.take_along_axis(d, part, axis=1)
+    order = np.argsort(d, axis=1, kind="stable")
+    return np.take_along_axis(np.take_along_axis(ids, part, axis=1), order, axis=1), np.take_along_axis(d, order, 1)
+
+
+def kmeans(vectors: np.ndarray, clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's algorithm on a sample of at most `_KMEANS_SAMPLE_PER_CLUSTER` rows per cluster, seeded from
+    random rows; empty clusters keep their previous centroid."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > clusters * _KMEANS_SAMPLE_PER_CLUSTER:
+        sample = vectors[rng.choice(len(vectors), size=clusters * _KMEANS_SAMPLE_PER_CLUSTER, replace=False)]
+    centroids = sample[rng.choice(len(sample), size=clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = VectorIndex(centroids, lists=0).search(sample, 1)[0][:, 0]
+        counts = np.bincount(assign, minlength=clusters)
+        filled = counts > 0
+        for dim in range(sample.shape[1]):
+            sums = np.bincount(assign, weights=sample[:, dim], minlength=clusters)
+            centroids[filled, dim] = sums[filled] / counts[filled]
+    return centroids
+
+
+class VectorIndex:
+    """Nearest rows by Euclidean distance.
+
+    With `lists=0` every search is exact: a matrix product per chunk of queries. Otherwise rows are bucketed
+    by nearest k-means centroid (IVF) and a query scans only its `probes` nearest buckets, which is
+    approximate. `lists=None` picks exact below IVF_MIN_ROWS and about sqrt(rows) lists above it.
+    Rows are kept as float32; with a handful of dimensions there is nothing further to gain from quantizing.
+    """
+
+    def __init__(self, vectors: np.ndarray, lists: int | None = None, probes: int = 8, seed: int = 0) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if lists is None:
+            lists = 0 if len(vectors) < IVF_MIN_ROWS else int(math.sqrt(len(vectors)))
+        self.lists = min(lists, len(vectors))
+        self.probes = probes
+        if self.lists:
+            self.centroids = kmeans(vectors, self.lists, seed=seed)
+            assign = VectorIndex(self.centroids, lists=0).search(vectors, 1)[0][:, 0]
+            self._ids = np.argsort(assign, kind="stable")
+            self._offsets = np.searchsorted(assign[self._ids], np.arange(self.lists + 1))
+        else:
+            self._ids = np.arange(len(vectors))
+        self._vectors = vectors[self._ids]
+        self._norms = np.einsum("ij,ij->i", self._vectors, self._vectors)
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def search(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Row indexes and squared distances of each query's `k` nearest rows, nearest first.
+
+        Missing neighbours (fewer than `k` rows reachable) are -1 with infinite distance.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = max(1, k)
+        if not len(self._vectors) or not len(queries):
+            return np.full((len(queries), k), -1), np.full((len(queries), k), np.inf, dtype=np.float32)
+        if not self.lists:
+            return self._exact(queries, k)
+        return self._ivf(queries, k)
+
+    def _exact(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        step = max(1, _CHUNK_CELLS // len(self._vectors))
+        ids, dists = [], []
+        labels = self._ids[None, :]
+        for start in range(0, len(queries), step):
+            d = _sq_distances(queries[start : start + step], self._vectors, self._norms)
+            i, d = _top_k(d, np.broadcast_to(labels, d.shape), k)
+            ids.append(i)
+            dists.append(d)
+        return np.vstack(ids), np.vstack(dists)
+
+    def _ivf(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        # Grouped by list rather than by query: each list is scored against every query probing it at once.
+        probes = VectorIndex(self.centroids, lists=0).search(queries, min(self.probes, self.lists))[0]
+        best_ids = np.full((len(queries), k), -1)
+        best = np.full((len(queries), k), np.inf, dtype=np.float32)
+        for lst in np.unique(probes).tolist():
+            lo, hi = self._offsets[lst], self._offsets[lst + 1]
+            if lo == hi:
+                continue
+            asking = np.flatnonzero((probes == lst).any(axis=1))
+            d = _sq_distances(queries[asking], self._vectors[lo:hi], self._norms[lo:hi])
+            ids = np.broadcast_to(self._ids[lo:hi], d.shape)
+            best_ids[asking], best[asking] = _top_k(
+                np.hstack([best[asking], d]), np.hstack([best_ids[asking], ids]), k
+            )
+        return best_ids, best
+
+
+class FleetFingerprints:
+    """One tenant's fingerprints and an index over them, for "which devices work like this one"."""
+
+    def __init__(self, device_keys: list[str], signals: SignalArrays, lists: int | None = None) -> None:
+        self.device_keys = device_keys
+        self.rows = {key: i for i, key in enumerate(device_keys)}
+        self.vectors = fingerprints(signals)
+        self.index = VectorIndex(self.vectors, lists)
+
+    def similar(self, device_key: str, k: int = 10) -> list[tuple[str, float]]:
+        """The `k` devices nearest `device_key`'s fingerprint, excluding itself. Raises KeyError if unknown."""
+        row = self.rows[device_key]
+        ids, dists = self.index.search(self.vectors[row], k + 1)
+        return [
+            (self.device_keys[i], math.sqrt(float(d))) for i, d in zip(ids[0], dists[0]) if i >= 0 and i != row
+        ][:k]
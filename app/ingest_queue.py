@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from itertools import count
+from typing import TYPE_CHECKING, Any
+
+from app.schemas import TelemetryBatchIn
+
+if TYPE_CHECKING:
+    from app.storage import InMemoryStore
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 1000
+DEFAULT_WORKERS = 2
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class QueueClosedError(RuntimeError):
+    pass
+
+
+class IngestionQueue:
+    """Bounded in-process stand-in for the ingestion topic between the API and storage."""
+
+    def __init__(
+        self,
+        store: InMemoryStore,
+        capacity: int = DEFAULT_CAPACITY,
+        workers: int = DEFAULT_WORKERS,
+        enqueue_timeout: float = 0.0,
+    ) -> None:
+        if capacity <= 0 or workers <= 0:
+            raise ValueError("capacity and workers must be positive")
+        self.store = store
+        self.capacity = capacity
+        self.workers = workers
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: asyncio.Queue[tuple[int, TelemetryBatchIn]] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._seq = count()
+        self._pending: dict[int, float] = {}
+        self._pending_keys: set[tuple[str, str, str]] = set()
+        self.enqueued = 0
+        self.processed = 0
+        self.records = 0
+        self.deduped = 0
+        self.rejected = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_error: str | None = None
+        self.last_lag_s = 0.0
+        self.max_lag_s = 0.0
+        self._lag_total_s = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.capacity)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain: bool = True) -> None:
+        if not self.running:
+            return
+        if drain:
+            await self._queue.join()
+        else:
+            while not self._queue.empty():
+                seq, payload = self._queue.get_nowait()
+                self._finish(seq, payload, record_lag=False)
+                self.dropped += 1
+                self._queue.task_done()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def is_duplicate(self, payload: TelemetryBatchIn) -> bool:
+        key = (payload.tenant_id, payload.source, payload.batch_id)
+        return key in self._pending_keys or self.store.has_batch(*key)
+
+    async def submit(self, payload: TelemetryBatchIn) -> None:
+        if not self.running:
+            raise QueueClosedError("ingestion queue is not running")
+        seq = next(self._seq)
+        self._pending[seq] = time.monotonic()
+        self._pending_keys.add((payload.tenant_id, payload.source, payload.batch_id))
+        try:
+            if self.enqueue_timeout > 0:
+                await asyncio.wait_for(self._queue.put((seq, payload)), self.enqueue_timeout)
+            else:
+                self._queue.put_nowait((seq, payload))
+        except (asyncio.QueueFull, TimeoutError):
+            self._finish(seq, payload, record_lag=False)
+            self.rejected += 1
+            raise QueueFullError("ingestion queue is full") from None
+        self.enqueued += 1
+
+    async def join(self) -> None:
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _worker(self) -> None:
+        while True:
+            seq, payload = await self._queue.get()
+            try:
+                accepted, deduped = await asyncio.to_thread(self.store.ingest_telemetry, payload)
+                self.records += accepted
+                self.deduped += deduped
+                self.processed += 1
+            except Exception as exc:
+                # The store has released the batch's dedupe claim, so the client can resend it.
+                _log.exception("ingesting batch %s/%s/%s failed", payload.tenant_id, payload.source, payload.batch_id)
+                self.failed += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+            finally:
+                self._finish(seq, payload)
+                self._queue.task_done()
+
+    def _finish(self, seq: int, payload: TelemetryBatchIn, record_lag: bool = True) -> None:
+        enqueued_at = self._pending.pop(seq, None)
+        self._pending_keys.discard((payload.tenant_id, payload.source, payload.batch_id))
+        if enqueued_at is None or not record_lag:
+            return
+        lag = time.monotonic() - enqueued_at
+        self.last_lag_s = lag
+        self.max_lag_s = max(self.max_lag_s, lag)
+        self._lag_total_s += lag
+
+    def stats(self) -> dict[str, Any]:
+        oldest = next(iter(self._pending.values()), None)
+        completed = self.processed + self.failed
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": len(self._pending),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "records": self.records,
+            "deduped": self.deduped,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+            "current_lag_s": time.monotonic() - oldest if oldest is not None else 0.0,
+            "last_lag_s": self.last_lag_s,
+            "max_lag_s": self.max_lag_s,
+            "mean_lag_s": self._lag_total_s / completed if completed else 0.0,
+        }
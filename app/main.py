@@ -1,21 +1,159 @@
 from __future__ import annotations
 
-from fastapi import FastAPI, HTTPException, Query
+import email.message
+import json
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Annotated, Any, Literal
 
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app.decoding import DECODERS, decode_telemetry_batch, tune_gc
+from app.ingest_queue import IngestionQueue, QueueClosedError, QueueFullError
+from app.metrics import CONTENT_TYPE, REGISTRY, RequestMetricsMiddleware, cached
+from app.profiler import profiler
+from app.rec_compact import encode_items, encode_list, stream_json, stream_ndjson
+from app.retention import Compactor, RetentionPolicy
 from app.schemas import (
     CapabilityBatchIn,
+    ExportTableOut,
     IngestionAck,
+    OutcomeSummary,
     PolicyCreateIn,
     PolicyPatchIn,
     PolicyProfile,
     Recommendation,
+    RecommendationChangesOut,
     RecommendationListOut,
+    ScoreCacheReport,
+    ServiceNowExportOut,
+    SimilarDevice,
+    SimilarDevicesOut,
     SimulateRequest,
+    SimulationOut,
     TelemetryBatchIn,
+    WhatIfOut,
+    WhatIfRequest,
+    WhatIfVariantOut,
 )
+from app.servicenow_export import ExportError, ImportSetTarget, ServiceNowExporter
 from app.storage import store
+from app.streaming import StreamError, TelemetryStream, split_lines_async
+
+ingest_queue = IngestionQueue(store)
+compactor = Compactor(store, RetentionPolicy.from_env())
+# Seconds between background compaction passes; 0 leaves compaction to the admin endpoint.
+COMPACTION_INTERVAL_S = float(os.environ.get("ITAM_COMPACTION_INTERVAL_S", "0"))
+SERVICENOW_TARGET = ImportSetTarget.from_env()
+servicenow = ServiceNowExporter(store, SERVICENOW_TARGET) if SERVICENOW_TARGET else None
+
+TELEMETRY_DECODER = os.environ.get("ITAM_TELEMETRY_DECODER", "fastapi")
+if TELEMETRY_DECODER not in DECODERS:
+    raise ValueError(f"unknown telemetry decoder: {TELEMETRY_DECODER}")
+# Freeze the startup heap and collect the young generation less often (`tune_gc`), for ingest-heavy workers.
+TUNE_GC = os.environ.get("ITAM_TUNE_GC", "0") == "1"
+
+REGISTRY.enabled = os.environ.get("ITAM_METRICS", "1") != "0"
+# Store-wide sizes walk every device, so a scrape reuses them for this long.
+STORE_GAUGE_TTL_S = 30.0
+
+REGISTRY.gauge(
+    "itam_store_memory_bytes",
+    "Estimated bytes held by telemetry columns, rollup sketches and dedupe keys.",
+    ("component",),
+    cached(lambda: {(name,): float(value) for name, value in store.memory_usage().items()}, STORE_GAUGE_TTL_S),
+)
+REGISTRY.gauge(
+    "itam_store_items",
+    "Items held by the store, by kind.",
+    ("kind",),
+    cached(
+        lambda: {
+            ("tenants",): len(store.rollups.tenants()),
+            ("devices",): sum(len(store.rollups.devices(t)) for t in store.rollups.tenants()),
+            ("daily_rollups",): sum(store.rollups.summary_count(t) for t in store.rollups.tenants()),
+            ("telemetry_records",): store.telemetry.record_count(),
+            ("recommendations",): len(store.recommendations),
+            ("policies",): len(store.policies),
+        },
+        STORE_GAUGE_TTL_S,
+    ),
+)
+REGISTRY.gauge(
+    "itam_ingest_queue",
+    "Async ingestion queue depth, in-flight batches and current lag in seconds.",
+    ("field",),
+    lambda: {(name,): float(ingest_queue.stats()[name]) for name in ("depth", "in_flight", "current_lag_s")},
+)
+REGISTRY.gauge("itam_profiler_running", "1 while the sampling profiler is on.", (), lambda: {(): profiler.running})
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    if TUNE_GC:
+        tune_gc()
+    await ingest_queue.start()
+    if COMPACTION_INTERVAL_S > 0:
+        compactor.start(COMPACTION_INTERVAL_S)
+    yield
+    await ingest_queue.stop()
+    compactor.stop()
+    if servicenow is not None:
+        servicenow.close()
+
+
+app = FastAPI(title="ServiceNow ITAM Add-on API", version="0.1.0", lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
+
+
+def _is_json(content_type: str | None) -> bool:
+    if not content_type:
+        return False
+    message = email.message.Message()
+    message["content-type"] = content_type
+    subtype = message.get_content_subtype()
+    return message.get_content_maintype() == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+
+async def telemetry_batch_body(request: Request) -> TelemetryBatchIn:
+    """Decodes the body with TELEMETRY_DECODER, failing the way FastAPI's own body parsing does."""
+    body = await request.body()
+    if not body:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+    try:
+        if not _is_json(request.headers.get("content-type")):
+            return TelemetryBatchIn.model_validate(body, from_attributes=True)
+        return await run_in_threadpool(decode_telemetry_batch, body, TELEMETRY_DECODER)
+    except json.JSONDecodeError as exc:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "json_invalid",
+                    "loc": ("body", exc.pos),
+                    "msg": "JSON decode error",
+                    "input": {},
+                    "ctx": {"error": exc.msg},
+                }
+            ],
+            body=exc.doc,
+        ) from exc
+    except ValidationError as exc:
+        errors = [{**error, "loc": ("body", *error["loc"])} for error in exc.errors(include_url=False)]
+        raise RequestValidationError(errors, body=body) from exc
+
 
-app = FastAPI(title="ServiceNow ITAM Add-on API", version="0.1.0")
+TelemetryBody = (
+    TelemetryBatchIn
+    if TELEMETRY_DECODER == "fastapi"
+    else Annotated[TelemetryBatchIn, Depends(telemetry_batch_body)]
+)
 
 
 @app.get("/healthz")
@@ -23,8 +161,51 @@ def healthz() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/api/v1/admin/profiler")
+def profiler_status() -> dict[str, Any]:
+    return profiler.status()
+
+
+@app.post("/api/v1/admin/profiler/start")
+def start_profiler(
+    interval_ms: float = Query(default=5.0, ge=1.0, le=1000.0), reset: bool = Query(default=True)
+) -> dict[str, Any]:
+    if not profiler.start(interval_ms / 1000, reset):
+        raise HTTPException(status_code=409, detail="profiler_running")
+    return profiler.status()
+
+
+@app.post("/api/v1/admin/profiler/stop")
+def stop_profiler() -> dict[str, Any]:
+    if not profiler.stop():
+        raise HTTPException(status_code=409, detail="profiler_not_running")
+    return profiler.status()
+
+
+@app.get("/api/v1/admin/profiler/collapsed", response_class=PlainTextResponse)
+def profiler_stacks() -> PlainTextResponse:
+    """Folded stacks (`frame;frame;frame count`), readable by flamegraph.pl and speedscope."""
+    return PlainTextResponse(profiler.collapsed())
+
+
+@app.get("/api/v1/admin/compaction")
+def compaction_status() -> dict[str, Any]:
+    return compactor.status()
+
+
+@app.post("/api/v1/admin/compaction/run")
+def run_compaction(tenant_id: str | None = Query(default=None)) -> dict[str, Any]:
+    """One retention pass now, over every tenant or just `tenant_id`; returns what it dropped and reclaimed."""
+    return compactor.run_once(tenant_id).as_dict()
+
+
 @app.post("/api/v1/ingestion/telemetry-batch", response_model=IngestionAck)
-def ingest_telemetry(payload: TelemetryBatchIn) -> IngestionAck:
+def ingest_telemetry(payload: TelemetryBody) -> IngestionAck:
     accepted, deduped = store.ingest_telemetry(payload)
     return IngestionAck(
         status="accepted" if not deduped else "duplicate",
@@ -34,6 +215,48 @@ def ingest_telemetry(payload: TelemetryBatchIn) -> IngestionAck:
     )
 
 
+@app.post("/api/v1/ingestion/telemetry-batch/async", response_model=IngestionAck, status_code=202)
+async def enqueue_telemetry(payload: TelemetryBody) -> IngestionAck:
+    if ingest_queue.is_duplicate(payload):
+        return IngestionAck(status="duplicate", tenant_id=payload.tenant_id, accepted_records=0, deduped=True)
+    try:
+        await ingest_queue.submit(payload)
+    except QueueFullError:
+        raise HTTPException(status_code=429, detail="ingestion_queue_full", headers={"Retry-After": "1"})
+    except QueueClosedError:
+        raise HTTPException(status_code=503, detail="ingestion_queue_unavailable")
+    return IngestionAck(status="queued", tenant_id=payload.tenant_id, accepted_records=len(payload.records))
+
+
+@app.get("/api/v1/ingestion/queue")
+def ingestion_queue_stats() -> dict[str, Any]:
+    return ingest_queue.stats()
+
+
+@app.post("/api/v1/ingestion/telemetry-stream", response_model=IngestionAck)
+async def ingest_telemetry_stream(request: Request) -> IngestionAck:
+    stream = TelemetryStream(store)
+    try:
+        async for line in split_lines_async(request.stream()):
+            if stream.feed(line):
+                await run_in_threadpool(stream.flush)
+            if stream.duplicate:
+                break
+        else:
+            await run_in_threadpool(stream.finish)
+    except StreamError as exc:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": "invalid_stream", "line": exc.line, "message": exc.message, "committed": exc.committed},
+        )
+    return IngestionAck(
+        status="accepted" if not stream.duplicate else "duplicate",
+        tenant_id=stream.header.tenant_id,
+        accepted_records=stream.accepted,
+        deduped=stream.duplicate,
+    )
+
+
 @app.post("/api/v1/ingestion/capability-snapshots", response_model=IngestionAck)
 def ingest_capabilities(payload: CapabilityBatchIn) -> IngestionAck:
     accepted = store.ingest_capabilities(payload)
@@ -61,12 +284,95 @@ def patch_policy(policy_id: str, patch: PolicyPatchIn) -> PolicyProfile:
     return updated
 
 
-@app.post("/api/v1/admin/policies/{policy_id}/simulate", response_model=RecommendationListOut)
-def simulate_policy(policy_id: str, payload: SimulateRequest) -> RecommendationListOut:
+@app.post("/api/v1/admin/policies/{policy_id}/simulate", response_model=SimulationOut)
+def simulate_policy(policy_id: str, payload: SimulateRequest) -> Response:
     policy = store.get_policy(policy_id)
     if not policy:
         raise HTTPException(status_code=404, detail="policy_not_found")
-    return RecommendationListOut(items=store.generate_recommendations(payload.tenant_id))
+    try:
+        items, report = store.simulate_policy(payload.tenant_id, policy, payload.window_days)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    cache = ScoreCacheReport(
+        hits=report.hits,
+        misses=report.misses,
+        hit_rate=report.hit_rate,
+        compute_ms=report.compute_s * 1000,
+        time_saved_ms=report.time_saved_s * 1000,
+    )
+    return Response(encode_list(items, None, cache=cache.model_dump()), media_type="application/json")
+
+
+@app.post("/api/v1/admin/policies/{policy_id}/what-if", response_model=WhatIfOut)
+def what_if(policy_id: str, payload: WhatIfRequest) -> WhatIfOut:
+    policy = store.get_policy(policy_id)
+    if not policy:
+        raise HTTPException(status_code=404, detail="policy_not_found")
+    started = time.perf_counter()
+    try:
+        device_keys, baseline, outcomes = store.what_if(
+            payload.tenant_id, policy, [v.thresholds for v in payload.variants], payload.window_days
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return WhatIfOut(
+        tenant_id=payload.tenant_id,
+        policy_id=policy.policy_id,
+        policy_version=policy.version,
+        window_days=payload.window_days,
+        devices=len(device_keys),
+        baseline=OutcomeSummary(
+            classification_counts=baseline.classification_counts,
+            action_counts=baseline.action_counts,
+            expected_savings_usd_annual=baseline.expected_savings_usd_annual,
+        ),
+        variants=[
+            WhatIfVariantOut(
+                **asdict(outcome),
+                name=variant.name or f"variant-{i}",
+                thresholds={**policy.thresholds, **variant.thresholds},
+                savings_delta_usd_annual=outcome.expected_savings_usd_annual - baseline.expected_savings_usd_annual,
+            )
+            for i, (variant, outcome) in enumerate(zip(payload.variants, outcomes))
+        ],
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+
+
+@app.post("/api/v1/admin/export/servicenow", response_model=ServiceNowExportOut)
+def export_to_servicenow(tenant_id: str, policy_id: str | None = Query(default=None)) -> ServiceNowExportOut:
+    """Push what changed since the scope's last export to the Import Set staging tables: the recommendations
+    of `policy_id` (the default scoring when omitted) and the tenant's daily summaries."""
+    if servicenow is None:
+        raise HTTPException(status_code=503, detail="export_not_configured")
+    try:
+        report = servicenow.export(tenant_id, policy_id)
+    except ExportError as exc:
+        raise HTTPException(status_code=502, detail={"error": "export_failed", "message": str(exc)})
+    return ServiceNowExportOut(
+        tenant_id=report.tenant_id,
+        policy_id=report.policy_id,
+        run_id=report.run_id,
+        full_sync=report.full_sync,
+        tables=[ExportTableOut(**asdict(table)) for table in report.tables],
+        elapsed_ms=report.seconds * 1000,
+    )
+
+
+@app.get("/api/v1/devices/{device_key}/similar", response_model=SimilarDevicesOut)
+def similar_devices(
+    device_key: str,
+    tenant_id: str,
+    k: int = Query(default=10, ge=1, le=100),
+    window_days: int | None = Query(default=None, gt=0, le=730),
+) -> SimilarDevicesOut:
+    try:
+        similar = store.similar_devices(tenant_id, device_key, k, window_days)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="device_not_found")
+    return SimilarDevicesOut(
+        device_key=device_key, items=[SimilarDevice(device_key=key, distance=d) for key, d in similar]
+    )
 
 
 @app.get("/api/v1/recommendations", response_model=RecommendationListOut)
@@ -75,15 +381,57 @@ def list_recommendations(
     action: str | None = Query(default=None),
     classification: str | None = Query(default=None),
     min_confidence: float | None = Query(default=None),
-) -> RecommendationListOut:
-    recs = [x for x in store.recommendations.values() if x.tenant_id == tenant_id]
-    if action:
-        recs = [x for x in recs if x.action == action]
-    if classification:
-        recs = [x for x in recs if x.classification == classification]
-    if min_confidence is not None:
-        recs = [x for x in recs if x.confidence >= min_confidence]
-    return RecommendationListOut(items=recs)
+    status: str | None = Query(default=None),
+    cursor: str | None = Query(default=None),
+    limit: int = Query(default=1000, ge=1, le=10000),
+) -> Response:
+    try:
+        recs, next_cursor = store.query_recommendations(
+            tenant_id,
+            action=action,
+            classification=classification,
+            min_confidence=min_confidence,
+            status=status,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid_cursor")
+    return Response(encode_list(recs, next_cursor), media_type="application/json")
+
+
+@app.get("/api/v1/recommendations/export", response_model=RecommendationListOut)
+def export_recommendations(
+    tenant_id: str,
+    action: str | None = Query(default=None),
+    classification: str | None = Query(default=None),
+    min_confidence: float | None = Query(default=None),
+    status: str | None = Query(default=None),
+    format: Literal["ndjson", "json"] = Query(default="ndjson"),
+) -> StreamingResponse:
+    """Every match in one streamed response: one recommendation per line, or the list document uncursored."""
+    recs = store.iter_recommendations(tenant_id, action, classification, min_confidence, status)
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(recs), media_type="application/x-ndjson")
+    return StreamingResponse(stream_json(recs), media_type="application/json")
+
+
+@app.get("/api/v1/recommendations/changes", response_model=RecommendationChangesOut)
+def recommendation_changes(
+    tenant_id: str,
+    policy_id: str | None = Query(default=None),
+    since_run_id: str | None = Query(default=None),
+) -> Response:
+    """Recommendations the runs after `since_run_id` created or moved; pass the returned `run_id` next time.
+
+    Without `since_run_id` this is a full sync of the scope. A 404 means the run expired: sync in full again.
+    """
+    try:
+        latest, recs = store.recommendation_changes_since(tenant_id, policy_id, since_run_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="run_not_found")
+    run_id = latest.run_id if latest else since_run_id
+    return Response(encode_items(recs, run_id=run_id), media_type="application/json")
 
 
 @app.get("/api/v1/recommendations/{recommendation_id}", response_model=Recommendation)
@@ -91,24 +439,20 @@ def get_recommendation(recommendation_id: str) -> Recommendation:
     rec = store.recommendations.get(recommendation_id)
     if not rec:
         raise HTTPException(status_code=404, detail="recommendation_not_found")
-    return rec
+    return rec.to_model()
 
 
 @app.post("/api/v1/recommendations/{recommendation_id}/approve", response_model=Recommendation)
 def approve_recommendation(recommendation_id: str) -> Recommendation:
-    rec = store.recommendations.get(recommendation_id)
+    rec = store.set_recommendation_status(recommendation_id, "APPROVED")
     if not rec:
         raise HTTPException(status_code=404, detail="recommendation_not_found")
-    rec.status = "APPROVED"
-    store.recommendations[recommendation_id] = rec
-    return rec
+    return rec.to_model()
 
 
 @app.post("/api/v1/recommendations/{recommendation_id}/override", response_model=Recommendation)
 def override_recommendation(recommendation_id: str) -> Recommendation:
-    rec = store.recommendations.get(recommendation_id)
+    rec = store.set_recommendation_status(recommendation_id, "OVERRIDDEN")
     if not rec:
         raise HTTPException(status_code=404, detail="recommendation_not_found")
-    rec.status = "OVERRIDDEN"
-    store.recommendations[recommendation_id] = rec
-    return rec
+    return rec.to_model()
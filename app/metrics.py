@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Prometheus text exposition format 0.0.4.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = tuple[str, ...]
+GaugeCallback = Callable[[], dict[Labels, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: MetricsRegistry, name: str, help: str, labelnames: Labels = ()) -> None:
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def lines(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.lines()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, registry: MetricsRegistry, name: str, help: str, labelnames: Labels = ()) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in values]
+
+
+class Gauge(_Metric):
+    """Read from `callback` at scrape time, so the hot path never updates it."""
+
+    kind = "gauge"
+
+    def __init__(
+        self, registry: MetricsRegistry, name: str, help: str, labelnames: Labels, callback: GaugeCallback
+    ) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self.callback = callback
+
+    def lines(self) -> list[str]:
+        values = sorted(self.callback().items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in values]
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int) -> None:
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        name: str,
+        help: str,
+        labelnames: Labels = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = buckets
+        self._series: dict[Labels, _Series] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _Series(len(self.buckets))
+            series.counts[bisect_left(self.buckets, value)] += 1
+            series.sum += value
+            series.count += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        if not self.registry.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series.count if series is not None else 0
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            snapshot = sorted((k, list(s.counts), s.sum, s.count) for k, s in self._series.items())
+        lines = []
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Counters and histograms updated in place under a per-metric lock; gauges computed on scrape.
+
+    With `enabled` off, updates return before taking the lock, which is what the overhead benchmark
+    compares against.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Labels = ()) -> Counter:
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(
+        self, name: str, help: str, labelnames: Labels = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, labelnames: Labels, callback: GaugeCallback) -> Gauge:
+        return self._register(Gauge(self, name, help, labelnames, callback))
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+
+def cached(callback: GaugeCallback, ttl_s: float) -> GaugeCallback:
+    """Reuses the last result for `ttl_s`, for gauges that walk the whole store."""
+    state: list = [float("-inf"), {}]
+    lock = threading.Lock()
+
+    def read() -> dict[Labels, float]:
+        with lock:
+            if time.monotonic() - state[0] >= ttl_s:
+                state[1] = callback()
+                state[0] = time.monotonic()
+            return state[1]
+
+    return read
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "itam_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+)
+INGESTED_RECORDS = REGISTRY.counter("itam_ingested_records_total", "Telemetry records accepted after dedupe.")
+INGESTED_BATCHES = REGISTRY.counter("itam_ingested_batches_total", "Telemetry batches by outcome.", ("outcome",))
+STAGE_SECONDS = REGISTRY.histogram(
+    "itam_recommendation_stage_seconds",
+    "Time per recommendation-run stage: grouping, percentiles, scoring, models.",
+    ("stage",),
+)
+RECOMMENDATIONS = REGISTRY.counter("itam_recommendations_generated_total", "Recommendations built by runs.")
+EXPORTED_ROWS = REGISTRY.counter("itam_export_rows_total", "Rows sent to ServiceNow Import Set tables.", ("table",))
+EXPORTED_BYTES = REGISTRY.counter(
+    "itam_export_bytes_total", "Import Set request bytes, before (raw) and after (wire) gzip.", ("table", "kind")
+)
+EXPORT_RETRIES = REGISTRY.counter("itam_export_retries_total", "Import Set requests retried after a failure.")
+COMPACTED_ITEMS = REGISTRY.counter(
+    "itam_compaction_dropped_total", "Raw samples and daily rollups dropped by retention, by tier.", ("tier",)
+)
+COMPACTION_RECLAIMED_BYTES = REGISTRY.counter(
+    "itam_compaction_reclaimed_bytes_total", "Estimated bytes freed by compaction, by tier.", ("tier",)
+)
+
+
+def stage(name: str) -> AbstractContextManager[None]:
+    return STAGE_SECONDS.time(name)
+
+
+def record_ingest(accepted: int, deduped: bool) -> None:
+    INGESTED_BATCHES.inc("duplicate" if deduped else "accepted")
+    INGESTED_RECORDS.inc(amount=accepted)
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI, so it adds no task or body buffering; the route label is the matched path template."""
+
+    def __init__(self, app: ASGIApp, histogram: Histogram = REQUEST_SECONDS) -> None:
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.histogram.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.histogram.observe(time.perf_counter() - started, scope["method"], route, str(status))
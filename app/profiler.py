@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+MAX_DEPTH = 64
+
+
+_labels: dict[Any, str] = {}
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{frame.f_globals.get('__name__', '?')}:{code.co_name}"
+    return label
+
+
+class SamplingProfiler:
+    """Samples every thread's stack from a daemon thread every `interval_s` while running.
+
+    Stacks aggregate into counts keyed root-first, and `collapsed()` emits them in the folded
+    format flame graph tools read. Cost is paid by the sampler thread holding the GIL during a
+    walk, so it scales with the thread count and stack depth, not with request volume.
+    """
+
+    def __init__(self) -> None:
+        self.interval_s = 0.005
+        self.samples = 0
+        self.started_at: float | None = None
+        self.elapsed_s = 0.0
+        self._stacks: Counter[tuple[str, ...]] = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval_s: float = 0.005, reset: bool = True) -> bool:
+        """False if already running."""
+        with self._lock:
+            if self._thread is not None:
+                return False
+            if reset:
+                self._stacks.clear()
+                self.samples = 0
+                self.elapsed_s = 0.0
+            self.interval_s = interval_s
+            self.started_at = time.monotonic()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> bool:
+        """False if not running."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return False
+            self._stop.set()
+        thread.join()
+        self.elapsed_s += time.monotonic() - self.started_at
+        self.started_at = None
+        return True
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            sampled = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                sampled.append(tuple(reversed(stack)))
+            with self._lock:
+                self._stacks.update(sampled)
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks)
+
+    def top(self, limit: int = 20) -> list[tuple[str, int]]:
+        """Leaf functions by sample count."""
+        leaves: Counter[str] = Counter()
+        with self._lock:
+            for stack, count in self._stacks.items():
+                if stack:
+                    leaves[stack[-1]] += count
+        return leaves.most_common(limit)
+
+    def status(self) -> dict[str, Any]:
+        elapsed = self.elapsed_s + (time.monotonic() - self.started_at if self.started_at is not None else 0.0)
+        return {
+            "running": self.running,
+            "interval_ms": self.interval_s * 1000,
+            "samples": self.samples,
+            "elapsed_s": elapsed,
+            "top": [{"function": name, "samples": count} for name, count in self.top()],
+        }
+
+
+profiler = SamplingProfiler()
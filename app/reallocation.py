@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import replace
+
+import numpy as np
+
+from app.capabilities import DeviceCapabilities, apply_vram
+from app.fingerprints import VectorIndex
+from app.schemas import Classification
+from app.scoring import (
+    CLASSIFICATIONS,
+    DEFAULT_SCORING,
+    SIGNAL_FIELDS,
+    ScoringParams,
+    SignalArrays,
+    SignalSummary,
+    score_batch,
+)
+
+# Share of a resource a workload should use on the hardware it is sized for.
+TARGET_UTILIZATION = 0.7
+# Overprovisioned devices considered per underpowered one.
+CANDIDATES = 8
+_MIN_GB = 0.5
+
+_UNDERPOWERED = CLASSIFICATIONS.index(Classification.UNDERPOWERED)
+_OVERPROVISIONED = CLASSIFICATIONS.index(Classification.OVERPROVISIONED)
+_CODES = {c: i for i, c in enumerate(CLASSIFICATIONS)}
+
+
+def _hardware(capabilities: DeviceCapabilities, rows: np.ndarray) -> DeviceCapabilities:
+    return DeviceCapabilities(capabilities.vram_gb[rows], capabilities.ram_gb[rows], capabilities.cores[rows])
+
+
+def moved_workload(signals: SignalArrays, src: DeviceCapabilities, dst: DeviceCapabilities) -> SignalArrays:
+    """`signals` as they would read on `dst` hardware: CPU and RAM use scale with the core and RAM ratios,
+    and VRAM is re-based by `apply_vram`. GPU compute and disk stay as measured; snapshots do not rate them."""
+    ram_ratio = src.ram_gb / dst.ram_gb
+    moved = replace(
+        signals,
+        cpu_util_p95=np.minimum(100.0, signals.cpu_util_p95 * src.cores / dst.cores),
+        ram_used_p95=np.minimum(100.0, signals.ram_used_p95 * ram_ratio),
+        paging_pressure_minutes=signals.paging_pressure_minutes * ram_ratio,
+    )
+    return apply_vram(moved, dst)
+
+
+def swap_pairs(
+    summaries: Sequence[SignalSummary],
+    classifications: Sequence[Classification],
+    capabilities: DeviceCapabilities,
+    params: ScoringParams = DEFAULT_SCORING,
+    candidates: int = CANDIDATES,
+) -> list[tuple[int, int]]:
+    """(underpowered, overprovisioned) index pairs whose users could trade devices.
+
+    Each underpowered device looks up the overprovisioned devices whose cores, RAM and VRAM are nearest (in
+    log space) to what its workload needs at TARGET_UTILIZATION. Both directions of every candidate swap
+    are re-scored, and a swap stands only if neither workload would be underpowered afterwards. Pairs are
+    then taken greedily by the lower of the two post-swap fit scores; each device is in at most one pair.
+    Devices without a capability snapshot are never paired.
+    """
+    classes = np.fromiter((_CODES[c] for c in classifications), dtype=np.int64, count=len(classifications))
+    known = capabilities.known & (capabilities.cores > 0) & (capabilities.ram_gb > 0)
+    under = np.flatnonzero(known & (classes == _UNDERPOWERED))
+    over = np.flatnonzero(known & (classes == _OVERPROVISIONED))
+    if not len(under) or not len(over):
+        return []
+
+    # Rows of `signals`: the underpowered devices, then the overprovisioned ones.
+    signals = SignalArrays.from_summaries([summaries[i] for i in np.concatenate([under, over])])
+    cores, ram_gb = capabilities.cores, capabilities.ram_gb
+    vram_gb = np.maximum(np.nan_to_num(capabilities.vram_gb), _MIN_GB)
+    supply = np.log2(np.column_stack([cores[over], ram_gb[over], vram_gb[over]]))
+    u = np.arange(len(under))
+    need = np.column_stack(
+        [
+            cores[under] * signals.cpu_util_p95[u] / 100.0,
+            ram_gb[under] * signals.ram_used_p95[u] / 100.0,
+            signals.vram_used_p95_mb[u] / 1024.0,
+        ]
+    )
+    need = np.log2(np.maximum(need / TARGET_UTILIZATION, _MIN_GB))
+    near, _ = VectorIndex(supply).search(need, min(candidates, len(over)))
+
+    reachable = near >= 0
+    local_u = np.repeat(u, near.shape[1])[reachable.ravel()]
+    local_o = len(under) + near[reachable]
+    pair_u, pair_o = under[local_u], over[near[reachable]]
+
+    def subset(local: np.ndarray) -> SignalArrays:
+        return SignalArrays(**{name: getattr(signals, name)[local] for name in SIGNAL_FIELDS})
+
+    hw_u, hw_o = _hardware(capabilities, pair_u), _hardware(capabilities, pair_o)
+    u_on_o = score_batch(moved_workload(subset(local_u), hw_u, hw_o), params)
+    o_on_u = score_batch(moved_workload(subset(local_o), hw_o, hw_u), params)
+    viable = (u_on_o["classification"] != _UNDERPOWERED) & (o_on_u["classification"] != _UNDERPOWERED)
+    quality = np.minimum(u_on_o["fit"], o_on_u["fit"])
+
+    pairs: list[tuple[int, int]] = []
+    taken: set[int] = set()
+    for i in np.flatnonzero(viable)[np.argsort(-quality[viable], kind="stable")].tolist():
+        a, b = int(pair_u[i]), int(pair_o[i])
+        if a not in taken and b not in taken:
+            taken.update((a, b))
+            pairs.append((a, b))
+    return pairs
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import sys
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+from pydantic_core import SchemaSerializer, core_schema
+
+from app.schemas import Action, Classification, Recommendation
+
+FIELDS = tuple(Recommendation.model_fields)
+# Rows per chunk of a streamed response.
+STREAM_CHUNK = 1000
+
+# One tuple per distinct set of risk flags, shared by every recommendation carrying it.
+_FLAG_SETS: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+
+def shared_flags(flags: Iterable[str]) -> tuple[str, ...]:
+    flags = tuple(flags)
+    return _FLAG_SETS.setdefault(flags, flags)
+
+
+def shared_reasons(reasons: Iterable[str]) -> tuple[str, ...]:
+    """Reasons quote scores to two decimals, so a fleet repeats the same few hundred strings; intern them."""
+    return tuple(map(sys.intern, reasons))
+
+
+@dataclass(slots=True)
+class CompactRecommendation:
+    """A `Recommendation` held as slots, with its lists as tuples of strings shared across recommendations
+    (see `shared_flags`/`shared_reasons`)."""
+
+    recommendation_id: str
+    tenant_id: str
+    device_key: str
+    run_date: date
+    classification: Classification
+    action: Action
+    confidence: float
+    workload_fit_score: float
+    overprovision_score: float
+    expected_savings_usd_annual: float
+    risk_flags: tuple[str, ...]
+    top_reasons: tuple[str, ...]
+    status: str
+    policy_id: str | None = None
+
+    @classmethod
+    def from_model(cls, rec: Recommendation) -> CompactRecommendation:
+        return cls(
+            rec.recommendation_id,
+            rec.tenant_id,
+            rec.device_key,
+            rec.run_date,
+            rec.classification,
+            rec.action,
+            rec.confidence,
+            rec.workload_fit_score,
+            rec.overprovision_score,
+            rec.expected_savings_usd_annual,
+            shared_flags(rec.risk_flags),
+            shared_reasons(rec.top_reasons),
+            rec.status,
+            rec.policy_id,
+        )
+
+    def to_json(self) -> str:
+        return _ROW.to_json(self).decode()
+
+    def to_model(self) -> Recommendation:
+        values = {name: getattr(self, name) for name in FIELDS}
+        values.update(risk_flags=list(self.risk_flags), top_reasons=list(self.top_reasons))
+        return Recommendation.model_construct(**values)
+
+
+def _row_schema() -> core_schema.CoreSchema:
+    """`Recommendation`'s JSON shape read straight off a CompactRecommendation, so pydantic-core can
+    serialize a whole page in one call without building a model per row."""
+    strings = core_schema.tuple_schema([core_schema.str_schema()], variadic_item_index=0)
+    types = {
+        "run_date": core_schema.date_schema(),
+        "confidence": core_schema.float_schema(),
+        "workload_fit_score": core_schema.float_schema(),
+        "overprovision_score": core_schema.float_schema(),
+        "expected_savings_usd_annual": core_schema.float_schema(),
+        "risk_flags": strings,
+        "top_reasons": strings,
+        "policy_id": core_schema.nullable_schema(core_schema.str_schema()),
+    }
+    # Classification and Action are str enums, which a str schema writes as their values.
+    fields = [core_schema.dataclass_field(name, types.get(name, core_schema.str_schema())) for name in FIELDS]
+    args = core_schema.dataclass_args_schema(CompactRecommendation.__name__, fields)
+    return core_schema.dataclass_schema(CompactRecommendation, args, list(FIELDS))
+
+
+_ROW = SchemaSerializer(_row_schema())
+_ROWS = SchemaSerializer(core_schema.list_schema(_row_schema()))
+
+
+def encode_rows(recs: Iterable[CompactRecommendation]) -> Iterator[bytes]:
+    """Each recommendation as its own JSON object, for callers that pack rows themselves."""
+    for rec in recs:
+        yield _ROW.to_json(rec)
+
+
+def encode_items(recs: list[CompactRecommendation], **fields: Any) -> bytes:
+    """An `{"items": [...], **fields}` document, the shape of the list, simulate and changes responses."""
+    tail = "".join(f",{json.dumps(key)}:{json.dumps(value, separators=(',', ':'))}" for key, value in fields.items())
+    return b'{"items":' + _ROWS.to_json(recs) + f"{tail}}}".encode()
+
+
+def encode_list(recs: list[CompactRecommendation], next_cursor: str | None, **extra: Any) -> bytes:
+    """`RecommendationListOut` JSON (plus `extra` keys, e.g. a simulation's `cache`) without building models."""
+    return encode_items(recs, next_cursor=next_cursor, **extra)
+
+
+def _chunks(recs: Iterable[CompactRecommendation]) -> Iterator[list[CompactRecommendation]]:
+    chunk: list[CompactRecommendation] = []
+    for rec in recs:
+        chunk.append(rec)
+        if len(chunk) == STREAM_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_ndjson(recs: Iterable[CompactRecommendation]) -> Iterator[bytes]:
+    for chunk in _chunks(recs):
+        yield b"\n".join(map(_ROW.to_json, chunk)) + b"\n"
+
+
+def stream_json(recs: Iterable[CompactRecommendation]) -> Iterator[bytes]:
+    """The same document `encode_list` builds with no cursor, emitted a chunk at a time."""
+    yield b'{"items":['
+    separator = b""
+    for chunk in _chunks(recs):
+        yield separator + _ROWS.to_json(chunk)[1:-1]
+        separator = b","
+    yield b'],"next_cursor":null}'
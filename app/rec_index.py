@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from itertools import count
+
+from app.schemas import Recommendation
+
+_Attrs = tuple[str, str, str, str, float]
+
+
+def _keys(attrs: _Attrs) -> list[tuple[str, ...]]:
+    tenant_id, action, classification, status, _ = attrs
+    return [
+        ("tenant", tenant_id),
+        ("action", tenant_id, action),
+        ("classification", tenant_id, classification),
+        ("status", tenant_id, status),
+    ]
+
+
+def _remove_sorted(values: list, item: object) -> None:
+    i = bisect_left(values, item)
+    if i < len(values) and values[i] == item:
+        del values[i]
+
+
+class RecommendationIndex:
+    def __init__(self) -> None:
+        self._next_seq = count()
+        self._seqs: dict[str, int] = {}
+        self._ids: dict[int, str] = {}
+        self._attrs: dict[int, _Attrs] = {}
+        self._postings: dict[tuple[str, ...], list[int]] = {}
+        self._confidence: dict[str, list[tuple[float, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._seqs)
+
+    @staticmethod
+    def _attrs_of(rec: Recommendation) -> _Attrs:
+        return (rec.tenant_id, rec.action.value, rec.classification.value, rec.status, rec.confidence)
+
+    def add(self, rec: Recommendation) -> None:
+        if rec.recommendation_id in self._seqs:
+            self.remove(rec.recommendation_id)
+        seq = next(self._next_seq)
+        attrs = self._attrs_of(rec)
+        self._seqs[rec.recommendation_id] = seq
+        self._ids[seq] = rec.recommendation_id
+        self._attrs[seq] = attrs
+        for key in _keys(attrs):
+            self._postings.setdefault(key, []).append(seq)
+        insort(self._confidence.setdefault(rec.tenant_id, []), (attrs[4], seq))
+
+    def remove(self, recommendation_id: str) -> None:
+        seq = self._seqs.pop(recommendation_id, None)
+        if seq is None:
+            return
+        del self._ids[seq]
+        attrs = self._attrs.pop(seq)
+        for key in _keys(attrs):
+            _remove_sorted(self._postings[key], seq)
+        _remove_sorted(self._confidence[attrs[0]], (attrs[4], seq))
+
+    def update(self, rec: Recommendation) -> None:
+        seq = self._seqs.get(rec.recommendation_id)
+        if seq is None:
+            self.add(rec)
+            return
+        old = self._attrs[seq]
+        new = self._attrs_of(rec)
+        if old == new:
+            return
+        for old_key, new_key in zip(_keys(old), _keys(new)):
+            if old_key != new_key:
+                _remove_sorted(self._postings[old_key], seq)
+                insort(self._postings.setdefault(new_key, []), seq)
+        if old[4] != new[4]:
+            _remove_sorted(self._confidence[old[0]], (old[4], seq))
+            insort(self._confidence.setdefault(new[0], []), (new[4], seq))
+        self._attrs[seq] = new
+
+    def query(
+        self,
+        tenant_id: str,
+        action: str | None = None,
+        classification: str | None = None,
+        status: str | None = None,
+        min_confidence: float | None = None,
+        after: int | None = None,
+        limit: int | None = None,
+    ) -> tuple[list[str], int | None]:
+        candidates = [self._postings.get(("tenant", tenant_id), [])]
+        if action:
+            candidates.append(self._postings.get(("action", tenant_id, action), []))
+        if classification:
+            candidates.append(self._postings.get(("classification", tenant_id, classification), []))
+        if status:
+            candidates.append(self._postings.get(("status", tenant_id, status), []))
+        driver = min(candidates, key=len)
+        if min_confidence is not None:
+            by_confidence = self._confidence.get(tenant_id, [])
+            lo = bisect_left(by_confidence, (min_confidence, -1))
+            if len(by_confidence) - lo < len(driver):
+                driver = sorted(seq for _, seq in by_confidence[lo:])
+
+        wanted = (tenant_id, action or None, classification or None, status or None)
+        start = 0 if after is None else bisect_left(driver, after + 1)
+        ids: list[str] = []
+        for pos in range(start, len(driver)):
+            seq = driver[pos]
+            attrs = self._attrs[seq]
+            if any(w is not None and w != a for w, a in zip(wanted, attrs)):
+                continue
+            if min_confidence is not None and attrs[4] < min_confidence:
+                continue
+            if limit is not None and len(ids) == limit:
+                return ids, self._seqs[ids[-1]]
+            ids.append(self._ids[seq])
+        return ids, None
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+
+from app.capabilities import DeviceCapabilities, apply_vram
+from app.metrics import RECOMMENDATIONS, stage
+from app.rec_changes import stable_recommendation_id
+from app.rec_compact import CompactRecommendation, shared_flags, shared_reasons
+from app.reallocation import swap_pairs
+from app.schemas import Action, Classification
+from app.scoring import (
+    ACTIONS,
+    CLASSIFICATIONS,
+    DEFAULT_SCORING,
+    SCORE_FIELDS,
+    ScoringParams,
+    SignalArrays,
+    SignalSummary,
+    score_batch,
+)
+
+# Annual savings of a downsize, priced per unit of capacity. An 8-core, 32 GB RAM, 8 GB VRAM device
+# comes to the flat figure, which devices without a capability snapshot still get.
+DOWNSIZE_SAVINGS_USD = 1200.0
+SAVINGS_PER_CORE_USD = 60.0
+SAVINGS_PER_RAM_GB_USD = 12.0
+SAVINGS_PER_VRAM_GB_USD = 42.0
+
+_DOWNSIZE = ACTIONS.index(Action.DOWNSIZE)
+_THERMAL = shared_flags(["THERMAL"])
+_NO_FLAGS = shared_flags([])
+
+# Per-device scoring result: SCORE_FIELDS values, classification, action, expected savings.
+ScoreRow = tuple[dict[str, float], Classification, Action, float]
+
+
+def downsize_savings(capabilities: DeviceCapabilities | None, count: int) -> np.ndarray:
+    if capabilities is None:
+        return np.full(count, DOWNSIZE_SAVINGS_USD)
+    priced = (
+        capabilities.cores * SAVINGS_PER_CORE_USD
+        + capabilities.ram_gb * SAVINGS_PER_RAM_GB_USD
+        + capabilities.vram_gb * SAVINGS_PER_VRAM_GB_USD
+    )
+    return np.where(capabilities.known, priced, DOWNSIZE_SAVINGS_USD)
+
+
+def score_rows(
+    summaries: list[SignalSummary],
+    params: ScoringParams = DEFAULT_SCORING,
+    capabilities: DeviceCapabilities | None = None,
+) -> list[ScoreRow]:
+    """`capabilities` rows align with `summaries`."""
+    if not summaries:
+        return []
+    batch = score_batch(apply_vram(SignalArrays.from_summaries(summaries), capabilities), params)
+    savings = np.where(batch["action"] == _DOWNSIZE, downsize_savings(capabilities, len(summaries)), 0.0).tolist()
+    columns = {name: values.tolist() for name, values in batch.items()}
+    return [
+        (
+            {name: columns[name][i] for name in SCORE_FIELDS},
+            CLASSIFICATIONS[columns["classification"][i]],
+            ACTIONS[columns["action"][i]],
+            savings[i],
+        )
+        for i in range(len(summaries))
+    ]
+
+
+def make_recommendation(
+    tenant_id: str,
+    device_key: str,
+    signals: SignalSummary,
+    row: ScoreRow,
+    run_date: date,
+    policy_id: str | None = None,
+    swap_with: str | None = None,
+) -> CompactRecommendation:
+    """`swap_with` names the device this one trades with; the action becomes REALLOCATE. A swap keeps both devices
+    in the fleet, so it saves nothing of the downsize the scores may have priced."""
+    scores, classification, action, savings = row
+    reasons = [
+        f"GPU pressure={scores['gpu_pressure']:.2f}",
+        f"RAM pressure={scores['ram_pressure']:.2f}",
+        f"Disk score={scores['disk_score']:.2f}",
+    ]
+    if swap_with is not None:
+        action = Action.REALLOCATE
+        savings = 0.0
+        reasons.append(f"Swap with {swap_with}")
+    confidence = 0.85
+    if classification == Classification.RIGHT_SIZED:
+        confidence = 0.70
+    if action == Action.DOWNSIZE and scores["overprov"] > 80:
+        confidence = 0.90
+
+    return CompactRecommendation(
+        recommendation_id=stable_recommendation_id(tenant_id, device_key, policy_id),
+        tenant_id=tenant_id,
+        device_key=device_key,
+        run_date=run_date,
+        classification=classification,
+        action=action,
+        confidence=confidence,
+        workload_fit_score=round(scores["fit"], 2),
+        overprovision_score=round(scores["overprov"], 2),
+        expected_savings_usd_annual=savings,
+        risk_flags=_THERMAL if signals.thermal_throttle_events > 3 else _NO_FLAGS,
+        top_reasons=shared_reasons(reasons),
+        status="PENDING" if action != Action.EXTEND_LIFE else "NO_ACTION",
+        policy_id=policy_id,
+    )
+
+
+def build_recommendations(
+    tenant_id: str,
+    summaries: dict[str, SignalSummary],
+    run_date: date | None = None,
+    params: ScoringParams = DEFAULT_SCORING,
+    capabilities: DeviceCapabilities | None = None,
+) -> list[CompactRecommendation]:
+    """`capabilities` rows align with `summaries` in iteration order. With capabilities, underpowered and
+    overprovisioned devices that could trade hardware (`swap_pairs`) are recommended to REALLOCATE."""
+    if not summaries:
+        return []
+    run_date = run_date or date.today()
+    values = list(summaries.values())
+    with stage("scoring"):
+        rows = score_rows(values, params, capabilities)
+    device_keys = list(summaries)
+    swaps: dict[str, str] = {}
+    if capabilities is not None and capabilities.known.any():
+        with stage("reallocation"):
+            for a, b in swap_pairs(values, [row[1] for row in rows], capabilities, params):
+                swaps[device_keys[a]] = device_keys[b]
+                swaps[device_keys[b]] = device_keys[a]
+    with stage("models"):
+        recs = [
+            make_recommendation(tenant_id, device_key, signals, row, run_date, swap_with=swaps.get(device_key))
+            for (device_key, signals), row in zip(summaries.items(), rows)
+        ]
+    RECOMMENDATIONS.inc(amount=len(recs))
+    return recs
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections import Counter
+from datetime import date
+
+import numpy as np
+
+from app.aggregation import BACKENDS, summarize_devices
+from app.rec_compact import CompactRecommendation
+from app.recommend import build_recommendations
+from app.scoring import SignalSummary
+from app.segments import SegmentArchive
+from app.telemetry_store import COLUMNS
+
+
+class SegmentSeries:
+    """DeviceSeries look-alike whose columns are slices of arrays decoded from segments."""
+
+    __slots__ = ("device_key", "app_minutes", *(name for name, _ in COLUMNS))
+
+    def __len__(self) -> int:
+        return len(self.observed_at)
+
+
+def load_series(
+    archive: SegmentArchive, tenant_id: str, start: date | None = None, end: date | None = None
+) -> dict[str, SegmentSeries]:
+    days = [d for d in archive.days(tenant_id) if (start is None or d >= start) and (end is None or d <= end)]
+    if not days:
+        return {}
+    records = np.concatenate([archive.records(tenant_id, d) for d in days])
+    apps = np.concatenate([archive.apps(tenant_id, d) for d in days])
+    strings = archive.strings(tenant_id)
+
+    order = np.argsort(records["device"], kind="stable")
+    device_ids, starts = np.unique(records["device"][order], return_index=True)
+    bounds = np.append(starts, len(order)).tolist()
+    columns = {name: np.ascontiguousarray(records[name][order]) for name, _ in COLUMNS}
+
+    pairs = (apps["device"].astype(np.uint64) << np.uint64(32)) | apps["category"]
+    keys, inverse = np.unique(pairs, return_inverse=True)
+    minutes = np.bincount(inverse, weights=apps["minutes"], minlength=len(keys)).astype(np.int64).tolist()
+    app_minutes: dict[int, dict[str, int]] = {}
+    for key, total in zip(keys.tolist(), minutes):
+        app_minutes.setdefault(key >> 32, {})[strings[key & 0xFFFFFFFF]] = total
+
+    result: dict[str, SegmentSeries] = {}
+    for i, device in enumerate(device_ids.tolist()):
+        series = SegmentSeries()
+        series.device_key = strings[device]
+        series.app_minutes = app_minutes.get(device, {})
+        for name, values in columns.items():
+            setattr(series, name, values[bounds[i] : bounds[i + 1]])
+        result[series.device_key] = series
+    return result
+
+
+def replay_signals(
+    archive: SegmentArchive,
+    tenant_id: str,
+    start: date | None = None,
+    end: date | None = None,
+    backend: str = "numpy",
+) -> dict[str, SignalSummary]:
+    return summarize_devices(load_series(archive, tenant_id, start, end), backend=backend)
+
+
+def replay_recommendations(
+    archive: SegmentArchive,
+    tenant_id: str,
+    start: date | None = None,
+    end: date | None = None,
+    backend: str = "numpy",
+) -> list[CompactRecommendation]:
+    return build_recommendations(tenant_id, replay_signals(archive, tenant_id, start, end, backend))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-run aggregation and scoring from raw telemetry segments.")
+    parser.add_argument("root", help="segment archive directory")
+    parser.add_argument("--tenant", action="append", help="tenant to replay (default: all)")
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    parser.add_argument("--backend", choices=BACKENDS, default="numpy")
+    args = parser.parse_args()
+
+    archive = SegmentArchive(args.root)
+    report = {}
+    for tenant_id in args.tenant or archive.tenants():
+        started = time.perf_counter()
+        recs = replay_recommendations(archive, tenant_id, args.start, args.end, args.backend)
+        report[tenant_id] = {
+            "devices": len(recs),
+            "seconds": time.perf_counter() - started,
+            "classification": Counter(r.classification.value for r in recs),
+            "action": Counter(r.action.value for r in recs),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
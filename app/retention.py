@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from app.metrics import COMPACTED_ITEMS, COMPACTION_RECLAIMED_BYTES
+from app.rollups import DailyRollupStore
+from app.telemetry_store import DeviceSeries
+
+if TYPE_CHECKING:
+    from app.storage import InMemoryStore
+
+# Raw 5-minute samples are kept this many days (counting the tenant's latest day); older days live on only
+# as daily rollups, which are kept for the blueprint's 24 months.
+RAW_RETENTION_DAYS = 14
+SUMMARY_RETENTION_DAYS = 730
+# Devices compacted per hold of the tenant lock.
+DEVICES_PER_STEP = 64
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_log = logging.getLogger(__name__)
+_DAY_S = 86400.0
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    raw_days: int = RAW_RETENTION_DAYS
+    summary_days: int = SUMMARY_RETENTION_DAYS
+
+    def __post_init__(self) -> None:
+        if not 0 < self.raw_days <= self.summary_days:
+            raise ValueError("retention needs 0 < raw_days <= summary_days")
+
+    @classmethod
+    def from_env(cls) -> RetentionPolicy:
+        return cls(
+            int(os.environ.get("ITAM_RAW_RETENTION_DAYS", RAW_RETENTION_DAYS)),
+            int(os.environ.get("ITAM_SUMMARY_RETENTION_DAYS", SUMMARY_RETENTION_DAYS)),
+        )
+
+    def cutoffs(self, as_of: date) -> tuple[date, date]:
+        """The first raw day and the first summary day kept when the latest day is `as_of`."""
+        return as_of - timedelta(days=self.raw_days - 1), as_of - timedelta(days=self.summary_days - 1)
+
+
+_SUMMED_FIELDS = (
+    "tenants",
+    "devices",
+    "steps",
+    "raw_records",
+    "raw_bytes",
+    "summaries",
+    "summary_bytes",
+    "sketches",
+    "sketch_bytes",
+)
+
+
+@dataclass
+class CompactionReport:
+    tenants: int = 0
+    devices: int = 0
+    steps: int = 0
+    raw_records: int = 0
+    raw_bytes: int = 0
+    summaries: int = 0
+    summary_bytes: int = 0
+    # Rollups past the raw tier whose exact quantiles became bounded sketches, and the bytes that freed.
+    sketches: int = 0
+    sketch_bytes: int = 0
+    seconds: float = 0.0
+    # Longest single hold of the tenant lock: how long a concurrent ingest could have waited.
+    max_step_ms: float = 0.0
+
+    @property
+    def reclaimed_bytes(self) -> int:
+        return self.raw_bytes + self.summary_bytes + self.sketch_bytes
+
+    @property
+    def records_per_s(self) -> float:
+        return self.raw_records / self.seconds if self.seconds else 0.0
+
+    def add(self, other: CompactionReport) -> None:
+        for name in _SUMMED_FIELDS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.seconds += other.seconds
+        self.max_step_ms = max(self.max_step_ms, other.max_step_ms)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            **{name: getattr(self, name) for name in self.__dataclass_fields__},
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "records_per_s": self.records_per_s,
+        }
+
+
+def raw_cutoff(day: date) -> float:
+    """Midnight UTC starting `day`, the boundary `summary_date` puts between rollup days."""
+    return datetime(day.year, day.month, day.day, tzinfo=UTC).timestamp()
+
+
+def retained_app_minutes(
+    rollups: DailyRollupStore, tenant_id: str, device_key: str, series: DeviceSeries
+) -> dict[str, int]:
+    """The series' app-category totals rebuilt from the daily rollups of the days it still holds."""
+    days = np.unique(np.floor_divide(np.frombuffer(series.observed_at, dtype=np.float64), _DAY_S))
+    minutes: dict[str, int] = {}
+    for ordinal in days.astype(np.int64).tolist():
+        rollup = rollups.get(tenant_id, device_key, date.fromordinal(_EPOCH_ORDINAL + ordinal))
+        if rollup is not None:
+            for category, value in rollup.app_minutes.items():
+                minutes[category] = minutes.get(category, 0) + value
+    return minutes
+
+
+def record(report: CompactionReport) -> None:
+    COMPACTED_ITEMS.inc("raw", amount=report.raw_records)
+    COMPACTED_ITEMS.inc("summary", amount=report.summaries)
+    COMPACTION_RECLAIMED_BYTES.inc("raw", amount=report.raw_bytes)
+    COMPACTION_RECLAIMED_BYTES.inc("summary", amount=report.summary_bytes)
+    COMPACTION_RECLAIMED_BYTES.inc("sketch", amount=report.sketch_bytes)
+
+
+class Compactor:
+    """Enforces a RetentionPolicy on a store, a few devices at a time.
+
+    Each step takes the tenant's lock for DEVICES_PER_STEP devices only, so ingestion interleaves
+    with a long pass instead of waiting for it. Age is measured from each tenant's latest telemetry day,
+    the same anchor the rolling windows use, so a replayed or paused tenant is not emptied by the clock.
+    """
+
+    def __init__(
+        self, store: InMemoryStore, policy: RetentionPolicy | None = None, devices_per_step: int = DEVICES_PER_STEP
+    ) -> None:
+        if devices_per_step <= 0:
+            raise ValueError("devices_per_step must be positive")
+        self.store = store
+        self.policy = policy or RetentionPolicy()
+        self.devices_per_step = devices_per_step
+        self.last: CompactionReport | None = None
+        self.totals = CompactionReport()
+        self.passes = 0
+        self.failed = 0
+        self.last_error: str | None = None
+        self.interval_s: float | None = None
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def run_once(self, tenant_id: str | None = None) -> CompactionReport:
+        """One pass over every tenant (or just `tenant_id`)."""
+        with self._run_lock:
+            report = CompactionReport()
+            started = time.perf_counter()
+            tenants = [tenant_id]
+            if tenant_id is None:
+                tenants = sorted({*self.store.rollups.tenants(), *self.store.telemetry})
+            for tenant in tenants:
+                as_of = self.store.rollups.latest_day(tenant)
+                if as_of is None:
+                    continue
+                raw_before, summaries_before = self.policy.cutoffs(as_of)
+                device_keys = list({*self.store.telemetry.devices(tenant), *self.store.rollups.devices(tenant)})
+                report.tenants += 1
+                for start in range(0, len(device_keys), self.devices_per_step):
+                    chunk = device_keys[start : start + self.devices_per_step]
+                    step_started = time.perf_counter()
+                    report.add(self.store.compact_devices(tenant, chunk, raw_before, summaries_before))
+                    report.max_step_ms = max(report.max_step_ms, (time.perf_counter() - step_started) * 1000)
+            report.seconds = time.perf_counter() - started
+            record(report)
+            self.last = report
+            self.totals.add(report)
+            self.passes += 1
+            return report
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.run_once()
+            except Exception as exc:
+                # One bad pass must not end the loop; the next interval tries again.
+                self.failed += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                _log.exception("compaction pass failed")
+
+    def start(self, interval_s: float) -> bool:
+        """Run a pass every `interval_s` seconds on a background thread; False if one is already running."""
+        if self.running:
+            return False
+        self.interval_s = interval_s
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="compactor", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> bool:
+        if not self.running:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return True
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "interval_s": self.interval_s,
+            "raw_days": self.policy.raw_days,
+            "summary_days": self.policy.summary_days,
+            "passes": self.passes,
+            "failed": self.failed,
+            "last_error": self.last_error,
+            "last": self.last.as_dict() if self.last else None,
+            "totals": self.totals.as_dict(),
+        }
@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from collections.abc import Callable, Collection, Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime
+from operator import attrgetter
+
+import numpy as np
+
+from app.aggregation import DEFAULT_VRAM_MB, SAMPLE_MINUTES, light_app_mix
+from app.metrics import stage
+from app.schemas import TelemetryBatchIn, TelemetryRecord, as_utc
+from app.scoring import SignalSummary
+from app.sketches import ExactQuantiles, SketchFactory, from_bytes, merge_sketches
+
+P95 = 0.95
+SKETCHED_METRICS = ("gpu_util", "vram_used_mb", "cpu_util", "ram_used", "disk_latency", "disk_queue")
+EXACT_SKETCHES = SketchFactory("exact")
+COUNTER_FIELDS = (
+    "samples",
+    "gpu_active_minutes",
+    "paging_pressure_minutes",
+    "disk_busy_minutes",
+    "thermal_throttle_events",
+    "interactive_ratio_sum",
+    "vdi_samples",
+    "battery_samples",
+)
+
+Counters = tuple[tuple[float, ...], dict[str, int]]
+
+
+def summary_date(observed_at: datetime) -> date:
+    """The UTC day of a sample; naive timestamps are UTC, as `TelemetryRecord` validation makes them."""
+    return as_utc(observed_at).date()
+
+
+class DailyRollup:
+    __slots__ = (
+        "summary_date",
+        "samples",
+        "gpu_active_minutes",
+        "paging_pressure_minutes",
+        "disk_busy_minutes",
+        "thermal_throttle_events",
+        "interactive_ratio_sum",
+        "vdi_samples",
+        "battery_samples",
+        "app_minutes",
+        "sketches_bounded",
+        *SKETCHED_METRICS,
+    )
+
+    def __init__(self, day: date | None, sketch_factory: SketchFactory = EXACT_SKETCHES) -> None:
+        self.summary_date = day
+        self.samples = 0
+        self.gpu_active_minutes = 0
+        self.paging_pressure_minutes = 0
+        self.disk_busy_minutes = 0.0
+        self.thermal_throttle_events = 0
+        self.interactive_ratio_sum = 0.0
+        self.vdi_samples = 0
+        self.battery_samples = 0
+        self.app_minutes: dict[str, int] = {}
+        self.sketches_bounded = False
+        for name in SKETCHED_METRICS:
+            setattr(self, name, sketch_factory(name))
+
+    def add(self, r: TelemetryRecord) -> None:
+        self.samples += 1
+        self.gpu_active_minutes += r.gpu.active_minutes
+        self.paging_pressure_minutes += r.ram.paging_pressure
+        self.disk_busy_minutes += (r.disk.busy_pct / 100.0) * SAMPLE_MINUTES
+        self.thermal_throttle_events += r.thermal.throttle_event
+        self.interactive_ratio_sum += r.session.interactive_ratio
+        self.vdi_samples += r.session.vdi
+        self.battery_samples += r.thermal.on_battery
+        self.gpu_util.add(r.gpu.util_pct)
+        self.vram_used_mb.add(r.gpu.vram_used_mb)
+        self.cpu_util.add(r.cpu.util_pct)
+        self.ram_used.add(r.ram.used_pct)
+        self.disk_latency.add(r.disk.latency_ms)
+        self.disk_queue.add(r.disk.queue_len)
+        minutes = self.app_minutes
+        for a in r.apps:
+            category = a.category.upper()
+            minutes[category] = minutes.get(category, 0) + a.active_minutes
+
+    def merge(self, other: DailyRollup) -> DailyRollup:
+        self.samples += other.samples
+        self.gpu_active_minutes += other.gpu_active_minutes
+        self.paging_pressure_minutes += other.paging_pressure_minutes
+        self.disk_busy_minutes += other.disk_busy_minutes
+        self.thermal_throttle_events += other.thermal_throttle_events
+        self.interactive_ratio_sum += other.interactive_ratio_sum
+        self.vdi_samples += other.vdi_samples
+        self.battery_samples += other.battery_samples
+        for category, minutes in other.app_minutes.items():
+            self.app_minutes[category] = self.app_minutes.get(category, 0) + minutes
+        for name in SKETCHED_METRICS:
+            setattr(self, name, merge_sketches(getattr(self, name), getattr(other, name)))
+        return self
+
+    def bound_sketches(self, sketch_factory: SketchFactory) -> int:
+        """Swap each exact quantile sketch for `sketch_factory`'s bounded one where that is smaller (a sparse day's
+        few samples can take less room than histogram bins); returns the bytes freed."""
+        freed = 0
+        for name in SKETCHED_METRICS:
+            sketch = getattr(self, name)
+            bounded = sketch_factory.bound(name, sketch)
+            if bounded.nbytes() < sketch.nbytes():
+                freed += sketch.nbytes() - bounded.nbytes()
+                setattr(self, name, bounded)
+        self.sketches_bounded = True
+        return freed
+
+    def counters(self) -> Counters:
+        return tuple(getattr(self, name) for name in COUNTER_FIELDS), dict(self.app_minutes)
+
+    def apply_counters(self, counters: Counters, sign: int = 1) -> None:
+        values, app_minutes = counters
+        for name, value in zip(COUNTER_FIELDS, values):
+            setattr(self, name, getattr(self, name) + sign * value)
+        for category, minutes in app_minutes.items():
+            total = self.app_minutes.get(category, 0) + sign * minutes
+            if total:
+                self.app_minutes[category] = total
+            else:
+                self.app_minutes.pop(category, None)
+
+    def nbytes(self) -> int:
+        return (
+            sys.getsizeof(self)
+            + sys.getsizeof(self.app_minutes)
+            + sum(getattr(self, name).nbytes() for name in SKETCHED_METRICS)
+        )
+
+    def to_signals(self, vram_mb: float = DEFAULT_VRAM_MB) -> SignalSummary:
+        # The VRAM percentage is monotone in MB, so its p95 is the transformed p95 sample.
+        vram_p95_mb = self.vram_used_mb.quantile(P95)
+        return SignalSummary(
+            gpu_util_p95=self.gpu_util.quantile(P95),
+            vram_used_p95_pct=min(100.0, vram_p95_mb / vram_mb * 100.0),
+            cpu_util_p95=self.cpu_util.quantile(P95),
+            ram_used_p95=self.ram_used.quantile(P95),
+            paging_pressure_minutes=self.paging_pressure_minutes,
+            disk_latency_p95_ms=self.disk_latency.quantile(P95),
+            disk_busy_minutes=self.disk_busy_minutes,
+            disk_queue_p95=self.disk_queue.quantile(P95),
+            thermal_throttle_events=self.thermal_throttle_events,
+            active_minutes=self.gpu_active_minutes,
+            light_app_mix_factor=light_app_mix(self.app_minutes),
+            vram_used_p95_mb=vram_p95_mb,
+        )
+
+
+def merge_rollups(rollups: Iterable[DailyRollup], sketch_factory: SketchFactory = EXACT_SKETCHES) -> DailyRollup:
+    merged = DailyRollup(None, sketch_factory)
+    for rollup in rollups:
+        merged.merge(rollup)
+    return merged
+
+
+_COUNTERS = attrgetter(*COUNTER_FIELDS)
+_SKETCHES = attrgetter(*SKETCHED_METRICS)
+_VALUES = attrgetter("values")
+_EXACT = (ExactQuantiles,) * len(SKETCHED_METRICS)
+_NO_VALUES = array("d")
+
+
+@dataclass
+class RollupSnapshot:
+    """Devices' rollups copied out under the tenant lock, for another process to merge and summarize.
+
+    Exact sketches travel columnar: per metric, every rollup's samples as one byte string and each rollup's
+    sample count (0 where the rollup's sketches are not all exact). Those rollups carry each sketch's
+    `to_bytes` instead. Capturing is a few C-level passes over the rollups, a fraction of what merging them
+    and taking quantiles costs.
+    """
+
+    sketch_factory: SketchFactory
+    device_keys: list[str]
+    rollup_counts: list[int]
+    counters: list[tuple[float, ...]]
+    app_minutes: list[dict[str, int]]
+    lengths: dict[str, bytes]
+    samples: dict[str, bytes]
+    bounded: dict[int, list[bytes]]
+
+    @classmethod
+    def capture(
+        cls, devices: Mapping[str, Sequence[DailyRollup]], sketch_factory: SketchFactory = EXACT_SKETCHES
+    ) -> RollupSnapshot:
+        device_keys: list[str] = []
+        rollup_counts: list[int] = []
+        rollups: list[DailyRollup] = []
+        for device_key, selected in devices.items():
+            if selected:
+                device_keys.append(device_key)
+                rollup_counts.append(len(selected))
+                rollups.extend(selected)
+        sketches = list(map(_SKETCHES, rollups))
+        columns = list(zip(*sketches)) or [()] * len(SKETCHED_METRICS)
+        bounded: dict[int, list[bytes]] = {}
+        if any(set(map(type, column)) - {ExactQuantiles} for column in columns):
+            bounded = {
+                i: [sketch.to_bytes() for sketch in row]
+                for i, row in enumerate(sketches)
+                if tuple(map(type, row)) != _EXACT
+            }
+        lengths: dict[str, bytes] = {}
+        samples: dict[str, bytes] = {}
+        for name, column in zip(SKETCHED_METRICS, columns):
+            if bounded:
+                values = [_NO_VALUES if i in bounded else sketch.values for i, sketch in enumerate(column)]
+            else:
+                values = list(map(_VALUES, column))
+            lengths[name] = array("q", map(len, values)).tobytes()
+            samples[name] = b"".join(values)
+        return cls(
+            sketch_factory,
+            device_keys,
+            rollup_counts,
+            list(map(_COUNTERS, rollups)),
+            [dict(r.app_minutes) for r in rollups],
+            lengths,
+            samples,
+            bounded,
+        )
+
+    def summarize(self) -> dict[str, SignalSummary]:
+        """What `DailyRollupStore.summarize` gives for the captured rollups, each device's merged in order."""
+        counters = list(zip(*self.counters))
+        ends = {
+            name: [0, *np.cumsum(np.frombuffer(self.lengths[name], dtype=np.int64)).tolist()]
+            for name in SKETCHED_METRICS
+        }
+        samples = {name: np.frombuffer(self.samples[name], dtype=np.float64) for name in SKETCHED_METRICS}
+        signals: dict[str, SignalSummary] = {}
+        first = 0
+        for device_key, count in zip(self.device_keys, self.rollup_counts):
+            last = first + count
+            merged = DailyRollup(None, self.sketch_factory)
+            # Sums from zero in rollup order, as merging does, so float counters come out bit for bit.
+            for name, column in zip(COUNTER_FIELDS, counters):
+                setattr(merged, name, sum(column[first:last], getattr(merged, name)))
+            app_minutes = merged.app_minutes
+            for minutes in self.app_minutes[first:last]:
+                for category, n in minutes.items():
+                    app_minutes[category] = app_minutes.get(category, 0) + n
+            # A device's exact samples are contiguous per metric; sketches come out the same in any merge order.
+            for name in SKETCHED_METRICS:
+                if ends[name][last] > ends[name][first]:
+                    getattr(merged, name).extend(samples[name][ends[name][first] : ends[name][last]])
+            if self.bounded:
+                for i in range(first, last):
+                    encoded = self.bounded.get(i)
+                    if encoded is not None:
+                        for name, data in zip(SKETCHED_METRICS, encoded):
+                            setattr(merged, name, merge_sketches(getattr(merged, name), from_bytes(data)))
+            signals[device_key] = merged.to_signals()
+            first = last
+        return signals
+
+
+RollupListener = Callable[[str, set[tuple[str, date]]], None]
+
+
+class DailyRollupStore:
+    def __init__(self, sketch_factory: SketchFactory = EXACT_SKETCHES) -> None:
+        self.sketch_factory = sketch_factory
+        self._tenants: dict[str, dict[str, dict[date, DailyRollup]]] = {}
+        self._latest: dict[str, date] = {}
+        self._listeners: list[RollupListener] = []
+
+    def subscribe(self, listener: RollupListener) -> None:
+        self._listeners.append(listener)
+
+    def add_batch(self, payload: TelemetryBatchIn) -> int:
+        devices = self._tenants.setdefault(payload.tenant_id, {})
+        touched: set[tuple[str, date]] = set()
+        for r in payload.records:
+            days = devices.setdefault(r.device_key, {})
+            day = summary_date(r.observed_at)
+            rollup = days.get(day)
+            if rollup is None:
+                rollup = days[day] = DailyRollup(day, self.sketch_factory)
+            rollup.add(r)
+            touched.add((r.device_key, day))
+        if touched:
+            latest = max(day for _, day in touched)
+            current = self._latest.get(payload.tenant_id)
+            if current is None or latest > current:
+                self._latest[payload.tenant_id] = latest
+            for listener in self._listeners:
+                listener(payload.tenant_id, touched)
+        return len(payload.records)
+
+    def stage_batch(self, payload: TelemetryBatchIn) -> dict[tuple[str, date], DailyRollup]:
+        """The rollups `add_batch` would leave at the batch's (device, day) keys, built on copies; the store is
+        unchanged."""
+        devices = self._tenants.get(payload.tenant_id, {})
+        staged: dict[tuple[str, date], DailyRollup] = {}
+        for r in payload.records:
+            day = summary_date(r.observed_at)
+            rollup = staged.get((r.device_key, day))
+            if rollup is None:
+                rollup = staged[(r.device_key, day)] = DailyRollup(day, self.sketch_factory)
+                current = devices.get(r.device_key, {}).get(day)
+                if current is not None:
+                    rollup.merge(current).sketches_bounded = current.sketches_bounded
+            rollup.add(r)
+        return staged
+
+    def put(self, tenant_id: str, device_key: str, rollup: DailyRollup) -> None:
+        self._tenants.setdefault(tenant_id, {}).setdefault(device_key, {})[rollup.summary_date] = rollup
+        current = self._latest.get(tenant_id)
+        if current is None or rollup.summary_date > current:
+            self._latest[tenant_id] = rollup.summary_date
+
+    def drop_before(
+        self, tenant_id: str, cutoff: date, device_keys: Iterable[str]
+    ) -> list[tuple[str, DailyRollup]]:
+        """Remove the devices' rollups for days before `cutoff` and tell listeners which keys went."""
+        devices = self._tenants.get(tenant_id, {})
+        dropped: list[tuple[str, DailyRollup]] = []
+        touched: set[tuple[str, date]] = set()
+        for device_key in device_keys:
+            days = devices.get(device_key)
+            if not days:
+                continue
+            for day in [d for d in days if d < cutoff]:
+                dropped.append((device_key, days.pop(day)))
+                touched.add((device_key, day))
+            if not days:
+                del devices[device_key]
+        if touched:
+            for listener in self._listeners:
+                listener(tenant_id, touched)
+        return dropped
+
+    def bound_before(
+        self, tenant_id: str, cutoff: date, device_keys: Iterable[str]
+    ) -> tuple[list[tuple[str, DailyRollup]], int]:
+        """Bound the exact sketches of the devices' rollups for days before `cutoff`, tell listeners which keys
+        changed, and return those rollups with the bytes freed."""
+        devices = self._tenants.get(tenant_id, {})
+        bounded: list[tuple[str, DailyRollup]] = []
+        touched: set[tuple[str, date]] = set()
+        freed = 0
+        for device_key in device_keys:
+            for day, rollup in devices.get(device_key, {}).items():
+                if day >= cutoff or rollup.sketches_bounded:
+                    continue
+                saved = rollup.bound_sketches(self.sketch_factory)
+                if saved:
+                    freed += saved
+                    bounded.append((device_key, rollup))
+                    touched.add((device_key, day))
+        if touched:
+            for listener in self._listeners:
+                listener(tenant_id, touched)
+        return bounded, freed
+
+    def tenants(self) -> list[str]:
+        return list(self._tenants)
+
+    def latest_day(self, tenant_id: str) -> date | None:
+        return self._latest.get(tenant_id)
+
+    def devices(self, tenant_id: str) -> dict[str, dict[date, DailyRollup]]:
+        return self._tenants.get(tenant_id, {})
+
+    def get(self, tenant_id: str, device_key: str, day: date) -> DailyRollup | None:
+        return self.devices(tenant_id).get(device_key, {}).get(day)
+
+    def summary_count(self, tenant_id: str) -> int:
+        return sum(len(days) for days in list(self.devices(tenant_id).values()))
+
+    def merged(
+        self,
+        tenant_id: str,
+        start: date | None = None,
+        end: date | None = None,
+        device_keys: Collection[str] | None = None,
+    ) -> dict[str, DailyRollup]:
+        devices = self.devices(tenant_id)
+        if device_keys is not None:
+            devices = {k: devices[k] for k in device_keys if k in devices}
+        result: dict[str, DailyRollup] = {}
+        for device_key, days in devices.items():
+            selected = [
+                r for day, r in days.items() if (start is None or day >= start) and (end is None or day <= end)
+            ]
+            if selected:
+                result[device_key] = merge_rollups(selected, self.sketch_factory)
+        return result
+
+    def sketch_bytes(self, tenant_id: str | None = None) -> int:
+        tenants = [tenant_id] if tenant_id is not None else list(self._tenants)
+        return sum(
+            getattr(r, name).nbytes()
+            for t in tenants
+            for days in list(self._tenants.get(t, {}).values())
+            for r in list(days.values())
+            for name in SKETCHED_METRICS
+        )
+
+    def summarize(
+        self,
+        tenant_id: str,
+        start: date | None = None,
+        end: date | None = None,
+        device_keys: Collection[str] | None = None,
+    ) -> dict[str, SignalSummary]:
+        with stage("grouping"):
+            merged = self.merged(tenant_id, start, end, device_keys)
+        with stage("percentiles"):
+            return {device_key: r.to_signals() for device_key, r in merged.items()}
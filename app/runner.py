@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+from app.aggregation import summarize_devices
+from app.capabilities import DeviceCapabilities
+from app.rec_compact import CompactRecommendation
+from app.recommend import build_recommendations
+from app.rollups import RollupSnapshot
+from app.telemetry_store import SeriesSnapshot
+
+if TYPE_CHECKING:
+    from multiprocessing.context import BaseContext
+    from multiprocessing.pool import AsyncResult, Pool
+
+    from app.storage import InMemoryStore
+
+
+def shard_of(device_key: str, shards: int) -> int:
+    return zlib.crc32(device_key.encode()) % shards
+
+
+def shard_devices(device_keys: list[str], shards: int) -> list[list[str]]:
+    buckets: list[list[str]] = [[] for _ in range(shards)]
+    for device_key in device_keys:
+        buckets[shard_of(device_key, shards)].append(device_key)
+    return buckets
+
+
+@dataclass
+class ShardTiming:
+    shard: int
+    devices: int
+    snapshot_s: float
+    signals_s: float
+    scoring_s: float
+    pid: int
+
+
+@dataclass
+class RecommendationRun:
+    run_id: str
+    tenant_id: str
+    workers: int
+    shards: int
+    started_at: datetime
+    finished_at: datetime | None = None
+    devices: int = 0
+    elapsed_s: float = 0.0
+    merge_s: float = 0.0
+    changed: int = 0
+    shard_timings: list[ShardTiming] = field(default_factory=list)
+
+    @property
+    def devices_per_s(self) -> float:
+        return self.devices / self.elapsed_s if self.elapsed_s else 0.0
+
+
+def _score_shard(
+    tenant_id: str,
+    snapshot: RollupSnapshot | SeriesSnapshot,
+    backend: str,
+    capabilities: DeviceCapabilities,
+    shard: int,
+    run_date: date,
+    snapshot_s: float,
+) -> tuple[ShardTiming, list[CompactRecommendation]]:
+    """Summarize and score one shard from its snapshot, in a worker process."""
+    started = time.perf_counter()
+    if isinstance(snapshot, RollupSnapshot):
+        summaries = snapshot.summarize()
+    else:
+        summaries = summarize_devices(snapshot.devices(), backend=backend)
+    scoring_started = time.perf_counter()
+    recs = build_recommendations(tenant_id, summaries, run_date, capabilities=capabilities)
+    finished = time.perf_counter()
+    timing = ShardTiming(
+        shard, len(summaries), snapshot_s, scoring_started - started, finished - scoring_started, os.getpid()
+    )
+    return timing, recs
+
+
+def _pool_context() -> BaseContext:
+    """forkserver where the platform has it, else spawn; never a fork of this process.
+
+    The API process has request threads, and forking it can copy a lock (a metrics histogram's, the change
+    feed's, the allocator's) in its held state into a child that then deadlocks on it. Forkserver workers fork
+    from a single-threaded server that preloads the scoring modules, so pool start-up stays cheap.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class RecommendationRunner:
+    """Scores a tenant's devices in shards.
+
+    With one worker, each shard is summarized and scored in this process under the tenant lock. With more,
+    each shard's rollups (or raw columns) are copied under the lock into a snapshot, and a process pool kept
+    for the runner's lifetime summarizes and scores it, while the next shard is copied. `close` stops the pool.
+    """
+
+    def __init__(self, store: InMemoryStore, workers: int | None = None, shards: int | None = None) -> None:
+        self.store = store
+        self.workers = workers or os.cpu_count() or 1
+        self.shards = shards or self.workers * 4
+        self._pool: Pool | None = None
+        self._pool_lock = threading.Lock()
+
+    def _worker_pool(self) -> Pool:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = _pool_context().Pool(self.workers)
+            return self._pool
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+
+    def _score_in_process(
+        self, tenant_id: str, window_days: int | None, keys: list[str], shard: int, run_date: date
+    ) -> tuple[ShardTiming, list[CompactRecommendation]]:
+        started = time.perf_counter()
+        with self.store.tenant_lock(tenant_id):
+            summaries = self.store.device_signals(tenant_id, window_days, device_keys=keys)
+            capabilities = self.store.capabilities.columns(tenant_id, list(summaries))
+        scoring_started = time.perf_counter()
+        recs = build_recommendations(tenant_id, summaries, run_date, capabilities=capabilities)
+        finished = time.perf_counter()
+        timing = ShardTiming(
+            shard, len(summaries), 0.0, scoring_started - started, finished - scoring_started, os.getpid()
+        )
+        return timing, recs
+
+    def run(
+        self, tenant_id: str, window_days: int | None = None
+    ) -> tuple[RecommendationRun, list[CompactRecommendation]]:
+        run = RecommendationRun(str(uuid4()), tenant_id, self.workers, self.shards, datetime.now(UTC))
+        started = time.perf_counter()
+        lock = self.store.tenant_lock(tenant_id)
+        with lock:
+            if window_days is not None:
+                self.store.windows.window(tenant_id, window_days)
+            buckets = shard_devices(self.store.device_keys(tenant_id), self.shards)
+        run_date = date.today()
+
+        results: list[tuple[ShardTiming, list[CompactRecommendation]]] = []
+        if self.workers == 1:
+            for shard, keys in enumerate(buckets):
+                results.append(self._score_in_process(tenant_id, window_days, keys, shard, run_date))
+        else:
+            # The lock is held only to copy a shard out; ingestion interleaves between shards, and workers
+            # summarize one shard while the next is copied.
+            pool = self._worker_pool()
+            pending: list[AsyncResult] = []
+            for shard, keys in enumerate(buckets):
+                snapshot_started = time.perf_counter()
+                with lock:
+                    snapshot = self.store.signal_snapshot(tenant_id, window_days, device_keys=keys)
+                    capabilities = self.store.capabilities.columns(tenant_id, snapshot.device_keys)
+                args = (
+                    tenant_id,
+                    snapshot,
+                    self.store.aggregation_backend,
+                    capabilities,
+                    shard,
+                    run_date,
+                    time.perf_counter() - snapshot_started,
+                )
+                pending.append(pool.apply_async(_score_shard, args))
+            results.extend(result.get() for result in pending)
+
+        merge_started = time.perf_counter()
+        recommendations: list[CompactRecommendation] = []
+        for timing, recs in results:
+            run.shard_timings.append(timing)
+            recommendations.extend(recs)
+        changes, recommendations = self.store.upsert_recommendations(tenant_id, None, recommendations, run.run_id)
+        finished = time.perf_counter()
+        run.merge_s = finished - merge_started
+        run.elapsed_s = finished - started
+        run.devices = len(recommendations)
+        run.changed = changes.created + changes.updated
+        run.finished_at = datetime.now(UTC)
+        self.store.recommendation_runs[run.run_id] = run
+        return run, recommendations
+
+    def run_all(self, window_days: int | None = None) -> list[RecommendationRun]:
+        return [self.run(tenant_id, window_days)[0] for tenant_id in self.store.rollups.tenants()]
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
-from datetime import date, datetime
+from datetime import UTC, date, datetime
 from enum import Enum
-from typing import Any
+from typing import Annotated, Any
 
-from pydantic import BaseModel, Field
+from pydantic import AfterValidator, BaseModel, Field
+
+
+def as_utc(value: datetime) -> datetime:
+    """Naive timestamps are taken as UTC, so they order and bucket by day like aware ones."""
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value.astimezone(UTC)
+
+
+UtcDatetime = Annotated[datetime, AfterValidator(as_utc)]
 
 
 class Classification(str, Enum):
@@ -70,7 +78,7 @@ class ThermalRecord(BaseModel):
 
 class TelemetryRecord(BaseModel):
     device_key: str
-    observed_at: datetime
+    observed_at: UtcDatetime
     session: SessionRecord
     gpu: GPURecord
     cpu: CPURecord
@@ -90,6 +98,14 @@ class TelemetryBatchIn(BaseModel):
     records: list[TelemetryRecord]
 
 
+class TelemetryStreamHeader(BaseModel):
+    schema_version: str = "1.0"
+    tenant_id: str
+    source: str
+    batch_id: str
+    sent_at: datetime
+
+
 class CapabilityCPU(BaseModel):
     model: str
     cores: int = Field(gt=0)
@@ -109,7 +125,7 @@ class CapabilityGPU(BaseModel):
 
 class CapabilitySnapshot(BaseModel):
     device_key: str
-    captured_at: datetime
+    captured_at: UtcDatetime
     cpu: CapabilityCPU
     ram_gb: int = Field(gt=0)
     storage: CapabilityStorage
@@ -132,6 +148,7 @@ class PolicyProfile(BaseModel):
     auto_execute_rules: dict[str, Any] = Field(default_factory=dict)
     effective_from: datetime
     effective_to: datetime | None = None
+    version: int = 1
 
 
 class PolicyCreateIn(BaseModel):
@@ -163,14 +180,99 @@ class Recommendation(BaseModel):
     risk_flags: list[str]
     top_reasons: list[str]
     status: str
+    policy_id: str | None = None
 
 
 class RecommendationListOut(BaseModel):
     items: list[Recommendation]
+    next_cursor: str | None = None
+
+
+class RecommendationChangesOut(BaseModel):
+    items: list[Recommendation]
+    run_id: str | None = None
+
+
+class SimilarDevice(BaseModel):
+    device_key: str
+    distance: float
+
+
+class SimilarDevicesOut(BaseModel):
+    device_key: str
+    items: list[SimilarDevice]
+
+
+class ExportTableOut(BaseModel):
+    table: str
+    rows: int
+    batches: int
+    raw_bytes: int
+    wire_bytes: int
+    retries: int
+
+
+class ServiceNowExportOut(BaseModel):
+    tenant_id: str
+    policy_id: str | None = None
+    run_id: str | None = None
+    full_sync: bool
+    tables: list[ExportTableOut]
+    elapsed_ms: float
+
+
+class ScoreCacheReport(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    compute_ms: float
+    time_saved_ms: float
+
+
+class SimulationOut(RecommendationListOut):
+    cache: ScoreCacheReport
 
 
 class SimulateRequest(BaseModel):
     tenant_id: str
+    window_days: int | None = Field(default=None, gt=0, le=730)
+
+
+class WhatIfVariantIn(BaseModel):
+    name: str | None = None
+    thresholds: dict[str, Any] = Field(default_factory=dict)
+
+
+class WhatIfRequest(BaseModel):
+    tenant_id: str
+    window_days: int | None = Field(default=None, gt=0, le=730)
+    variants: list[WhatIfVariantIn] = Field(min_length=1, max_length=200)
+
+
+class OutcomeSummary(BaseModel):
+    classification_counts: dict[str, int]
+    action_counts: dict[str, int]
+    expected_savings_usd_annual: float
+
+
+class WhatIfVariantOut(OutcomeSummary):
+    name: str
+    thresholds: dict[str, Any]
+    changed_devices: int
+    savings_delta_usd_annual: float
+    transitions: dict[str, int]
+    sample_changed_devices: list[str]
+
+
+class WhatIfOut(BaseModel):
+    tenant_id: str
+    policy_id: str
+    policy_version: int
+    window_days: int | None
+    devices: int
+    baseline: OutcomeSummary
+    variants: list[WhatIfVariantOut]
+    elapsed_ms: float
 
 
 class IngestionAck(BaseModel):
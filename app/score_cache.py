@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Collection
+from dataclasses import dataclass, field
+from datetime import date
+
+from app.capabilities import CapabilityIndex
+from app.recommend import ScoreRow, score_rows
+from app.rollups import DailyRollupStore
+from app.scoring import ScoringParams, SignalSummary
+
+SignalLoader = Callable[[Collection[str] | None], dict[str, SignalSummary]]
+
+
+@dataclass
+class _Signals:
+    as_of: date | None
+    summaries: dict[str, SignalSummary]
+    stale: set[str] = field(default_factory=set)
+
+
+@dataclass
+class SimulationReport:
+    hits: int
+    misses: int
+    compute_s: float
+    time_saved_s: float
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ScoreCache:
+    """Scores per (tenant, policy id, policy version, window, device).
+
+    Signals are cached per (tenant, window, device) underneath so a new policy version re-scores
+    without re-aggregating. New telemetry drops the touched devices everywhere; a window whose
+    anchor day moved is reloaded whole. A newer capability snapshot drops the device's scores.
+    Patching a policy drops that policy's entries.
+
+    Callers serialize loads and invalidations per tenant (the store's tenant lock); `_lock` only guards
+    the dicts shared by all tenants, so one tenant's aggregation or scoring never blocks another's ingest.
+    """
+
+    def __init__(self, rollups: DailyRollupStore, capabilities: CapabilityIndex) -> None:
+        self.rollups = rollups
+        self.capabilities = capabilities
+        self._signals: dict[tuple[str, int | None], _Signals] = {}
+        self._scores: dict[tuple[str, str, int, int | None], dict[str, ScoreRow]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.time_saved_s = 0.0
+        # Per-device cost of simulations that aggregated and scored every device: the uncached baseline.
+        self._uncached_s = 0.0
+        self._uncached_devices = 0
+        rollups.subscribe(self._on_rollup)
+        capabilities.subscribe(self._on_capabilities)
+
+    def _on_rollup(self, tenant_id: str, touched: set[tuple[str, date]]) -> None:
+        self.invalidate_devices(tenant_id, {device_key for device_key, _ in touched})
+
+    def _tenant_scores(self, tenant_id: str) -> list[dict[str, ScoreRow]]:
+        with self._lock:
+            return [rows for (tenant, *_), rows in self._scores.items() if tenant == tenant_id]
+
+    def invalidate_devices(self, tenant_id: str, devices: set[str]) -> None:
+        with self._lock:
+            entries = [entry for (tenant, _), entry in self._signals.items() if tenant == tenant_id]
+        for entry in entries:
+            entry.stale |= devices
+        for rows in self._tenant_scores(tenant_id):
+            for device_key in devices:
+                rows.pop(device_key, None)
+
+    def _on_capabilities(self, tenant_id: str, device_keys: set[str]) -> None:
+        for rows in self._tenant_scores(tenant_id):
+            for device_key in device_keys:
+                rows.pop(device_key, None)
+
+    def invalidate_policy(self, policy_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._scores if k[1] == policy_id]:
+                del self._scores[key]
+
+    def _load_signals(
+        self, tenant_id: str, window_days: int | None, load: SignalLoader
+    ) -> tuple[dict[str, SignalSummary], bool]:
+        # Windows end at the tenant's latest day, so a new latest day shifts every device's window.
+        as_of = self.rollups.latest_day(tenant_id) if window_days is not None else None
+        with self._lock:
+            entry = self._signals.get((tenant_id, window_days))
+        if entry is None or entry.as_of != as_of:
+            entry = _Signals(as_of, load(None))
+            with self._lock:
+                self._signals[(tenant_id, window_days)] = entry
+                for (tenant, _, _, window), rows in self._scores.items():
+                    if tenant == tenant_id and window == window_days:
+                        rows.clear()
+            return entry.summaries, True
+        if entry.stale:
+            fresh = load(entry.stale)
+            for device_key in entry.stale:
+                entry.summaries.pop(device_key, None)
+            entry.summaries.update(fresh)
+            entry.stale = set()
+        return entry.summaries, False
+
+    def signals(self, tenant_id: str, window_days: int | None, load: SignalLoader) -> dict[str, SignalSummary]:
+        return dict(self._load_signals(tenant_id, window_days, load)[0])
+
+    def score(
+        self,
+        tenant_id: str,
+        policy_id: str,
+        policy_version: int,
+        window_days: int | None,
+        params: ScoringParams,
+        load: SignalLoader,
+    ) -> tuple[dict[str, SignalSummary], dict[str, ScoreRow], SimulationReport]:
+        started = time.perf_counter()
+        summaries, reloaded = self._load_signals(tenant_id, window_days, load)
+        with self._lock:
+            rows = self._scores.setdefault((tenant_id, policy_id, policy_version, window_days), {})
+        missing = [k for k in summaries if k not in rows]
+        capabilities = self.capabilities.columns(tenant_id, missing)
+        rows.update(zip(missing, score_rows([summaries[k] for k in missing], params, capabilities)))
+        compute_s = time.perf_counter() - started
+
+        hits = len(summaries) - len(missing)
+        with self._lock:
+            if reloaded and summaries:
+                self._uncached_s += compute_s
+                self._uncached_devices += len(summaries)
+            saved_s = 0.0
+            if self._uncached_devices:
+                saved_s = max(0.0, len(summaries) * self._uncached_s / self._uncached_devices - compute_s)
+            self.hits += hits
+            self.misses += len(missing)
+            self.time_saved_s += saved_s
+        report = SimulationReport(hits, len(missing), compute_s, saved_s)
+        # Copies: ingestion may invalidate entries as soon as the caller releases the tenant lock.
+        return dict(summaries), {k: rows[k] for k in summaries}, report
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "time_saved_s": self.time_saved_s,
+        }
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections.abc import Sequence
+from dataclasses import dataclass, fields
+from typing import Any
+
+import numpy as np
 
 from app.schemas import Action, Classification
 
@@ -28,28 +32,166 @@ class SignalSummary:
     thermal_throttle_events: int
     active_minutes: float
     light_app_mix_factor: float
+    # Raw p95 behind vram_used_p95_pct, so the percentage can be re-based on a device's real VRAM.
+    vram_used_p95_mb: float = 0.0
 
 
-def compute_scores(s: SignalSummary) -> dict[str, float]:
-    gpu_pressure = 0.6 * norm(s.gpu_util_p95, 40, 95) + 0.4 * norm(s.vram_used_p95_pct, 50, 98)
-    cpu_pressure = norm(s.cpu_util_p95, 40, 95)
-    ram_pressure = 0.7 * norm(s.ram_used_p95, 60, 98) + 0.3 * norm(s.paging_pressure_minutes, 0, 180)
+@dataclass(frozen=True)
+class ScoringParams:
+    """Normalization bounds, weights and classification cut-offs; policy thresholds override by name."""
+
+    gpu_util_floor: float = 40
+    gpu_util_ceiling: float = 95
+    vram_used_pct_floor: float = 50
+    vram_used_pct_ceiling: float = 98
+    cpu_util_floor: float = 40
+    cpu_util_ceiling: float = 95
+    ram_used_floor: float = 60
+    ram_used_ceiling: float = 98
+    paging_minutes_floor: float = 0
+    paging_minutes_ceiling: float = 180
+    disk_latency_ms_floor: float = 10
+    disk_latency_ms_ceiling: float = 80
+    disk_busy_minutes_floor: float = 30
+    disk_busy_minutes_ceiling: float = 360
+    disk_queue_floor: float = 1
+    disk_queue_ceiling: float = 5
+    thermal_events_floor: float = 0
+    thermal_events_ceiling: float = 15
+    active_minutes_floor: float = 60
+    active_minutes_ceiling: float = 480
+
+    gpu_util_weight: float = 0.6
+    vram_used_weight: float = 0.4
+    ram_used_weight: float = 0.7
+    paging_weight: float = 0.3
+    disk_latency_weight: float = 0.5
+    disk_busy_weight: float = 0.3
+    disk_queue_weight: float = 0.2
+    stress_gpu_weight: float = 0.30
+    stress_ram_weight: float = 0.25
+    stress_disk_weight: float = 0.20
+    stress_cpu_weight: float = 0.20
+    stress_thermal_weight: float = 0.05
+    overprov_gpu_weight: float = 0.35
+    overprov_cpu_weight: float = 0.25
+    overprov_ram_weight: float = 0.20
+    overprov_low_activity_weight: float = 0.10
+    overprov_light_apps_weight: float = 0.10
+
+    underpowered_fit: float = 45
+    critical_pressure: float = 0.90
+    overprovisioned_fit: float = 75
+    overprovisioned_score: float = 65
+
+    @classmethod
+    def from_thresholds(cls, thresholds: dict[str, Any]) -> ScoringParams:
+        overrides = {}
+        for name, value in thresholds.items():
+            if name not in _PARAM_FIELDS:
+                continue
+            if isinstance(value, bool) or not isinstance(value, int | float):
+                raise ValueError(f"threshold {name} must be a number")
+            overrides[name] = float(value)
+        return cls(**overrides) if overrides else DEFAULT_SCORING
+
+
+_PARAM_FIELDS = frozenset(f.name for f in fields(ScoringParams))
+DEFAULT_SCORING = ScoringParams()
+
+
+def stack_params(params: Sequence[ScoringParams]) -> ScoringParams:
+    """One ScoringParams whose fields are (len(params), 1) columns.
+
+    Passed to `score_batch` with n devices, it scores every variant at once into (len(params), n) arrays.
+    """
+    return ScoringParams(
+        **{name: np.array([getattr(p, name) for p in params], dtype=np.float64)[:, None] for name in _PARAM_FIELDS}
+    )
+
+
+SIGNAL_FIELDS = tuple(f.name for f in fields(SignalSummary))
+SCORE_FIELDS = ("gpu_pressure", "cpu_pressure", "ram_pressure", "disk_score", "fit", "overprov")
+CLASSIFICATIONS = tuple(Classification)
+ACTIONS = tuple(Action)
+_UNDERPOWERED = CLASSIFICATIONS.index(Classification.UNDERPOWERED)
+_OVERPROVISIONED = CLASSIFICATIONS.index(Classification.OVERPROVISIONED)
+_RIGHT_SIZED = CLASSIFICATIONS.index(Classification.RIGHT_SIZED)
+_UPSIZE = ACTIONS.index(Action.UPSIZE)
+_DOWNSIZE = ACTIONS.index(Action.DOWNSIZE)
+_EXTEND_LIFE = ACTIONS.index(Action.EXTEND_LIFE)
+
+
+@dataclass
+class SignalArrays:
+    gpu_util_p95: np.ndarray
+    vram_used_p95_pct: np.ndarray
+    cpu_util_p95: np.ndarray
+    ram_used_p95: np.ndarray
+    paging_pressure_minutes: np.ndarray
+    disk_latency_p95_ms: np.ndarray
+    disk_busy_minutes: np.ndarray
+    disk_queue_p95: np.ndarray
+    thermal_throttle_events: np.ndarray
+    active_minutes: np.ndarray
+    light_app_mix_factor: np.ndarray
+    vram_used_p95_mb: np.ndarray
+
+    @classmethod
+    def from_summaries(cls, summaries: Sequence[SignalSummary]) -> SignalArrays:
+        return cls(
+            **{
+                name: np.fromiter((getattr(s, name) for s in summaries), dtype=np.float64, count=len(summaries))
+                for name in SIGNAL_FIELDS
+            }
+        )
+
+    def __len__(self) -> int:
+        return len(self.gpu_util_p95)
+
+
+def norm_array(values: np.ndarray, floor: float | np.ndarray, ceiling: float | np.ndarray) -> np.ndarray:
+    """Bounds may be arrays that broadcast against `values` (see `stack_params`)."""
+    if np.ndim(floor) == 0 and np.ndim(ceiling) == 0:
+        if ceiling <= floor:
+            return np.zeros_like(values, dtype=np.float64)
+        scaled = (values - floor) / (ceiling - floor)
+        return np.where(values <= floor, 0.0, np.where(values >= ceiling, 1.0, scaled))
+    valid = ceiling > floor
+    scaled = (values - floor) / np.where(valid, ceiling - floor, 1.0)
+    return np.where(valid & (values > floor), np.where(values >= ceiling, 1.0, scaled), 0.0)
+
+
+def compute_scores_batch(s: SignalArrays, p: ScoringParams = DEFAULT_SCORING) -> dict[str, np.ndarray]:
+    gpu_pressure = p.gpu_util_weight * norm_array(
+        s.gpu_util_p95, p.gpu_util_floor, p.gpu_util_ceiling
+    ) + p.vram_used_weight * norm_array(s.vram_used_p95_pct, p.vram_used_pct_floor, p.vram_used_pct_ceiling)
+    cpu_pressure = norm_array(s.cpu_util_p95, p.cpu_util_floor, p.cpu_util_ceiling)
+    ram_pressure = p.ram_used_weight * norm_array(
+        s.ram_used_p95, p.ram_used_floor, p.ram_used_ceiling
+    ) + p.paging_weight * norm_array(s.paging_pressure_minutes, p.paging_minutes_floor, p.paging_minutes_ceiling)
     disk_score = (
-        0.5 * norm(s.disk_latency_p95_ms, 10, 80)
-        + 0.3 * norm(s.disk_busy_minutes, 30, 360)
-        + 0.2 * norm(s.disk_queue_p95, 1, 5)
+        p.disk_latency_weight * norm_array(s.disk_latency_p95_ms, p.disk_latency_ms_floor, p.disk_latency_ms_ceiling)
+        + p.disk_busy_weight * norm_array(s.disk_busy_minutes, p.disk_busy_minutes_floor, p.disk_busy_minutes_ceiling)
+        + p.disk_queue_weight * norm_array(s.disk_queue_p95, p.disk_queue_floor, p.disk_queue_ceiling)
+    )
+    thermal_penalty = norm_array(s.thermal_throttle_events, p.thermal_events_floor, p.thermal_events_ceiling)
+    stress = (
+        p.stress_gpu_weight * gpu_pressure
+        + p.stress_ram_weight * ram_pressure
+        + p.stress_disk_weight * disk_score
+        + p.stress_cpu_weight * cpu_pressure
+        + p.stress_thermal_weight * thermal_penalty
     )
-    thermal_penalty = norm(float(s.thermal_throttle_events), 0, 15)
-    stress = 0.30 * gpu_pressure + 0.25 * ram_pressure + 0.20 * disk_score + 0.20 * cpu_pressure + 0.05 * thermal_penalty
-    fit = max(0.0, min(100.0, 100 - (stress * 100)))
+    fit = np.clip(100 - (stress * 100), 0.0, 100.0)
 
-    low_active_minutes_factor = 1.0 - norm(s.active_minutes, 60, 480)
+    low_active_minutes_factor = 1.0 - norm_array(s.active_minutes, p.active_minutes_floor, p.active_minutes_ceiling)
     overprov = 100 * (
-        0.35 * (1 - gpu_pressure)
-        + 0.25 * (1 - cpu_pressure)
-        + 0.20 * (1 - ram_pressure)
-        + 0.10 * low_active_minutes_factor
-        + 0.10 * s.light_app_mix_factor
+        p.overprov_gpu_weight * (1 - gpu_pressure)
+        + p.overprov_cpu_weight * (1 - cpu_pressure)
+        + p.overprov_ram_weight * (1 - ram_pressure)
+        + p.overprov_low_activity_weight * low_active_minutes_factor
+        + p.overprov_light_apps_weight * s.light_app_mix_factor
     )
     return {
         "gpu_pressure": gpu_pressure,
@@ -57,14 +199,38 @@ def compute_scores(s: SignalSummary) -> dict[str, float]:
         "ram_pressure": ram_pressure,
         "disk_score": disk_score,
         "fit": fit,
-        "overprov": max(0.0, min(100.0, overprov)),
+        "overprov": np.clip(overprov, 0.0, 100.0),
     }
 
 
+def classify_and_action_batch(
+    scores: dict[str, np.ndarray], p: ScoringParams = DEFAULT_SCORING
+) -> tuple[np.ndarray, np.ndarray]:
+    critical = np.maximum.reduce(
+        [scores["gpu_pressure"], scores["cpu_pressure"], scores["ram_pressure"], scores["disk_score"]]
+    )
+    underpowered = (scores["fit"] < p.underpowered_fit) | (critical > p.critical_pressure)
+    overprovisioned = (
+        ~underpowered & (scores["fit"] > p.overprovisioned_fit) & (scores["overprov"] > p.overprovisioned_score)
+    )
+    classification = np.select([underpowered, overprovisioned], [_UNDERPOWERED, _OVERPROVISIONED], _RIGHT_SIZED)
+    action = np.select([underpowered, overprovisioned], [_UPSIZE, _DOWNSIZE], _EXTEND_LIFE)
+    return classification.astype(np.int8), action.astype(np.int8)
+
+
+def score_batch(s: SignalArrays, p: ScoringParams = DEFAULT_SCORING) -> dict[str, np.ndarray]:
+    scores = compute_scores_batch(s, p)
+    scores["classification"], scores["action"] = classify_and_action_batch(scores, p)
+    return scores
+
+
+def compute_scores(s: SignalSummary) -> dict[str, float]:
+    scores = compute_scores_batch(SignalArrays.from_summaries([s]))
+    return {name: float(values[0]) for name, values in scores.items()}
+
+
 def classify_and_action(scores: dict[str, float]) -> tuple[Classification, Action]:
-    critical = max(scores["gpu_pressure"], scores["cpu_pressure"], scores["ram_pressure"], scores["disk_score"])
-    if scores["fit"] < 45 or critical > 0.90:
-        return Classification.UNDERPOWERED, Action.UPSIZE
-    if scores["fit"] > 75 and scores["overprov"] > 65:
-        return Classification.OVERPROVISIONED, Action.DOWNSIZE
-    return Classification.RIGHT_SIZED, Action.EXTEND_LIFE
+    classification, action = classify_and_action_batch(
+        {name: np.array([scores[name]], dtype=np.float64) for name in SCORE_FIELDS}
+    )
+    return CLASSIFICATIONS[classification[0]], ACTIONS[action[0]]
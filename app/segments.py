@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+import threading
+from datetime import date
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from app.rollups import summary_date
+from app.schemas import TelemetryBatchIn, TelemetryRecord
+from app.telemetry_store import COLUMNS
+
+MAGIC = b"ITSG"
+VERSION = 1
+HEADER = struct.Struct("<4sHH8x")
+
+_DTYPES = {"d": "<f8", "q": "<i8", "b": "i1"}
+# Packed and little-endian so a segment reads the same on every host.
+RECORD_DTYPE = np.dtype([("device", "<u4"), *((name, _DTYPES[typecode]) for name, typecode in COLUMNS)])
+APP_DTYPE = np.dtype([("device", "<u4"), ("category", "<u4"), ("minutes", "<i8")])
+
+_NAN = float("nan")
+
+
+class SegmentError(ValueError):
+    pass
+
+
+def _record_row(device: int, r: TelemetryRecord) -> tuple:
+    gpu = r.gpu
+    disk = r.disk
+    thermal = r.thermal
+    return (
+        device,
+        r.observed_at.timestamp(),
+        r.session.interactive_ratio,
+        r.session.vdi,
+        gpu.util_pct,
+        gpu.vram_used_mb,
+        gpu.active_minutes,
+        _NAN if gpu.compute_pct is None else gpu.compute_pct,
+        _NAN if gpu.graphics_pct is None else gpu.graphics_pct,
+        r.cpu.util_pct,
+        r.ram.used_pct,
+        r.ram.paging_pressure,
+        disk.latency_ms,
+        disk.busy_pct,
+        disk.queue_len,
+        r.network.throughput_mbps,
+        r.network.loss_proxy,
+        thermal.throttle_event,
+        thermal.on_battery,
+        thermal.docked,
+    )
+
+
+def read_segment(path: str | Path, dtype: np.dtype = RECORD_DTYPE) -> np.ndarray:
+    """Zero-copy structured view over a segment; the mapping lives as long as the array."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < HEADER.size:
+        raise SegmentError(f"{path}: truncated header")
+    magic, version, itemsize = HEADER.unpack_from(mapped)
+    if magic != MAGIC or version != VERSION or itemsize != dtype.itemsize:
+        raise SegmentError(f"{path}: not a v{VERSION} segment of this layout")
+    # A torn final append leaves a partial record; readers skip it and the next append drops it.
+    count = (len(mapped) - HEADER.size) // itemsize
+    return np.frombuffer(mapped, dtype=dtype, count=count, offset=HEADER.size)
+
+
+class SegmentArchive:
+    """Append-only raw telemetry segments, one samples file and one apps file per tenant/day.
+
+    Device keys and app categories are interned in a per-tenant `strings` file (one JSON string per
+    line); ids are line numbers.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._strings: dict[str, tuple[list[str], dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def tenant_dir(self, tenant_id: str) -> Path:
+        return self.root / quote(tenant_id, safe="")
+
+    def tenants(self) -> list[str]:
+        return sorted(unquote(p.name) for p in self.root.iterdir() if p.is_dir())
+
+    def days(self, tenant_id: str) -> list[date]:
+        directory = self.tenant_dir(tenant_id)
+        if not directory.is_dir():
+            return []
+        return sorted(date.fromisoformat(p.stem) for p in directory.glob("*.seg"))
+
+    def strings(self, tenant_id: str) -> list[str]:
+        return self._interned(tenant_id)[0]
+
+    def _interned(self, tenant_id: str) -> tuple[list[str], dict[str, int]]:
+        interned = self._strings.get(tenant_id)
+        if interned is None:
+            path = self.tenant_dir(tenant_id) / "strings"
+            values = [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+            interned = self._strings[tenant_id] = (values, {v: i for i, v in enumerate(values)})
+        return interned
+
+    def _intern(self, tenant_id: str, value: str, added: list[str]) -> int:
+        values, ids = self._interned(tenant_id)
+        index = ids.get(value)
+        if index is None:
+            index = ids[value] = len(values)
+            values.append(value)
+            added.append(value)
+        return index
+
+    def append_batch(self, payload: TelemetryBatchIn) -> int:
+        tenant_id = payload.tenant_id
+        with self._lock:
+            added: list[str] = []
+            rows: dict[date, list[tuple]] = {}
+            apps: dict[date, list[tuple]] = {}
+            for r in payload.records:
+                device = self._intern(tenant_id, r.device_key, added)
+                day = summary_date(r.observed_at)
+                rows.setdefault(day, []).append(_record_row(device, r))
+                for a in r.apps:
+                    category = self._intern(tenant_id, a.category.upper(), added)
+                    apps.setdefault(day, []).append((device, category, a.active_minutes))
+
+            directory = self.tenant_dir(tenant_id)
+            directory.mkdir(exist_ok=True)
+            # Strings go first so a segment never references an id that is not on disk.
+            if added:
+                with open(directory / "strings", "a") as f:
+                    f.write("".join(json.dumps(value) + "\n" for value in added))
+            for day, day_rows in rows.items():
+                self._append(directory / f"{day.isoformat()}.seg", np.array(day_rows, dtype=RECORD_DTYPE))
+                self._append(directory / f"{day.isoformat()}.apps", np.array(apps.get(day, []), dtype=APP_DTYPE))
+        return len(payload.records)
+
+    @staticmethod
+    def _append(path: Path, values: np.ndarray) -> None:
+        with open(path, "ab") as f:
+            size = f.tell()
+            if size == 0:
+                f.write(HEADER.pack(MAGIC, VERSION, values.dtype.itemsize))
+            elif torn := (size - HEADER.size) % values.dtype.itemsize:
+                f.truncate(size - torn)
+            f.write(values.tobytes())
+
+    def records(self, tenant_id: str, day: date) -> np.ndarray:
+        return read_segment(self.tenant_dir(tenant_id) / f"{day.isoformat()}.seg")
+
+    def apps(self, tenant_id: str, day: date) -> np.ndarray:
+        return read_segment(self.tenant_dir(tenant_id) / f"{day.isoformat()}.apps", APP_DTYPE)
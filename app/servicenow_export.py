@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import gzip
+import os
+import random
+import threading
+import time
+from collections.abc import Callable, Collection, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, field, fields
+from datetime import date
+from typing import TYPE_CHECKING
+
+import httpx
+from pydantic_core import SchemaSerializer, core_schema
+
+from app.metrics import EXPORT_RETRIES, EXPORTED_BYTES, EXPORTED_ROWS
+from app.rec_changes import Scope
+from app.rec_compact import encode_rows
+from app.rollups import DailyRollup, DailyRollupStore
+from app.scoring import SignalSummary
+
+if TYPE_CHECKING:
+    from app.storage import InMemoryStore
+
+RECOMMENDATION_TABLE = "u_imp_hw_recommendation"
+SUMMARY_TABLE = "u_imp_hw_daily_summary"
+# Import Set guidance is to keep insertMultiple requests to about a thousand rows and well under the 10 MB
+# request limit, which applies to the decompressed body.
+MAX_BATCH_ROWS = 1000
+MAX_BATCH_BYTES = 1 << 20
+# Summary rows encoded per hold of the tenant lock, so an export never stalls ingestion for long.
+SUMMARY_ROWS_PER_LOCK = 256
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# The daily summary's signals. The VRAM percentage is left out: rollups rate it against a default card, so
+# only the absolute p95 means anything to ServiceNow.
+SUMMARY_SIGNALS = tuple(f.name for f in fields(SignalSummary) if f.name != "vram_used_p95_pct")
+
+Sleep = Callable[[float], None]
+
+
+class ExportError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class ImportSetTarget:
+    base_url: str
+    username: str | None = None
+    password: str | None = None
+    recommendation_table: str = RECOMMENDATION_TABLE
+    summary_table: str = SUMMARY_TABLE
+    max_batch_rows: int = MAX_BATCH_ROWS
+    max_batch_bytes: int = MAX_BATCH_BYTES
+    concurrency: int = 4
+    retries: int = 5
+    backoff_s: float = 0.5
+    max_backoff_s: float = 30.0
+    timeout_s: float = 30.0
+    gzip_level: int = 6
+
+    @classmethod
+    def from_env(cls) -> ImportSetTarget | None:
+        """ITAM_SERVICENOW_URL (plus optional _USER and _PASSWORD), or None when exporting is not configured."""
+        url = os.environ.get("ITAM_SERVICENOW_URL")
+        if not url:
+            return None
+        return cls(url, os.environ.get("ITAM_SERVICENOW_USER"), os.environ.get("ITAM_SERVICENOW_PASSWORD"))
+
+
+@dataclass
+class TableExport:
+    table: str
+    rows: int = 0
+    batches: int = 0
+    raw_bytes: int = 0
+    wire_bytes: int = 0
+    retries: int = 0
+
+
+@dataclass
+class ExportReport:
+    tenant_id: str
+    run_id: str | None
+    full_sync: bool
+    tables: list[TableExport] = field(default_factory=list)
+    seconds: float = 0.0
+    policy_id: str | None = None
+
+    @property
+    def rows(self) -> int:
+        return sum(t.rows for t in self.tables)
+
+
+def _summary_schema() -> core_schema.CoreSchema:
+    floats = core_schema.float_schema()
+    columns = {
+        "tenant_id": core_schema.str_schema(),
+        "device_key": core_schema.str_schema(),
+        "summary_date": core_schema.date_schema(),
+        "samples": core_schema.int_schema(),
+        **{name: floats for name in SUMMARY_SIGNALS},
+        "app_minutes": core_schema.str_schema(),
+    }
+    return core_schema.typed_dict_schema({k: core_schema.typed_dict_field(v) for k, v in columns.items()})
+
+
+_SUMMARY_ROW = SchemaSerializer(_summary_schema())
+_APP_MINUTES = SchemaSerializer(core_schema.dict_schema(core_schema.str_schema(), core_schema.int_schema()))
+
+
+def summary_row(tenant_id: str, device_key: str, rollup: DailyRollup) -> bytes:
+    """One `u_hw_daily_summary` staging row."""
+    signals = rollup.to_signals()
+    row = {"tenant_id": tenant_id, "device_key": device_key, "summary_date": rollup.summary_date}
+    row["samples"] = rollup.samples
+    row.update((name, getattr(signals, name)) for name in SUMMARY_SIGNALS)
+    # Import Set columns are flat strings; the transform map expands the category minutes.
+    row["app_minutes"] = _APP_MINUTES.to_json(dict(sorted(rollup.app_minutes.items()))).decode()
+    return _SUMMARY_ROW.to_json(row)
+
+
+def summary_rows(
+    rollups: DailyRollupStore,
+    tenant_id: str,
+    keys: Collection[tuple[str, date]] | None = None,
+    lock: AbstractContextManager = nullcontext(),
+) -> Iterator[bytes]:
+    """Encoded rows for the given (device, day) keys, or for every daily rollup of the tenant.
+
+    Ingestion updates rollups in place, so rows are encoded `SUMMARY_ROWS_PER_LOCK` at a time under `lock`,
+    the tenant's lock, and yielded outside it.
+    """
+    with lock:
+        if keys is None:
+            keys = [(device_key, day) for device_key, days in rollups.devices(tenant_id).items() for day in days]
+        else:
+            keys = sorted(keys)
+    for start in range(0, len(keys), SUMMARY_ROWS_PER_LOCK):
+        with lock:
+            chunk = [
+                summary_row(tenant_id, device_key, rollup)
+                for device_key, day in keys[start : start + SUMMARY_ROWS_PER_LOCK]
+                if (rollup := rollups.get(tenant_id, device_key, day)) is not None
+            ]
+        yield from chunk
+
+
+def batches(rows: Iterable[bytes], max_rows: int, max_bytes: int) -> Iterator[tuple[bytes, int]]:
+    """`{"records": [...]}` bodies of at most `max_rows` rows and (unless one row is larger) `max_bytes`, with
+    their row counts."""
+    chunk: list[bytes] = []
+    size = 0
+    for row in rows:
+        if chunk and (len(chunk) == max_rows or size + len(row) + 1 > max_bytes):
+            yield b'{"records":[' + b",".join(chunk) + b"]}", len(chunk)
+            chunk, size = [], 0
+        chunk.append(row)
+        size += len(row) + 1
+    if chunk:
+        yield b'{"records":[' + b",".join(chunk) + b"]}", len(chunk)
+
+
+class ImportSetClient:
+    """A pooled keep-alive client for `insertMultiple`, retrying throttling, server errors and dropped
+    connections with exponential backoff and jitter (or the server's Retry-After)."""
+
+    def __init__(
+        self, target: ImportSetTarget, transport: httpx.BaseTransport | None = None, sleep: Sleep = time.sleep
+    ) -> None:
+        self.target = target
+        self._sleep = sleep
+        auth = (target.username, target.password or "") if target.username else None
+        self._http = httpx.Client(
+            base_url=target.base_url,
+            auth=auth,
+            timeout=target.timeout_s,
+            limits=httpx.Limits(max_connections=target.concurrency, max_keepalive_connections=target.concurrency),
+            headers={"Accept": "application/json", "Content-Type": "application/json", "Content-Encoding": "gzip"},
+            transport=transport,
+        )
+
+    def _backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.target.max_backoff_s)
+        return min(self.target.backoff_s * 2**attempt, self.target.max_backoff_s) * random.uniform(0.5, 1.0)
+
+    def insert_multiple(self, table: str, body: bytes) -> int:
+        """POST a gzip-compressed body to the staging table; returns how many retries it took.
+
+        Raises ExportError on a non-retryable status or once retries run out.
+        """
+        for attempt in range(self.target.retries + 1):
+            response = None
+            try:
+                response = self._http.post(f"/api/now/import/{table}/insertMultiple", content=body)
+            except httpx.TransportError as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            else:
+                if response.is_success:
+                    return attempt
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code not in RETRY_STATUSES:
+                    raise ExportError(f"{table}: {error}")
+            if attempt < self.target.retries:
+                EXPORT_RETRIES.inc()
+                self._sleep(self._backoff(attempt, response))
+        raise ExportError(f"{table}: gave up after {self.target.retries} retries, last {error}")
+
+    def close(self) -> None:
+        self._http.close()
+
+
+class ServiceNowExporter:
+    """Pushes a tenant's recommendations and daily summaries to Import Set staging tables.
+
+    Each export sends only what changed since the last successful one: recommendations of one policy scope
+    (`None` for the default scoring) through the change feed, from the run id it last exported for that
+    scope, and the tenant's daily summaries through the rollup (device, day) keys touched since. The first
+    export of a scope, or one whose run has expired (after a restart, say), is a full sync; transform maps
+    coalesce on tenant, device and date, so resent rows update in place. A failed export leaves the
+    checkpoint where it was. Batches are gzipped and posted by `concurrency` threads, with at most two
+    batches per thread encoded ahead.
+    """
+
+    def __init__(
+        self, store: InMemoryStore, target: ImportSetTarget, client: ImportSetClient | None = None
+    ) -> None:
+        self.store = store
+        self.target = target
+        self.client = client or ImportSetClient(target)
+        self.checkpoints: dict[Scope, str | None] = {}
+        self._synced: set[str] = set()
+        self._dirty: dict[str, set[tuple[str, date]]] = {}
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=target.concurrency, thread_name_prefix="servicenow-export")
+        store.rollups.subscribe(self._touched)
+
+    def _touched(self, tenant_id: str, touched: set[tuple[str, date]]) -> None:
+        with self._lock:
+            if tenant_id in self._synced:
+                self._dirty.setdefault(tenant_id, set()).update(touched)
+
+    def _post(self, table: str, body: bytes) -> tuple[int, int]:
+        compressed = gzip.compress(body, compresslevel=self.target.gzip_level)
+        return len(compressed), self.client.insert_multiple(table, compressed)
+
+    def _send(self, table: str, rows: Iterable[bytes]) -> TableExport:
+        report = TableExport(table)
+        pending: set[Future[tuple[int, int]]] = set()
+
+        def collect(done: Iterable[Future[tuple[int, int]]]) -> None:
+            for future in done:
+                wire, retries = future.result()
+                report.wire_bytes += wire
+                report.retries += retries
+
+        try:
+            for body, count in batches(rows, self.target.max_batch_rows, self.target.max_batch_bytes):
+                if len(pending) >= 2 * self.target.concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                report.rows += count
+                report.batches += 1
+                report.raw_bytes += len(body)
+                pending.add(self._pool.submit(self._post, table, body))
+            collect(wait(pending).done)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        EXPORTED_ROWS.inc(table, amount=report.rows)
+        EXPORTED_BYTES.inc(table, "raw", amount=report.raw_bytes)
+        EXPORTED_BYTES.inc(table, "wire", amount=report.wire_bytes)
+        return report
+
+    def export(self, tenant_id: str, policy_id: str | None = None) -> ExportReport:
+        """Raises ExportError when a batch fails for good; the next export resends everything since the
+        last successful one."""
+        with self._export_lock:
+            started = time.perf_counter()
+            since = self.checkpoints.get((tenant_id, policy_id))
+            full_sync = since is None
+            try:
+                latest, recs = self.store.recommendation_changes_since(tenant_id, policy_id, since)
+            except KeyError:
+                full_sync = True
+                latest, recs = self.store.recommendation_changes_since(tenant_id, policy_id)
+            with self._lock:
+                # Keys touched while this export runs land in a fresh set and go out with the next one.
+                first = tenant_id not in self._synced
+                dirty = None if first else self._dirty.pop(tenant_id, set())
+                self._synced.add(tenant_id)
+            try:
+                tables = [
+                    self._send(self.target.recommendation_table, encode_rows(recs)),
+                    self._send(
+                        self.target.summary_table,
+                        summary_rows(self.store.rollups, tenant_id, dirty, self.store.tenant_lock(tenant_id)),
+                    ),
+                ]
+            except BaseException:
+                with self._lock:
+                    if first:
+                        self._synced.discard(tenant_id)
+                        self._dirty.pop(tenant_id, None)
+                    else:
+                        self._dirty.setdefault(tenant_id, set()).update(dirty)
+                raise
+            run_id = latest.run_id if latest is not None else since
+            self.checkpoints[(tenant_id, policy_id)] = run_id
+            return ExportReport(
+                tenant_id, run_id, full_sync or first, tables, time.perf_counter() - started, policy_id
+            )
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self.client.close()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import re
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+_INSERT_MULTIPLE = re.compile(r"^/api/now/import/(?P<table>\w+)/insertMultiple$")
+
+
+class MockImportSet:
+    """A local stand-in for ServiceNow's Import Set API, serving `POST /api/now/import/{table}/insertMultiple`.
+
+    Accepts gzip-encoded bodies, keeps the decoded rows per staging table (unless `keep_rows` is off) and
+    counts requests and bytes on the wire. `fail_next` queues error statuses to answer with, in order,
+    before accepting requests again.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, keep_rows: bool = True) -> None:
+        self.keep_rows = keep_rows
+        self.rows: dict[str, list[dict[str, Any]]] = {}
+        self.row_counts: dict[str, int] = {}
+        self.requests = 0
+        self.wire_bytes = 0
+        self.failed = 0
+        self._failures: deque[int] = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, *statuses: int) -> None:
+        with self._lock:
+            self._failures.extend(statuses)
+
+    def start(self) -> MockImportSet:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-import-set", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> MockImportSet:
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def _accept(self, table: str, body: bytes, encoding: str | None) -> tuple[int, dict[str, Any]]:
+        with self._lock:
+            self.requests += 1
+            self.wire_bytes += len(body)
+            if self._failures:
+                self.failed += 1
+                return self._failures.popleft(), {"error": {"message": "injected failure"}}
+        try:
+            records = json.loads(gzip.decompress(body) if encoding == "gzip" else body)["records"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return 400, {"error": {"message": "invalid insertMultiple body"}}
+        with self._lock:
+            self.row_counts[table] = self.row_counts.get(table, 0) + len(records)
+            if self.keep_rows:
+                self.rows.setdefault(table, []).extend(records)
+            import_set = self.requests
+        return 201, {
+            "import_set_id": f"ISET{import_set:010d}",
+            "staging_table": table,
+            "result": [{"status": "inserted"}] * len(records),
+        }
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                match = _INSERT_MULTIPLE.match(self.path)
+                if match is None:
+                    self._reply(404, {"error": {"message": "no such import set api"}})
+                    return
+                self._reply(*mock._accept(match["table"], body, self.headers.get("Content-Encoding")))
+
+            def _reply(self, status: int, payload: dict[str, Any]) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local mock ServiceNow Import Set API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+    mock = MockImportSet(args.host, args.port, keep_rows=False)
+    print(f"mock Import Set API on {mock.base_url}", flush=True)
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
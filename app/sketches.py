@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import math
+import struct
+from array import array
+from collections.abc import Iterable
+from typing import Protocol
+
+import numpy as np
+
+SKETCH_MODES = ("exact", "sketch")
+DEFAULT_ACCURACY = 0.5
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+_LINEAR_HEADER = struct.Struct("<dddq")
+_LOG_HEADER = struct.Struct("<ddqq")
+
+
+def nearest_rank(n: int, q: float) -> int:
+    return int(q * (n - 1))
+
+
+class QuantileSketch(Protocol):
+    def __len__(self) -> int: ...
+
+    def add(self, value: float) -> None: ...
+
+    def extend(self, values: np.ndarray) -> None: ...
+
+    def merge(self, other: QuantileSketch) -> QuantileSketch: ...
+
+    def empty(self) -> QuantileSketch: ...
+
+    def quantile(self, q: float) -> float: ...
+
+    def nbytes(self) -> int: ...
+
+    def to_bytes(self) -> bytes: ...
+
+
+class ExactQuantiles:
+    __slots__ = ("values",)
+
+    def __init__(self, values: Iterable[float] = ()) -> None:
+        self.values = array("d", values)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def add(self, value: float) -> None:
+        self.values.append(value)
+
+    def extend(self, values: np.ndarray) -> None:
+        self.values.frombytes(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+
+    def merge(self, other: ExactQuantiles) -> ExactQuantiles:
+        self.values.extend(other.values)
+        return self
+
+    def empty(self) -> ExactQuantiles:
+        return ExactQuantiles()
+
+    def quantile(self, q: float) -> float:
+        if not self.values:
+            raise ValueError("quantile of empty sketch")
+        k = nearest_rank(len(self.values), q)
+        return float(np.partition(np.frombuffer(self.values, dtype=np.float64), k)[k])
+
+    def nbytes(self) -> int:
+        return self.values.buffer_info()[1] * self.values.itemsize
+
+    def to_bytes(self) -> bytes:
+        return b"E" + np.frombuffer(self.values, dtype=np.float64).astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> ExactQuantiles:
+        return cls(np.frombuffer(data, dtype="<f8", offset=1).tolist())
+
+
+class LinearHistogram:
+    """Fixed-width bins over [lo, hi]; estimates are within `accuracy` of the true sample."""
+
+    __slots__ = ("lo", "hi", "accuracy", "width", "counts", "count")
+
+    def __init__(self, lo: float = 0.0, hi: float = 100.0, accuracy: float = DEFAULT_ACCURACY) -> None:
+        if hi <= lo or accuracy <= 0:
+            raise ValueError("invalid histogram bounds")
+        self.lo = lo
+        self.hi = hi
+        self.accuracy = accuracy
+        self.width = 2 * accuracy
+        self.counts = array("q", bytes(8 * max(1, math.ceil((hi - lo) / self.width))))
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _index(self, value: float) -> int:
+        return min(max(int((value - self.lo) / self.width), 0), len(self.counts) - 1)
+
+    def add(self, value: float) -> None:
+        self.counts[self._index(value)] += 1
+        self.count += 1
+
+    def extend(self, values: np.ndarray) -> None:
+        # Truncation toward zero, then clipping, as `_index` does.
+        indexes = ((values - self.lo) / self.width).astype(np.int64).clip(0, len(self.counts) - 1)
+        counts = np.frombuffer(self.counts, dtype=np.int64) + np.bincount(indexes, minlength=len(self.counts))
+        self.counts = array("q", counts.tobytes())
+        self.count += len(values)
+
+    def merge(self, other: LinearHistogram) -> LinearHistogram:
+        if (other.lo, other.hi, other.accuracy) != (self.lo, self.hi, self.accuracy):
+            raise ValueError("cannot merge histograms with different bins")
+        merged = np.frombuffer(self.counts, dtype=np.int64) + np.frombuffer(other.counts, dtype=np.int64)
+        self.counts = array("q", merged.tobytes())
+        self.count += other.count
+        return self
+
+    def subtract(self, other: LinearHistogram) -> LinearHistogram:
+        if (other.lo, other.hi, other.accuracy) != (self.lo, self.hi, self.accuracy):
+            raise ValueError("cannot subtract histograms with different bins")
+        remaining = np.frombuffer(self.counts, dtype=np.int64) - np.frombuffer(other.counts, dtype=np.int64)
+        if (remaining < 0).any():
+            raise ValueError("subtracted histogram is not contained in this one")
+        self.counts = array("q", remaining.tobytes())
+        self.count -= other.count
+        return self
+
+    def empty(self) -> LinearHistogram:
+        return LinearHistogram(self.lo, self.hi, self.accuracy)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            raise ValueError("quantile of empty sketch")
+        k = nearest_rank(self.count, q)
+        index = int(np.searchsorted(np.cumsum(np.frombuffer(self.counts, dtype=np.int64)), k, side="right"))
+        return min(self.lo + (index + 0.5) * self.width, self.hi)
+
+    def nbytes(self) -> int:
+        return self.counts.buffer_info()[1] * self.counts.itemsize
+
+    def to_bytes(self) -> bytes:
+        header = _LINEAR_HEADER.pack(self.lo, self.hi, self.accuracy, self.count)
+        return b"L" + header + np.frombuffer(self.counts, dtype=np.int64).astype("<i8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> LinearHistogram:
+        lo, hi, accuracy, count = _LINEAR_HEADER.unpack_from(data, 1)
+        sketch = cls(lo, hi, accuracy)
+        counts = np.frombuffer(data, dtype="<i8", offset=1 + _LINEAR_HEADER.size).astype(np.int64)
+        if len(counts) != len(sketch.counts):
+            raise ValueError("corrupt histogram payload")
+        sketch.counts = array("q", counts.tobytes())
+        sketch.count = count
+        return sketch
+
+
+class LogHistogram:
+    """DDSketch-style log buckets; estimates are within `relative_accuracy` of the true sample."""
+
+    __slots__ = ("relative_accuracy", "min_value", "gamma", "_log_gamma", "buckets", "zero_count", "count")
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, min_value: float = 1e-3) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, value: float) -> None:
+        if value < self.min_value:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+
+    def extend(self, values: np.ndarray) -> None:
+        small = values < self.min_value
+        indexes = np.ceil(np.log(values[~small]) / self._log_gamma).astype(np.int64)
+        if len(indexes):
+            low = int(indexes.min())
+            counts = np.bincount(indexes - low)
+            present = np.flatnonzero(counts)
+            pairs = zip((present + low).tolist(), counts[present].tolist())
+            if not self.buckets:
+                self.buckets = dict(pairs)
+            else:
+                for index, n in pairs:
+                    self.buckets[index] = self.buckets.get(index, 0) + n
+        self.zero_count += int(small.sum())
+        self.count += len(values)
+
+    def merge(self, other: LogHistogram) -> LogHistogram:
+        if (other.relative_accuracy, other.min_value) != (self.relative_accuracy, self.min_value):
+            raise ValueError("cannot merge sketches with different accuracy")
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def subtract(self, other: LogHistogram) -> LogHistogram:
+        if (other.relative_accuracy, other.min_value) != (self.relative_accuracy, self.min_value):
+            raise ValueError("cannot subtract sketches with different accuracy")
+        if any(self.buckets.get(index, 0) < n for index, n in other.buckets.items()):
+            raise ValueError("subtracted sketch is not contained in this one")
+        for index, n in other.buckets.items():
+            remaining = self.buckets[index] - n
+            if remaining:
+                self.buckets[index] = remaining
+            else:
+                del self.buckets[index]
+        self.zero_count -= other.zero_count
+        self.count -= other.count
+        return self
+
+    def empty(self) -> LogHistogram:
+        return LogHistogram(self.relative_accuracy, self.min_value)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            raise ValueError("quantile of empty sketch")
+        k = nearest_rank(self.count, q)
+        if k < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > k:
+                return 2 * self.gamma**index / (self.gamma + 1)
+        raise ValueError("sketch counts are inconsistent")
+
+    def nbytes(self) -> int:
+        return 16 * len(self.buckets)
+
+    def to_bytes(self) -> bytes:
+        header = _LOG_HEADER.pack(self.relative_accuracy, self.min_value, self.zero_count, self.count)
+        pairs = np.array(sorted(self.buckets.items()), dtype="<i8").reshape(-1)
+        return b"G" + header + pairs.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> LogHistogram:
+        relative_accuracy, min_value, zero_count, count = _LOG_HEADER.unpack_from(data, 1)
+        sketch = cls(relative_accuracy, min_value)
+        pairs = np.frombuffer(data, dtype="<i8", offset=1 + _LOG_HEADER.size).reshape(-1, 2)
+        sketch.buckets = {int(i): int(n) for i, n in pairs}
+        sketch.zero_count, sketch.count = zero_count, count
+        return sketch
+
+
+_KINDS: dict[bytes, type] = {b"E": ExactQuantiles, b"L": LinearHistogram, b"G": LogHistogram}
+
+# Percent metrics are bounded, so they get fixed bins; the rest are open-ended.
+BOUNDED_METRICS = frozenset({"gpu_util", "cpu_util", "ram_used"})
+
+
+def merge_sketches(target: QuantileSketch, other: QuantileSketch) -> QuantileSketch:
+    """`target.merge(other)`, also across exact and bounded sketches of one metric, returning the result.
+
+    Exact quantiles of a union need every sample, so a mix merges into a bounded sketch (a new one when
+    `target` is exact), as accurate as `other`'s bins.
+    """
+    if type(target) is type(other):
+        return target.merge(other)
+    if isinstance(other, ExactQuantiles):
+        target.extend(np.frombuffer(other.values, dtype=np.float64))
+        return target
+    if isinstance(target, ExactQuantiles):
+        bounded = other.empty()
+        bounded.extend(np.frombuffer(target.values, dtype=np.float64))
+        return bounded.merge(other)
+    raise ValueError("cannot merge different bounded sketches")
+
+
+def from_bytes(data: bytes) -> QuantileSketch:
+    kind = _KINDS.get(data[:1])
+    if kind is None:
+        raise ValueError("unknown sketch payload")
+    return kind.from_bytes(data)
+
+
+class SketchFactory:
+    def __init__(
+        self,
+        mode: str = "exact",
+        accuracy: float = DEFAULT_ACCURACY,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+    ) -> None:
+        if mode not in SKETCH_MODES:
+            raise ValueError(f"unknown sketch mode: {mode}")
+        self.mode = mode
+        self.accuracy = accuracy
+        self.relative_accuracy = relative_accuracy
+
+    def __call__(self, metric: str) -> QuantileSketch:
+        if self.mode == "exact":
+            return ExactQuantiles()
+        if metric in BOUNDED_METRICS:
+            return LinearHistogram(0.0, 100.0, self.accuracy)
+        return LogHistogram(self.relative_accuracy)
+
+    def bound(self, metric: str, sketch: QuantileSketch) -> QuantileSketch:
+        """`sketch` as the sketch-mode sketch for `metric`, with this factory's accuracies; bounded sketches
+        come back as they are."""
+        if not isinstance(sketch, ExactQuantiles):
+            return sketch
+        bounded = SketchFactory("sketch", self.accuracy, self.relative_accuracy)(metric)
+        bounded.extend(np.frombuffer(sketch.values, dtype=np.float64))
+        return bounded
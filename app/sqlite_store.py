@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+from app.dedupe import DedupeIndex
+from app.rec_compact import CompactRecommendation
+from app.rollups import COUNTER_FIELDS, P95, SKETCHED_METRICS, DailyRollup
+from app.schemas import (
+    CapabilityBatchIn,
+    PolicyCreateIn,
+    PolicyPatchIn,
+    PolicyProfile,
+    Recommendation,
+    TelemetryBatchIn,
+)
+from app.sketches import from_bytes
+from app.storage import TENANT_SHARDS, InMemoryStore
+
+DEFAULT_POOL_SIZE = 4
+FLOAT_COUNTERS = frozenset({"disk_busy_minutes", "interactive_ratio_sum"})
+
+# SQLite has no declarative partitioning; WITHOUT ROWID tables clustered on
+# (tenant_id, summary_date, ...) keep each tenant/day contiguous on disk instead.
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS ingested_batch (
+    tenant_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    batch_id TEXT NOT NULL,
+    PRIMARY KEY (tenant_id, source, batch_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS telemetry_daily_summary (
+    tenant_id TEXT NOT NULL,
+    summary_date TEXT NOT NULL,
+    device_key TEXT NOT NULL,
+    {", ".join(f"{name} {'REAL' if name in FLOAT_COUNTERS else 'INTEGER'} NOT NULL" for name in COUNTER_FIELDS)},
+    {", ".join(f"{name}_p95 REAL" for name in SKETCHED_METRICS)},
+    {", ".join(f"{name}_sketch BLOB NOT NULL" for name in SKETCHED_METRICS)},
+    PRIMARY KEY (tenant_id, summary_date, device_key)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS telemetry_daily_summary_device
+    ON telemetry_daily_summary (tenant_id, device_key, summary_date);
+
+CREATE TABLE IF NOT EXISTS workload_app_category_daily (
+    tenant_id TEXT NOT NULL,
+    summary_date TEXT NOT NULL,
+    device_key TEXT NOT NULL,
+    category TEXT NOT NULL,
+    active_minutes INTEGER NOT NULL,
+    PRIMARY KEY (tenant_id, summary_date, device_key, category)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS capability_batch (
+    tenant_id TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS policy_profile (
+    policy_id TEXT PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS recommendation (
+    recommendation_id TEXT NOT NULL UNIQUE,
+    tenant_id TEXT NOT NULL,
+    device_key TEXT NOT NULL,
+    run_date TEXT NOT NULL,
+    action TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS recommendation_tenant_run ON recommendation (tenant_id, run_date);
+"""
+
+_SUMMARY_COLUMNS = (
+    "tenant_id",
+    "summary_date",
+    "device_key",
+    *COUNTER_FIELDS,
+    *(f"{name}_p95" for name in SKETCHED_METRICS),
+    *(f"{name}_sketch" for name in SKETCHED_METRICS),
+)
+_UPSERT_SUMMARY = (
+    f"INSERT OR REPLACE INTO telemetry_daily_summary ({', '.join(_SUMMARY_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_SUMMARY_COLUMNS))})"
+)
+
+
+class ConnectionPool:
+    def __init__(self, path: str | Path, size: int = DEFAULT_POOL_SIZE) -> None:
+        if size <= 0:
+            raise ValueError("pool size must be positive")
+        self.path = str(path)
+        self.size = size
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._all: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                conn = self._connect() if len(self._all) < self.size else None
+                if conn is not None:
+                    self._all.append(conn)
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.connection() as conn, conn:
+            yield conn
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._idle = queue.LifoQueue()
+
+
+def _summary_row(tenant_id: str, device_key: str, rollup: DailyRollup) -> tuple:
+    sketches = [getattr(rollup, name) for name in SKETCHED_METRICS]
+    return (
+        tenant_id,
+        rollup.summary_date.isoformat(),
+        device_key,
+        *(getattr(rollup, name) for name in COUNTER_FIELDS),
+        *(s.quantile(P95) if len(s) else None for s in sketches),
+        *(s.to_bytes() for s in sketches),
+    )
+
+
+def _rollup_from_row(row: sqlite3.Row) -> DailyRollup:
+    rollup = DailyRollup(date.fromisoformat(row["summary_date"]))
+    for name in COUNTER_FIELDS:
+        setattr(rollup, name, row[name])
+    for name in SKETCHED_METRICS:
+        setattr(rollup, name, from_bytes(row[f"{name}_sketch"]))
+    return rollup
+
+
+_SummaryWrites = tuple[list[tuple], list[tuple], list[tuple]]
+
+
+def _summary_writes(tenant_id: str, rollups: Iterable[tuple[str, DailyRollup]]) -> _SummaryWrites:
+    """Parameters for `_write_summaries`, built before taking the write lock."""
+    summaries = []
+    stale_apps = []
+    apps = []
+    for device_key, rollup in rollups:
+        day = rollup.summary_date.isoformat()
+        summaries.append(_summary_row(tenant_id, device_key, rollup))
+        stale_apps.append((tenant_id, day, device_key))
+        apps.extend((tenant_id, day, device_key, category, minutes) for category, minutes in rollup.app_minutes.items())
+    return summaries, stale_apps, apps
+
+
+def _write_summaries(conn: sqlite3.Connection, writes: _SummaryWrites) -> None:
+    summaries, stale_apps, apps = writes
+    conn.executemany(_UPSERT_SUMMARY, summaries)
+    conn.executemany(
+        "DELETE FROM workload_app_category_daily WHERE tenant_id = ? AND summary_date = ? AND device_key = ?",
+        stale_apps,
+    )
+    conn.executemany("INSERT INTO workload_app_category_daily VALUES (?, ?, ?, ?, ?)", apps)
+
+
+class SqliteStore(InMemoryStore):
+    """InMemoryStore that writes every mutation through to SQLite and reloads it on open.
+
+    Only daily summaries are persisted, so signals always come from the rollup backend. Writes take the
+    tenant lock first, as the in-memory side does, and `_write_lock` inside it around just the SQLite
+    transaction; SQLite has one writer anyway, and tenants' in-memory work stays concurrent.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        sketch_mode: str = "exact",
+        pool_size: int = DEFAULT_POOL_SIZE,
+        archive_dir: str | None = None,
+        dedupe: DedupeIndex | None = None,
+        shards: int = TENANT_SHARDS,
+    ) -> None:
+        super().__init__(
+            aggregation_backend="rollup", sketch_mode=sketch_mode, archive_dir=archive_dir, dedupe=dedupe, shards=shards
+        )
+        self.path = str(path)
+        self.pool = ConnectionPool(path, pool_size)
+        self._write_lock = threading.Lock()
+        with self.pool.transaction() as conn:
+            conn.executescript(SCHEMA)
+        self._load()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def _load(self) -> None:
+        with self.pool.connection() as conn:
+            conn.row_factory = sqlite3.Row
+            try:
+                for row in conn.execute("SELECT tenant_id, source, batch_id FROM ingested_batch"):
+                    self.dedupe.claim_batch(*row)
+                app_minutes: dict[tuple[str, str, str], dict[str, int]] = {}
+                for row in conn.execute("SELECT * FROM workload_app_category_daily"):
+                    key = (row["tenant_id"], row["device_key"], row["summary_date"])
+                    app_minutes.setdefault(key, {})[row["category"]] = row["active_minutes"]
+                for row in conn.execute("SELECT * FROM telemetry_daily_summary ORDER BY tenant_id, summary_date"):
+                    rollup = _rollup_from_row(row)
+                    rollup.app_minutes = app_minutes.get((row["tenant_id"], row["device_key"], row["summary_date"]), {})
+                    self.rollups.put(row["tenant_id"], row["device_key"], rollup)
+                for row in conn.execute("SELECT payload FROM capability_batch ORDER BY rowid"):
+                    payload = CapabilityBatchIn.model_validate_json(row["payload"])
+                    self.capabilities.add_batch(payload)
+                for row in conn.execute("SELECT payload FROM policy_profile"):
+                    policy = PolicyProfile.model_validate_json(row["payload"])
+                    self.policies[policy.policy_id] = policy
+                for row in conn.execute("SELECT payload FROM recommendation ORDER BY rowid"):
+                    super().save_recommendation(
+                        CompactRecommendation.from_model(Recommendation.model_validate_json(row["payload"]))
+                    )
+            finally:
+                conn.row_factory = None
+
+    def _ingest(self, payload: TelemetryBatchIn) -> tuple[int, bool]:
+        key = (payload.tenant_id, payload.source, payload.batch_id)
+        claimed = self._claim(payload)
+        if claimed is None:
+            return 0, True
+        # Rows come from staged copies and the rollups change only once the commit succeeds; a failed commit
+        # releases the claim, so the resend is stored rather than dropped as a duplicate.
+        try:
+            staged = self.rollups.stage_batch(claimed)
+            writes = _summary_writes(claimed.tenant_id, [(device_key, r) for (device_key, _), r in staged.items()])
+            with self._write_lock, self.pool.transaction() as conn:
+                conn.execute("INSERT OR IGNORE INTO ingested_batch VALUES (?, ?, ?)", key)
+                _write_summaries(conn, writes)
+        except BaseException:
+            self.dedupe.release(claimed)
+            raise
+        if claimed.records:
+            if self.archive is not None:
+                self.archive.append_batch(claimed)
+            self.rollups.add_batch(claimed)
+        return len(claimed.records), False
+
+    def _summaries_expired(self, tenant_id: str, expired: list[tuple[str, DailyRollup]]) -> None:
+        keys = [(tenant_id, rollup.summary_date.isoformat(), device_key) for device_key, rollup in expired]
+        with self._write_lock, self.pool.transaction() as conn:
+            for table in ("telemetry_daily_summary", "workload_app_category_daily"):
+                conn.executemany(
+                    f"DELETE FROM {table} WHERE tenant_id = ? AND summary_date = ? AND device_key = ?", keys
+                )
+
+    def _summaries_bounded(self, tenant_id: str, bounded: list[tuple[str, DailyRollup]]) -> None:
+        writes = _summary_writes(tenant_id, bounded)
+        with self._write_lock, self.pool.transaction() as conn:
+            _write_summaries(conn, writes)
+
+    def mark_batch(self, tenant_id: str, source: str, batch_id: str) -> None:
+        with self._write_lock, self.pool.transaction() as conn:
+            super().mark_batch(tenant_id, source, batch_id)
+            conn.execute("INSERT OR IGNORE INTO ingested_batch VALUES (?, ?, ?)", (tenant_id, source, batch_id))
+
+    def ingest_capabilities(self, payload: CapabilityBatchIn) -> int:
+        with self.tenant_lock(payload.tenant_id), self.pool.transaction() as conn:
+            conn.execute("INSERT INTO capability_batch VALUES (?, ?)", (payload.tenant_id, payload.model_dump_json()))
+            return super().ingest_capabilities(payload)
+
+    def _write_policy(self, policy: PolicyProfile) -> None:
+        with self.pool.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO policy_profile VALUES (?, ?, ?)",
+                (policy.policy_id, policy.tenant_id, policy.model_dump_json()),
+            )
+
+    def create_policy(self, payload: PolicyCreateIn) -> PolicyProfile:
+        with self.tenant_lock(payload.tenant_id):
+            policy = super().create_policy(payload)
+            self._write_policy(policy)
+        return policy
+
+    def patch_policy(self, policy_id: str, patch: PolicyPatchIn) -> PolicyProfile | None:
+        policy = self.policies.get(policy_id)
+        if not policy:
+            return None
+        with self.tenant_lock(policy.tenant_id):
+            policy = super().patch_policy(policy_id, patch)
+            self._write_policy(policy)
+        return policy
+
+    def save_recommendations(self, recs: Iterable[CompactRecommendation]) -> None:
+        by_tenant: dict[str, list[CompactRecommendation]] = {}
+        for rec in recs:
+            by_tenant.setdefault(rec.tenant_id, []).append(rec)
+        # One tenant lock at a time, so saves spanning tenants cannot deadlock.
+        for tenant_id, group in by_tenant.items():
+            with self.tenant_lock(tenant_id), self.pool.transaction() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO recommendation VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            rec.recommendation_id,
+                            rec.tenant_id,
+                            rec.device_key,
+                            rec.run_date.isoformat(),
+                            rec.action.value,
+                            rec.status,
+                            rec.to_json(),
+                        )
+                        for rec in group
+                    ],
+                )
+                for rec in group:
+                    super().save_recommendation(rec)
+
+    def save_recommendation(self, rec: CompactRecommendation) -> None:
+        self.save_recommendations([rec])
+
+    def set_recommendation_status(self, recommendation_id: str, status: str) -> CompactRecommendation | None:
+        rec = self.recommendations.get(recommendation_id)
+        if not rec:
+            return None
+        with self.tenant_lock(rec.tenant_id):
+            rec = super().set_recommendation_status(recommendation_id, status)
+            with self.pool.transaction() as conn:
+                conn.execute(
+                    "UPDATE recommendation SET status = ?, payload = ? WHERE recommendation_id = ?",
+                    (status, rec.to_json(), recommendation_id),
+                )
+        return rec
+
+    def summary_rows(self, tenant_id: str, start: date, end: date) -> list[tuple]:
+        columns = ", ".join(("device_key", "summary_date", "samples", *(f"{n}_p95" for n in SKETCHED_METRICS)))
+        with self.pool.connection() as conn:
+            return conn.execute(
+                f"SELECT {columns} FROM telemetry_daily_summary "
+                "WHERE tenant_id = ? AND summary_date BETWEEN ? AND ? ORDER BY summary_date, device_key",
+                (tenant_id, start.isoformat(), end.isoformat()),
+            ).fetchall()
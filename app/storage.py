@@ -1,41 +1,176 @@
 from __future__ import annotations
 
-from collections import defaultdict
+import os
+import threading
+import time
+from collections.abc import Collection, Iterable, Iterator, Sequence
 from datetime import UTC, date, datetime
+from typing import Any
 from uuid import uuid4
 
+from app.aggregation import BACKENDS, summarize_devices
+from app.capabilities import CapabilityIndex, apply_vram
+from app.dedupe import DedupeIndex
+from app.fingerprints import FleetFingerprints
+from app.metrics import record_ingest, stage
+from app.rec_changes import ChangeFeed, ChangeRun, moved
+from app.rec_compact import CompactRecommendation
+from app.rec_index import RecommendationIndex
+from app.recommend import build_recommendations, downsize_savings, make_recommendation
+from app.retention import CompactionReport, raw_cutoff, retained_app_minutes
+from app.rollups import DailyRollup, DailyRollupStore, RollupSnapshot
+from app.runner import RecommendationRun, shard_of
 from app.schemas import (
-    Action,
     CapabilityBatchIn,
-    Classification,
     PolicyCreateIn,
     PolicyPatchIn,
     PolicyProfile,
-    Recommendation,
     TelemetryBatchIn,
 )
-from app.scoring import SignalSummary, classify_and_action, compute_scores
+from app.score_cache import ScoreCache, SimulationReport
+from app.scoring import ScoringParams, SignalArrays, SignalSummary
+from app.segments import SegmentArchive
+from app.sketches import SketchFactory
+from app.telemetry_store import SeriesSnapshot, TelemetryColumns
+from app.whatif import VariantOutcome, evaluate_variants
+from app.windows import WindowEngine
+
+SIGNAL_BACKENDS = ("rollup", *BACKENDS)
+TENANT_SHARDS = 16
 
 
 class InMemoryStore:
-    def __init__(self) -> None:
-        self.ingested_batches: set[tuple[str, str, str]] = set()
-        self.telemetry: dict[str, list[TelemetryBatchIn]] = defaultdict(list)
-        self.capabilities: dict[str, list[CapabilityBatchIn]] = defaultdict(list)
+    """Tenant state shared by the API's worker threads.
+
+    Tenants hash onto `shards` locks. A tenant's lock guards everything scoped to it: ingestion, compaction,
+    capability snapshots, policy patches, recommendation writes and status changes, and the snapshot a
+    run scores from. Tenants on different shards never wait on each other. Recommendation runs read their
+    signals under the lock and score after releasing it, so a long run holds off the tenant's ingestion
+    only while it aggregates; simulations also fill the score cache under it. `device_signals` does not
+    lock, so callers that race ingestion hold `tenant_lock`.
+    """
+
+    def __init__(
+        self,
+        aggregation_backend: str = "rollup",
+        sketch_mode: str = "exact",
+        archive_dir: str | None = None,
+        dedupe: DedupeIndex | None = None,
+        shards: int = TENANT_SHARDS,
+    ) -> None:
+        if aggregation_backend not in SIGNAL_BACKENDS:
+            raise ValueError(f"unknown aggregation backend: {aggregation_backend}")
+        if shards <= 0:
+            raise ValueError("shards must be positive")
+        self.aggregation_backend = aggregation_backend
+        self.dedupe = dedupe or DedupeIndex()
+        self.telemetry = TelemetryColumns()
+        self.rollups = DailyRollupStore(SketchFactory(sketch_mode))
+        self.windows = WindowEngine(self.rollups)
+        self.capabilities = CapabilityIndex()
+        self.score_cache = ScoreCache(self.rollups, self.capabilities)
         self.policies: dict[str, PolicyProfile] = {}
-        self.recommendations: dict[str, Recommendation] = {}
+        self.recommendations: dict[str, CompactRecommendation] = {}
+        self.recommendation_index = RecommendationIndex()
+        self.recommendation_runs: dict[str, RecommendationRun] = {}
+        self.recommendation_changes = ChangeFeed()
+        self._fingerprints: dict[tuple[str, int | None], FleetFingerprints] = {}
+        self.rollups.subscribe(self._drop_fingerprints)
+        self.archive = SegmentArchive(archive_dir) if archive_dir else None
+        # Re-entrant so a locked operation can call another, as simulate does with upsert.
+        self._tenant_locks = [threading.RLock() for _ in range(shards)]
+
+    def tenant_lock(self, tenant_id: str) -> threading.RLock:
+        return self._tenant_locks[shard_of(tenant_id, len(self._tenant_locks))]
+
+    def _claim(self, payload: TelemetryBatchIn) -> TelemetryBatchIn | None:
+        """None for a replayed batch id, else the batch narrowed to records not ingested before."""
+        if not self.dedupe.claim_batch(payload.tenant_id, payload.source, payload.batch_id):
+            return None
+        records = self.dedupe.new_records(payload)
+        if len(records) == len(payload.records):
+            return payload
+        return payload.model_copy(update={"records": records})
 
     def ingest_telemetry(self, payload: TelemetryBatchIn) -> tuple[int, bool]:
-        key = (payload.tenant_id, payload.source, payload.batch_id)
-        if key in self.ingested_batches:
+        with self.tenant_lock(payload.tenant_id):
+            accepted, deduped = self._ingest(payload)
+        record_ingest(accepted, deduped)
+        return accepted, deduped
+
+    def _ingest(self, payload: TelemetryBatchIn) -> tuple[int, bool]:
+        payload = self._claim(payload)
+        if payload is None:
             return 0, True
-        self.ingested_batches.add(key)
-        self.telemetry[payload.tenant_id].append(payload)
-        return len(payload.records), False
+        if not payload.records:
+            return 0, False
+        try:
+            if self.archive is not None:
+                self.archive.append_batch(payload)
+            self.rollups.add_batch(payload)
+            return self.telemetry.append_batch(payload), False
+        except BaseException:
+            # Let the client resend the batch rather than have it dropped as a duplicate.
+            self.dedupe.release(payload)
+            raise
+
+    def compact_devices(
+        self, tenant_id: str, device_keys: Sequence[str], raw_before: date, summaries_before: date
+    ) -> CompactionReport:
+        """Drop the devices' raw samples from days before `raw_before` and their daily rollups from days before
+        `summaries_before`, holding the tenant's lock for just these devices.
+
+        The rollups already carry every raw day's p95 sketches, counters and app minutes, so dropping raw
+        samples loses nothing the rollup backend scores from. The raw backends only see the raw tier. Rollups
+        of days older than the raw tier swap exact quantiles, whose arrays hold every sample, for bounded
+        sketches wherever those are smaller.
+        """
+        started = time.perf_counter()
+        report = CompactionReport(devices=len(device_keys), steps=1)
+        cutoff = raw_cutoff(raw_before)
+        compacted: set[str] = set()
+        with self.tenant_lock(tenant_id):
+            for device_key in device_keys:
+                series, dropped, reclaimed = self.telemetry.drop_before(tenant_id, device_key, cutoff)
+                if not len(dropped):
+                    continue
+                compacted.add(device_key)
+                report.raw_records += len(dropped)
+                report.raw_bytes += reclaimed
+                if series is not None:
+                    series.app_minutes = retained_app_minutes(self.rollups, tenant_id, device_key, series)
+            expired = self.rollups.drop_before(tenant_id, summaries_before, device_keys)
+            if expired:
+                report.summaries = len(expired)
+                report.summary_bytes = sum(rollup.nbytes() for _, rollup in expired)
+                self._summaries_expired(tenant_id, expired)
+            bounded, freed = self.rollups.bound_before(tenant_id, raw_before, device_keys)
+            if bounded:
+                report.sketches = len(bounded)
+                report.sketch_bytes = freed
+                self._summaries_bounded(tenant_id, bounded)
+            if compacted and self.aggregation_backend != "rollup":
+                # Raw-backend signals just changed without any rollup changing.
+                self.score_cache.invalidate_devices(tenant_id, compacted)
+                self._drop_fingerprints(tenant_id, set())
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _summaries_expired(self, tenant_id: str, expired: list[tuple[str, DailyRollup]]) -> None:
+        """Called with the tenant lock held after retention drops daily rollups."""
+
+    def _summaries_bounded(self, tenant_id: str, bounded: list[tuple[str, DailyRollup]]) -> None:
+        """Called with the tenant lock held after retention swaps daily rollups' exact sketches for bounded ones."""
+
+    def has_batch(self, tenant_id: str, source: str, batch_id: str) -> bool:
+        return self.dedupe.has_batch(tenant_id, source, batch_id)
+
+    def mark_batch(self, tenant_id: str, source: str, batch_id: str) -> None:
+        self.dedupe.claim_batch(tenant_id, source, batch_id)
 
     def ingest_capabilities(self, payload: CapabilityBatchIn) -> int:
-        self.capabilities[payload.tenant_id].append(payload)
-        return len(payload.snapshots)
+        with self.tenant_lock(payload.tenant_id):
+            return self.capabilities.add_batch(payload)
 
     def create_policy(self, payload: PolicyCreateIn) -> PolicyProfile:
         policy = PolicyProfile(
@@ -58,87 +193,275 @@ class InMemoryStore:
         policy = self.policies.get(policy_id)
         if not policy:
             return None
-        data = policy.model_dump()
-        for field, value in patch.model_dump(exclude_none=True).items():
-            data[field] = value
-        updated = PolicyProfile(**data)
-        self.policies[policy_id] = updated
-        return updated
-
-    def generate_recommendations(self, tenant_id: str) -> list[Recommendation]:
-        batches = self.telemetry.get(tenant_id, [])
-        if not batches:
-            return []
-
-        by_device: dict[str, list] = defaultdict(list)
-        for batch in batches:
-            by_device.update({})
-            for r in batch.records:
-                by_device[r.device_key].append(r)
-
-        results: list[Recommendation] = []
-        for device_key, recs in by_device.items():
-            gpu_util_p95 = sorted([x.gpu.util_pct for x in recs])[int(0.95 * (len(recs) - 1))]
-            cpu_util_p95 = sorted([x.cpu.util_pct for x in recs])[int(0.95 * (len(recs) - 1))]
-            ram_used_p95 = sorted([x.ram.used_pct for x in recs])[int(0.95 * (len(recs) - 1))]
-            vram_pct_values = [min(100.0, x.gpu.vram_used_mb / 8192.0 * 100.0) for x in recs]
-            vram_used_p95_pct = sorted(vram_pct_values)[int(0.95 * (len(vram_pct_values) - 1))]
-            paging_minutes = sum(x.ram.paging_pressure for x in recs)
-            disk_latency_p95_ms = sorted([x.disk.latency_ms for x in recs])[int(0.95 * (len(recs) - 1))]
-            disk_busy_minutes = sum((x.disk.busy_pct / 100.0) * 5 for x in recs)
-            disk_queue_p95 = sorted([x.disk.queue_len for x in recs])[int(0.95 * (len(recs) - 1))]
-            thermal_events = sum(1 for x in recs if x.thermal.throttle_event)
-            active_minutes = sum(x.gpu.active_minutes for x in recs)
-            heavy_categories = {"CAD", "ML", "VIDEO", "IDE", "BI"}
-            total_app_minutes = sum(a.active_minutes for x in recs for a in x.apps) or 1
-            heavy_minutes = sum(
-                a.active_minutes for x in recs for a in x.apps if a.category.upper() in heavy_categories
-            )
-            light_app_mix_factor = max(0.0, min(1.0, 1 - heavy_minutes / total_app_minutes))
-
-            signals = SignalSummary(
-                gpu_util_p95=gpu_util_p95,
-                vram_used_p95_pct=vram_used_p95_pct,
-                cpu_util_p95=cpu_util_p95,
-                ram_used_p95=ram_used_p95,
-                paging_pressure_minutes=paging_minutes,
-                disk_latency_p95_ms=disk_latency_p95_ms,
-                disk_busy_minutes=disk_busy_minutes,
-                disk_queue_p95=disk_queue_p95,
-                thermal_throttle_events=thermal_events,
-                active_minutes=active_minutes,
-                light_app_mix_factor=light_app_mix_factor,
+        with self.tenant_lock(policy.tenant_id):
+            # Re-read: a concurrent patch may have bumped the version while this one waited.
+            policy = self.policies[policy_id]
+            data = policy.model_dump()
+            for field, value in patch.model_dump(exclude_none=True).items():
+                data[field] = value
+            data["version"] = policy.version + 1
+            updated = PolicyProfile(**data)
+            self.policies[policy_id] = updated
+            self.score_cache.invalidate_policy(policy_id)
+            return updated
+
+    def save_recommendation(self, rec: CompactRecommendation) -> None:
+        with self.tenant_lock(rec.tenant_id):
+            self.recommendations[rec.recommendation_id] = rec
+            self.recommendation_index.update(rec)
+
+    def save_recommendations(self, recs: Iterable[CompactRecommendation]) -> None:
+        for rec in recs:
+            self.save_recommendation(rec)
+
+    def upsert_recommendations(
+        self,
+        tenant_id: str,
+        policy_id: str | None,
+        recs: Iterable[CompactRecommendation],
+        run_id: str | None = None,
+    ) -> tuple[ChangeRun, list[CompactRecommendation]]:
+        """Store a run's recommendations over the previous run's, keyed by their stable ids.
+
+        Only new recommendations and those that `moved` are saved; the rest keep the stored object. A moved
+        recommendation keeps its status unless its classification or action changed. Returns the run's
+        change set and the stored recommendation for every device in `recs`. Holds the tenant lock, so an
+        approval either lands before the comparison and carries over, or after it and sticks.
+        """
+        current: list[CompactRecommendation] = []
+        created: list[CompactRecommendation] = []
+        updated: list[CompactRecommendation] = []
+        with self.tenant_lock(tenant_id):
+            for rec in recs:
+                old = self.recommendations.get(rec.recommendation_id)
+                if old is None:
+                    created.append(rec)
+                elif moved(old, rec):
+                    if (old.classification, old.action) == (rec.classification, rec.action):
+                        rec.status = old.status
+                    updated.append(rec)
+                else:
+                    rec = old
+                current.append(rec)
+            self.save_recommendations(created + updated)
+            run = self.recommendation_changes.record(
+                tenant_id,
+                policy_id,
+                run_id or str(uuid4()),
+                len(current),
+                [rec.recommendation_id for rec in created],
+                [rec.recommendation_id for rec in updated],
             )
-            scores = compute_scores(signals)
-            classification, action = classify_and_action(scores)
-            confidence = 0.85
-            if classification == Classification.RIGHT_SIZED:
-                confidence = 0.70
-            if action == Action.DOWNSIZE and scores["overprov"] > 80:
-                confidence = 0.90
-
-            rec = Recommendation(
-                recommendation_id=str(uuid4()),
-                tenant_id=tenant_id,
-                device_key=device_key,
-                run_date=date.today(),
-                classification=classification,
+        return run, current
+
+    def recommendation_changes_since(
+        self, tenant_id: str, policy_id: str | None = None, run_id: str | None = None
+    ) -> tuple[ChangeRun | None, list[CompactRecommendation]]:
+        """The latest run for the scope and what changed after `run_id`; with no `run_id`, every stored
+        recommendation in the scope, which is also how a consumer resyncs after a restart.
+
+        Raises KeyError if `run_id` is unknown, expired or from another scope.
+        """
+        with self.tenant_lock(tenant_id):
+            latest = self.recommendation_changes.latest(tenant_id, policy_id)
+            if run_id is None:
+                return latest, [rec for rec in self.iter_recommendations(tenant_id) if rec.policy_id == policy_id]
+            ids = self.recommendation_changes.since(tenant_id, policy_id, run_id)
+            return latest, [self.recommendations[x] for x in ids]
+
+    def set_recommendation_status(self, recommendation_id: str, status: str) -> CompactRecommendation | None:
+        rec = self.recommendations.get(recommendation_id)
+        if not rec:
+            return None
+        with self.tenant_lock(rec.tenant_id):
+            # A run may have replaced the stored object while this waited.
+            rec = self.recommendations[recommendation_id]
+            rec.status = status
+            self.recommendation_index.update(rec)
+            return rec
+
+    def query_recommendations(
+        self,
+        tenant_id: str,
+        action: str | None = None,
+        classification: str | None = None,
+        min_confidence: float | None = None,
+        status: str | None = None,
+        cursor: str | None = None,
+        limit: int | None = None,
+    ) -> tuple[list[CompactRecommendation], str | None]:
+        after = None
+        if cursor:
+            if not cursor.isdigit():
+                raise ValueError("invalid cursor")
+            after = int(cursor)
+        with self.tenant_lock(tenant_id):
+            ids, next_seq = self.recommendation_index.query(
+                tenant_id,
                 action=action,
-                confidence=confidence,
-                workload_fit_score=round(scores["fit"], 2),
-                overprovision_score=round(scores["overprov"], 2),
-                expected_savings_usd_annual=1200.0 if action == Action.DOWNSIZE else 0.0,
-                risk_flags=["THERMAL"] if thermal_events > 3 else [],
-                top_reasons=[
-                    f"GPU pressure={scores['gpu_pressure']:.2f}",
-                    f"RAM pressure={scores['ram_pressure']:.2f}",
-                    f"Disk score={scores['disk_score']:.2f}",
-                ],
-                status="PENDING" if action != Action.EXTEND_LIFE else "NO_ACTION",
+                classification=classification,
+                min_confidence=min_confidence,
+                status=status,
+                after=after,
+                limit=limit,
             )
-            self.recommendations[rec.recommendation_id] = rec
-            results.append(rec)
-        return results
+            return [self.recommendations[x] for x in ids], None if next_seq is None else str(next_seq)
+
+    def iter_recommendations(
+        self,
+        tenant_id: str,
+        action: str | None = None,
+        classification: str | None = None,
+        min_confidence: float | None = None,
+        status: str | None = None,
+        page: int = 5000,
+    ) -> Iterator[CompactRecommendation]:
+        """Every match, fetched a page at a time so a streamed response holds one page of ids."""
+        cursor = None
+        while True:
+            recs, cursor = self.query_recommendations(
+                tenant_id, action, classification, min_confidence, status, cursor=cursor, limit=page
+            )
+            yield from recs
+            if cursor is None:
+                return
+
+    def memory_usage(self) -> dict[str, int]:
+        return {
+            **self.telemetry.memory_usage(),
+            "rollup_sketch_bytes": self.rollups.sketch_bytes(),
+            **self.dedupe.memory_usage(),
+        }
+
+    def device_signals(
+        self, tenant_id: str, window_days: int | None = None, device_keys: Collection[str] | None = None
+    ) -> dict[str, SignalSummary]:
+        if window_days is not None:
+            return self.windows.summarize(tenant_id, window_days, device_keys=device_keys)
+        if self.aggregation_backend == "rollup":
+            return self.rollups.summarize(tenant_id, device_keys=device_keys)
+        with stage("grouping"):
+            devices = self.telemetry.devices(tenant_id)
+            if device_keys is not None:
+                devices = {k: devices[k] for k in device_keys if k in devices}
+        return summarize_devices(devices, backend=self.aggregation_backend)
+
+    def signal_snapshot(
+        self, tenant_id: str, window_days: int | None = None, device_keys: Collection[str] | None = None
+    ) -> RollupSnapshot | SeriesSnapshot:
+        """A copy of what `device_signals` summarizes, for a runner worker to summarize instead. Like
+        `device_signals`, it does not lock."""
+        if window_days is not None:
+            window = self.windows.window(tenant_id, window_days)
+            merged = window.merged(device_keys) if window else {}
+            return RollupSnapshot.capture({k: (r,) for k, r in merged.items()}, self.rollups.sketch_factory)
+        if self.aggregation_backend == "rollup":
+            devices = self.rollups.devices(tenant_id)
+            keys = devices if device_keys is None else [k for k in device_keys if k in devices]
+            return RollupSnapshot.capture({k: list(devices[k].values()) for k in keys}, self.rollups.sketch_factory)
+        devices = self.telemetry.devices(tenant_id)
+        keys = devices if device_keys is None else [k for k in device_keys if k in devices]
+        return SeriesSnapshot.capture(devices[k] for k in keys)
+
+    def device_keys(self, tenant_id: str) -> list[str]:
+        if self.aggregation_backend == "rollup":
+            return list(self.rollups.devices(tenant_id))
+        return list(self.telemetry.devices(tenant_id))
+
+    def _drop_fingerprints(self, tenant_id: str, touched: set[tuple[str, date]]) -> None:
+        for key in [key for key in list(self._fingerprints) if key[0] == tenant_id]:
+            self._fingerprints.pop(key, None)
+
+    def fleet_fingerprints(self, tenant_id: str, window_days: int | None = None) -> FleetFingerprints:
+        """Built from the score cache's signals on first use and kept until the tenant's next telemetry."""
+        key = (tenant_id, window_days)
+        with self.tenant_lock(tenant_id):
+            fleet = self._fingerprints.get(key)
+            if fleet is None:
+                summaries = self.score_cache.signals(
+                    tenant_id,
+                    window_days,
+                    lambda device_keys: self.device_signals(tenant_id, window_days, device_keys=device_keys),
+                )
+                fleet = FleetFingerprints(list(summaries), SignalArrays.from_summaries(list(summaries.values())))
+                self._fingerprints[key] = fleet
+            return fleet
+
+    def similar_devices(
+        self, tenant_id: str, device_key: str, k: int = 10, window_days: int | None = None
+    ) -> list[tuple[str, float]]:
+        """Devices whose workload fingerprint is nearest `device_key`'s. Raises KeyError for an unknown device."""
+        return self.fleet_fingerprints(tenant_id, window_days).similar(device_key, k)
+
+    def generate_recommendations(
+        self, tenant_id: str, window_days: int | None = None
+    ) -> list[CompactRecommendation]:
+        with self.tenant_lock(tenant_id):
+            summaries = self.device_signals(tenant_id, window_days)
+            capabilities = self.capabilities.columns(tenant_id, list(summaries))
+        results = build_recommendations(tenant_id, summaries, capabilities=capabilities)
+        return self.upsert_recommendations(tenant_id, None, results)[1]
+
+    def simulate_policy(
+        self, tenant_id: str, policy: PolicyProfile, window_days: int | None = None
+    ) -> tuple[list[CompactRecommendation], SimulationReport]:
+        """Raises ValueError if the policy thresholds are not numeric."""
+        params = ScoringParams.from_thresholds(policy.thresholds)
+        with self.tenant_lock(tenant_id):
+            summaries, rows, report = self.score_cache.score(
+                tenant_id,
+                policy.policy_id,
+                policy.version,
+                window_days,
+                params,
+                lambda device_keys: self.device_signals(tenant_id, window_days, device_keys=device_keys),
+            )
+        run_date = date.today()
+        results = [
+            make_recommendation(tenant_id, device_key, signals, rows[device_key], run_date, policy.policy_id)
+            for device_key, signals in summaries.items()
+        ]
+        return self.upsert_recommendations(tenant_id, policy.policy_id, results)[1], report
+
+    def what_if(
+        self,
+        tenant_id: str,
+        policy: PolicyProfile,
+        variants: Sequence[dict[str, Any]],
+        window_days: int | None = None,
+    ) -> tuple[list[str], VariantOutcome, list[VariantOutcome]]:
+        """Each variant's thresholds override the policy's; nothing is persisted.
+
+        Raises ValueError if any thresholds are not numeric.
+        """
+        baseline = ScoringParams.from_thresholds(policy.thresholds)
+        params = [ScoringParams.from_thresholds({**policy.thresholds, **thresholds}) for thresholds in variants]
+        with self.tenant_lock(tenant_id):
+            summaries = self.score_cache.signals(
+                tenant_id,
+                window_days,
+                lambda device_keys: self.device_signals(tenant_id, window_days, device_keys=device_keys),
+            )
+            device_keys = list(summaries)
+            capabilities = self.capabilities.columns(tenant_id, device_keys)
+        arrays = apply_vram(SignalArrays.from_summaries(list(summaries.values())), capabilities)
+        savings = downsize_savings(capabilities, len(device_keys))
+        return device_keys, *evaluate_variants(device_keys, arrays, baseline, params, savings)
+
+    def close(self) -> None:
+        pass
+
+
+def open_store(url: str | None = None, archive_dir: str | None = None) -> InMemoryStore:
+    """`memory://` (default) or `sqlite:///path/to/db`."""
+    url = url or "memory://"
+    if url == "memory://":
+        return InMemoryStore(archive_dir=archive_dir)
+    if url.startswith("sqlite:///"):
+        from app.sqlite_store import SqliteStore
+
+        return SqliteStore(url.removeprefix("sqlite:///"), archive_dir=archive_dir)
+    raise ValueError(f"unsupported storage url: {url}")
 
 
-store = InMemoryStore()
+store = open_store(os.environ.get("ITAM_STORAGE_URL"), os.environ.get("ITAM_ARCHIVE_DIR"))
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterable, Iterator
+from typing import TYPE_CHECKING
+
+from pydantic import ValidationError
+
+from app.schemas import TelemetryBatchIn, TelemetryRecord, TelemetryStreamHeader
+
+if TYPE_CHECKING:
+    from app.storage import InMemoryStore
+
+STREAM_CHUNK_RECORDS = 1000
+MAX_LINE_BYTES = 1 << 20
+
+
+class StreamError(ValueError):
+    def __init__(self, line: int, message: str, committed: int) -> None:
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+        self.committed = committed
+
+
+def chunk_batch_id(batch_id: str, chunk: int) -> str:
+    return f"{batch_id}#chunk-{chunk}"
+
+
+class TelemetryStream:
+    """Validates an NDJSON telemetry upload and commits it in fixed-size chunks.
+
+    The first line is a TelemetryStreamHeader and every following line one TelemetryRecord.
+    Each chunk is ingested under its own derived batch id, so a retried upload skips the
+    chunks an earlier attempt already committed; the stream's own key is recorded last.
+    """
+
+    def __init__(self, store: InMemoryStore, chunk_records: int = STREAM_CHUNK_RECORDS) -> None:
+        self.store = store
+        self.chunk_records = chunk_records
+        self.header: TelemetryStreamHeader | None = None
+        self.duplicate = False
+        self.accepted = 0
+        self.committed = 0
+        self._lines = 0
+        self._chunk = 0
+        self._pending: list[bytes] = []
+
+    def feed(self, line: bytes) -> bool:
+        self._lines += 1
+        if not line.strip():
+            return False
+        if self.header is None:
+            try:
+                self.header = TelemetryStreamHeader.model_validate_json(line)
+            except ValidationError as exc:
+                raise StreamError(self._lines, _first_error(exc), 0) from None
+            self.duplicate = self.store.has_batch(self.header.tenant_id, self.header.source, self.header.batch_id)
+            return False
+        self._pending.append(line)
+        return len(self._pending) >= self.chunk_records
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        first_line = self._lines - len(self._pending) + 1
+        records = []
+        for offset, line in enumerate(self._pending):
+            try:
+                records.append(TelemetryRecord.model_validate_json(line))
+            except ValidationError as exc:
+                raise StreamError(first_line + offset, _first_error(exc), self.committed) from None
+        header = self.header
+        batch = TelemetryBatchIn.model_construct(
+            schema_version=header.schema_version,
+            tenant_id=header.tenant_id,
+            source=header.source,
+            batch_id=chunk_batch_id(header.batch_id, self._chunk),
+            sent_at=header.sent_at,
+            records=records,
+        )
+        accepted, _ = self.store.ingest_telemetry(batch)
+        self.accepted += accepted
+        self.committed += len(records)
+        self._chunk += 1
+        self._pending = []
+
+    def finish(self) -> None:
+        if self.header is None:
+            raise StreamError(self._lines, "missing stream header", 0)
+        self.flush()
+        self.store.mark_batch(self.header.tenant_id, self.header.source, self.header.batch_id)
+
+
+def _first_error(exc: ValidationError) -> str:
+    error = exc.errors()[0]
+    location = ".".join(str(x) for x in error.get("loc", ()))
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+def split_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_LINE_BYTES:
+            raise StreamError(0, "line too long", 0)
+        yield from lines
+    if buffer:
+        yield buffer
+
+
+async def split_lines_async(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_LINE_BYTES:
+            raise StreamError(0, "line too long", 0)
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+def ingest_ndjson(
+    store: InMemoryStore, chunks: Iterable[bytes], chunk_records: int = STREAM_CHUNK_RECORDS
+) -> TelemetryStream:
+    stream = TelemetryStream(store, chunk_records)
+    for line in split_lines(chunks):
+        if stream.feed(line):
+            stream.flush()
+        if stream.duplicate:
+            return stream
+    stream.finish()
+    return stream
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from operator import attrgetter
+
+import numpy as np
+
+from app.schemas import TelemetryBatchIn, TelemetryRecord
+
+_NAN = float("nan")
+
+# (column name, array typecode); NaN marks an absent optional reading.
+COLUMNS: tuple[tuple[str, str], ...] = (
+    ("observed_at", "d"),
+    ("interactive_ratio", "d"),
+    ("vdi", "b"),
+    ("gpu_util", "d"),
+    ("vram_used_mb", "d"),
+    ("gpu_active_minutes", "q"),
+    ("gpu_compute", "d"),
+    ("gpu_graphics", "d"),
+    ("cpu_util", "d"),
+    ("ram_used", "d"),
+    ("paging_pressure", "q"),
+    ("disk_latency", "d"),
+    ("disk_busy", "d"),
+    ("disk_queue", "d"),
+    ("net_throughput", "d"),
+    ("net_loss", "d"),
+    ("throttle", "b"),
+    ("on_battery", "b"),
+    ("docked", "b"),
+)
+
+
+class DeviceSeries:
+    __slots__ = ("device_key", "app_minutes", *(name for name, _ in COLUMNS))
+
+    def __init__(self, device_key: str) -> None:
+        self.device_key = device_key
+        self.app_minutes: dict[str, int] = {}
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def __len__(self) -> int:
+        return len(self.observed_at)
+
+    def append(self, r: TelemetryRecord) -> None:
+        gpu = r.gpu
+        disk = r.disk
+        thermal = r.thermal
+        self.observed_at.append(r.observed_at.timestamp())
+        self.interactive_ratio.append(r.session.interactive_ratio)
+        self.vdi.append(r.session.vdi)
+        self.gpu_util.append(gpu.util_pct)
+        self.vram_used_mb.append(gpu.vram_used_mb)
+        self.gpu_active_minutes.append(gpu.active_minutes)
+        self.gpu_compute.append(_NAN if gpu.compute_pct is None else gpu.compute_pct)
+        self.gpu_graphics.append(_NAN if gpu.graphics_pct is None else gpu.graphics_pct)
+        self.cpu_util.append(r.cpu.util_pct)
+        self.ram_used.append(r.ram.used_pct)
+        self.paging_pressure.append(r.ram.paging_pressure)
+        self.disk_latency.append(disk.latency_ms)
+        self.disk_busy.append(disk.busy_pct)
+        self.disk_queue.append(disk.queue_len)
+        self.net_throughput.append(r.network.throughput_mbps)
+        self.net_loss.append(r.network.loss_proxy)
+        self.throttle.append(thermal.throttle_event)
+        self.on_battery.append(thermal.on_battery)
+        self.docked.append(thermal.docked)
+        minutes = self.app_minutes
+        for a in r.apps:
+            category = a.category.upper()
+            minutes[category] = minutes.get(category, 0) + a.active_minutes
+
+    def drop_before(self, cutoff: float) -> np.ndarray:
+        """Remove samples observed before `cutoff` (a POSIX timestamp) and return their timestamps.
+
+        `app_minutes` is a running total the rows cannot be unpicked from, so the caller resets it.
+        """
+        observed = np.frombuffer(self.observed_at, dtype=np.float64)
+        old = observed < cutoff
+        dropped = observed[old].copy()
+        if len(dropped):
+            keep = ~old
+            for name, typecode in COLUMNS:
+                column = np.frombuffer(getattr(self, name), dtype=np.dtype(typecode))
+                setattr(self, name, array(typecode, column[keep].tobytes()))
+        return dropped
+
+    def row(self, index: int) -> SampleRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sample index out of range")
+        return SampleRow(self, index)
+
+    def column_bytes(self) -> int:
+        return sum(_array_bytes(getattr(self, name)) for name, _ in COLUMNS)
+
+    def overhead_bytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.app_minutes) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in self.app_minutes.items()
+        )
+
+
+class SampleRow:
+    __slots__ = ("_series", "_index")
+
+    def __init__(self, series: DeviceSeries, index: int) -> None:
+        self._series = series
+        self._index = index
+
+    def __getattr__(self, name: str) -> float:
+        if name in _COLUMN_NAMES:
+            return getattr(self._series, name)[self._index]
+        raise AttributeError(name)
+
+    def as_dict(self) -> dict[str, float]:
+        return {name: getattr(self._series, name)[self._index] for name in _COLUMN_NAMES}
+
+
+_COLUMN_NAMES = frozenset(name for name, _ in COLUMNS)
+
+
+@dataclass
+class SeriesSnapshot:
+    """Devices' sample columns copied out under the tenant lock as one byte string per column, for another
+    process to summarize."""
+
+    device_keys: list[str]
+    lengths: list[int]
+    app_minutes: list[dict[str, int]]
+    columns: dict[str, bytes]
+
+    @classmethod
+    def capture(cls, devices: Iterable[DeviceSeries]) -> SeriesSnapshot:
+        series = [s for s in devices if len(s)]
+        return cls(
+            [s.device_key for s in series],
+            [len(s) for s in series],
+            [dict(s.app_minutes) for s in series],
+            {name: b"".join(map(attrgetter(name), series)) for name, _ in COLUMNS},
+        )
+
+    def devices(self) -> dict[str, DeviceSeries]:
+        views = {name: memoryview(data) for name, data in self.columns.items()}
+        devices: dict[str, DeviceSeries] = {}
+        start = 0
+        for device_key, n, app_minutes in zip(self.device_keys, self.lengths, self.app_minutes):
+            series = devices[device_key] = DeviceSeries(device_key)
+            series.app_minutes = app_minutes
+            for name, _ in COLUMNS:
+                column = getattr(series, name)
+                column.frombytes(views[name][start * column.itemsize : (start + n) * column.itemsize])
+            start += n
+        return devices
+
+
+def _array_bytes(values: array) -> int:
+    return values.buffer_info()[1] * values.itemsize
+
+
+class TelemetryColumns:
+    def __init__(self) -> None:
+        self._tenants: dict[str, dict[str, DeviceSeries]] = {}
+
+    def __contains__(self, tenant_id: str) -> bool:
+        return tenant_id in self._tenants
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tenants)
+
+    def get(self, tenant_id: str, default: dict[str, DeviceSeries] | None = None) -> dict[str, DeviceSeries] | None:
+        return self._tenants.get(tenant_id, default)
+
+    def devices(self, tenant_id: str) -> dict[str, DeviceSeries]:
+        return self._tenants.get(tenant_id, {})
+
+    def append_batch(self, payload: TelemetryBatchIn) -> int:
+        devices = self._tenants.setdefault(payload.tenant_id, {})
+        for r in payload.records:
+            series = devices.get(r.device_key)
+            if series is None:
+                series = devices[r.device_key] = DeviceSeries(r.device_key)
+            series.append(r)
+        return len(payload.records)
+
+    def drop_before(
+        self, tenant_id: str, device_key: str, cutoff: float
+    ) -> tuple[DeviceSeries | None, np.ndarray, int]:
+        """`DeviceSeries.drop_before` for one device, forgetting the device once it has no samples left.
+
+        Returns the series (None if it is gone), the dropped timestamps and the bytes reclaimed.
+        """
+        devices = self._tenants.get(tenant_id, {})
+        series = devices.get(device_key)
+        if series is None:
+            return None, np.empty(0), 0
+        before = series.column_bytes()
+        dropped = series.drop_before(cutoff)
+        reclaimed = before - series.column_bytes()
+        if not len(series):
+            del devices[device_key]
+            return None, dropped, reclaimed + series.overhead_bytes()
+        return series, dropped, reclaimed
+
+    def record_count(self, tenant_id: str | None = None) -> int:
+        tenants = [tenant_id] if tenant_id is not None else list(self._tenants)
+        return sum(len(s) for t in tenants for s in list(self._tenants.get(t, {}).values()))
+
+    def memory_usage(self) -> dict[str, int]:
+        devices = records = column_bytes = overhead_bytes = 0
+        # Snapshots of each level, since ingestion threads may be adding tenants and devices.
+        for series_by_device in list(self._tenants.values()):
+            overhead_bytes += sys.getsizeof(series_by_device)
+            for series in list(series_by_device.values()):
+                devices += 1
+                records += len(series)
+                column_bytes += series.column_bytes()
+                overhead_bytes += series.overhead_bytes()
+        return {
+            "tenants": len(self._tenants),
+            "devices": devices,
+            "records": records,
+            "column_bytes": column_bytes,
+            "overhead_bytes": overhead_bytes,
+            "total_bytes": column_bytes + overhead_bytes,
+            "bytes_per_record": (column_bytes + overhead_bytes) // records if records else 0,
+        }
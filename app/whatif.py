@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.recommend import DOWNSIZE_SAVINGS_USD
+from app.schemas import Action
+from app.scoring import ACTIONS, CLASSIFICATIONS, SIGNAL_FIELDS, ScoringParams, SignalArrays, score_batch, stack_params
+
+# Devices scored per pass; bounds the (variants, devices) temporaries to a few MB each.
+CHUNK_DEVICES = 8192
+
+_DOWNSIZE = ACTIONS.index(Action.DOWNSIZE)
+
+
+@dataclass
+class VariantOutcome:
+    classification_counts: dict[str, int]
+    action_counts: dict[str, int]
+    expected_savings_usd_annual: float
+    changed_devices: int = 0
+    transitions: dict[str, int] = field(default_factory=dict)
+    sample_changed_devices: list[str] = field(default_factory=list)
+
+
+def _bincount_rows(values: np.ndarray, size: int) -> np.ndarray:
+    offsets = np.arange(values.shape[0])[:, None] * size
+    return np.bincount((values + offsets).ravel(), minlength=values.shape[0] * size).reshape(-1, size)
+
+
+def evaluate_variants(
+    device_keys: Sequence[str],
+    signals: SignalArrays,
+    baseline: ScoringParams,
+    variants: Sequence[ScoringParams],
+    savings: np.ndarray | None = None,
+    sample: int = 10,
+) -> tuple[VariantOutcome, list[VariantOutcome]]:
+    """Scores the baseline and every variant together; variant outcomes carry diffs against the baseline.
+
+    `savings` is each device's expected savings if downsized (the flat default when omitted).
+    """
+    if savings is None:
+        savings = np.full(len(signals), DOWNSIZE_SAVINGS_USD)
+    stacked = stack_params([baseline, *variants])
+    rows = len(variants) + 1
+    n_classes = len(CLASSIFICATIONS)
+    classification_counts = np.zeros((rows, n_classes), dtype=np.int64)
+    action_counts = np.zeros((rows, len(ACTIONS)), dtype=np.int64)
+    transitions = np.zeros((rows, n_classes * n_classes), dtype=np.int64)
+    savings_totals = np.zeros(rows)
+    changed: list[list[str]] = [[] for _ in range(rows)]
+
+    for start in range(0, len(signals), CHUNK_DEVICES):
+        chunk = slice(start, start + CHUNK_DEVICES)
+        scored = score_batch(SignalArrays(**{name: getattr(signals, name)[chunk] for name in SIGNAL_FIELDS}), stacked)
+        classification = scored["classification"].astype(np.int64)
+        classification_counts += _bincount_rows(classification, n_classes)
+        action_counts += _bincount_rows(scored["action"].astype(np.int64), len(ACTIONS))
+        savings_totals += (scored["action"] == _DOWNSIZE) @ savings[chunk]
+        transitions += _bincount_rows(classification[0] * n_classes + classification, n_classes * n_classes)
+        # The action follows from the classification, so comparing classifications is enough.
+        differs = classification != classification[0]
+        for row in np.flatnonzero(differs.any(axis=1)).tolist():
+            if len(changed[row]) < sample:
+                taken = np.flatnonzero(differs[row])[: sample - len(changed[row])]
+                changed[row].extend(device_keys[start + i] for i in taken.tolist())
+
+    outcomes = []
+    for row in range(rows):
+        outcomes.append(
+            VariantOutcome(
+                classification_counts={c.value: int(n) for c, n in zip(CLASSIFICATIONS, classification_counts[row])},
+                action_counts={a.value: int(n) for a, n in zip(ACTIONS, action_counts[row])},
+                expected_savings_usd_annual=float(savings_totals[row]),
+                changed_devices=int(transitions[row].sum() - np.trace(transitions[row].reshape(n_classes, n_classes))),
+                transitions={
+                    f"{CLASSIFICATIONS[i // n_classes].value}->{CLASSIFICATIONS[i % n_classes].value}": int(n)
+                    for i, n in enumerate(transitions[row].tolist())
+                    if n and i // n_classes != i % n_classes
+                },
+                sample_changed_devices=changed[row],
+            )
+        )
+    return outcomes[0], outcomes[1:]
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Collection, Iterable
+from datetime import date, timedelta
+
+from app.metrics import stage
+from app.rollups import P95, SKETCHED_METRICS, Counters, DailyRollup, DailyRollupStore, merge_rollups
+from app.scoring import SignalSummary
+from app.sketches import ExactQuantiles, SketchFactory, merge_sketches
+
+WINDOW_LENGTHS = (30, 60, 90)
+
+
+class DeviceWindow:
+    """A device's window totals: counters and the days' sketches merged, plus each day's share of the counters.
+
+    The days' rollups stay in the store; only the merged copy lives here.
+    """
+
+    __slots__ = ("days", "merged", "stale")
+
+    def __init__(self, merged: DailyRollup) -> None:
+        self.days: dict[date, tuple[int, Counters]] = {}
+        self.merged = merged
+        self.stale = False
+
+    def enter(self, rollup: DailyRollup) -> None:
+        day = rollup.summary_date
+        self.days[day] = (rollup.samples, rollup.counters())
+        self.merged.apply_counters(self.days[day][1])
+        if not self.stale:
+            for name in SKETCHED_METRICS:
+                setattr(self.merged, name, merge_sketches(getattr(self.merged, name), getattr(rollup, name)))
+
+    def evict(self, day: date, rollup: DailyRollup | None) -> None:
+        """`rollup` is None when retention already dropped the day from the store."""
+        _, counters = self.days.pop(day)
+        self.merged.apply_counters(counters, sign=-1)
+        if self.stale:
+            return
+        for name in SKETCHED_METRICS:
+            sketch = getattr(self.merged, name)
+            if rollup is None or not hasattr(sketch, "subtract") or type(sketch) is not type(getattr(rollup, name)):
+                self.stale = True
+                return
+            sketch.subtract(getattr(rollup, name))
+
+    def refresh(self, rollup: DailyRollup) -> None:
+        day = rollup.summary_date
+        samples, counters = self.days[day]
+        if rollup.samples == samples:
+            # Same samples, new sketches: retention bounded the day's exact quantiles, so let go of their copy.
+            self.stale = True
+            return
+        self.merged.apply_counters(counters, sign=-1)
+        self.days[day] = (rollup.samples, rollup.counters())
+        self.merged.apply_counters(self.days[day][1])
+        if self.stale:
+            return
+        sketches = [getattr(rollup, name) for name in SKETCHED_METRICS]
+        if not all(type(sketch) is ExactQuantiles for sketch in sketches):
+            # A histogram took the new samples in place, so there is no old copy of the day to subtract.
+            self.stale = True
+            return
+        # Exact sketches only append: the window lacks just the day's values past those it accounted for.
+        for name, sketch in zip(SKETCHED_METRICS, sketches):
+            added = ExactQuantiles(sketch.values[samples:])
+            setattr(self.merged, name, merge_sketches(getattr(self.merged, name), added))
+
+    def sketches(self, sketch_factory: SketchFactory, rollups: Callable[[], Iterable[DailyRollup]]) -> DailyRollup:
+        """The merged rollup, rebuilt from `rollups()`, the window's days, if a change could not be applied."""
+        if self.stale:
+            rebuilt = merge_rollups(rollups(), sketch_factory)
+            for name in SKETCHED_METRICS:
+                setattr(self.merged, name, getattr(rebuilt, name))
+            self.stale = False
+        return self.merged
+
+
+class RollingWindow:
+    def __init__(self, rollups: DailyRollupStore, tenant_id: str, length: int) -> None:
+        if length <= 0:
+            raise ValueError("window length must be positive")
+        self.rollups = rollups
+        self.tenant_id = tenant_id
+        self.length = length
+        self.end: date | None = None
+        self.devices: dict[str, DeviceWindow] = {}
+
+    @property
+    def start(self) -> date | None:
+        return None if self.end is None else self.end - timedelta(days=self.length - 1)
+
+    def contains(self, day: date) -> bool:
+        return self.end is not None and self.start <= day <= self.end
+
+    def _device(self, device_key: str) -> DeviceWindow:
+        window = self.devices.get(device_key)
+        if window is None:
+            window = self.devices[device_key] = DeviceWindow(DailyRollup(None, self.rollups.sketch_factory))
+        return window
+
+    def advance(self, as_of: date) -> None:
+        if self.end is not None and as_of <= self.end:
+            return
+        previous_end = self.end
+        self.end = as_of
+        start = self.start
+        for device_key in list(self.devices):
+            window = self.devices[device_key]
+            for day in [d for d in window.days if d < start]:
+                window.evict(day, self.rollups.get(self.tenant_id, device_key, day))
+            if not window.days:
+                del self.devices[device_key]
+        first_new = start if previous_end is None else max(start, previous_end + timedelta(days=1))
+        for device_key, days in self.rollups.devices(self.tenant_id).items():
+            for day, rollup in days.items():
+                if first_new <= day <= as_of:
+                    self._device(device_key).enter(rollup)
+
+    def observe(self, touched: Iterable[tuple[str, date]]) -> None:
+        for device_key, day in touched:
+            if not self.contains(day):
+                continue
+            rollup = self.rollups.get(self.tenant_id, device_key, day)
+            if rollup is None:
+                # Dropped by retention.
+                window = self.devices.get(device_key)
+                if window is not None and day in window.days:
+                    window.evict(day, None)
+                    if not window.days:
+                        del self.devices[device_key]
+                continue
+            window = self._device(device_key)
+            if day in window.days:
+                window.refresh(rollup)
+            else:
+                window.enter(rollup)
+
+    def _day_rollups(self, device_key: str) -> list[DailyRollup]:
+        days = self.rollups.devices(self.tenant_id).get(device_key, {})
+        return [days[day] for day in self.devices[device_key].days]
+
+    def merged(self, device_keys: Collection[str] | None = None) -> dict[str, DailyRollup]:
+        devices = self.devices
+        if device_keys is not None:
+            devices = {k: devices[k] for k in device_keys if k in devices}
+        return {
+            device_key: window.sketches(self.rollups.sketch_factory, lambda k=device_key: self._day_rollups(k))
+            for device_key, window in devices.items()
+            if window.days
+        }
+
+    def summarize(self, device_keys: Collection[str] | None = None) -> dict[str, SignalSummary]:
+        with stage("grouping"):
+            merged = self.merged(device_keys)
+        with stage("percentiles"):
+            return {device_key: rollup.to_signals() for device_key, rollup in merged.items()}
+
+    def days_over(self, metric: str, threshold: float) -> dict[str, int]:
+        return {
+            device_key: sum(1 for r in self._day_rollups(device_key) if getattr(r, metric).quantile(P95) >= threshold)
+            for device_key in self.devices
+        }
+
+
+class WindowEngine:
+    def __init__(self, rollups: DailyRollupStore) -> None:
+        self.rollups = rollups
+        self._windows: dict[tuple[str, int], RollingWindow] = {}
+        rollups.subscribe(self._on_rollup)
+
+    def _on_rollup(self, tenant_id: str, touched: set[tuple[str, date]]) -> None:
+        # A snapshot: other tenants' threads may add windows meanwhile.
+        for (window_tenant, _), window in list(self._windows.items()):
+            if window_tenant == tenant_id:
+                window.observe(touched)
+
+    def window(self, tenant_id: str, length: int, as_of: date | None = None) -> RollingWindow | None:
+        as_of = as_of or self.rollups.latest_day(tenant_id)
+        if as_of is None:
+            return None
+        window = self._windows.get((tenant_id, length))
+        if window is None or as_of < window.end:
+            window = self._windows[(tenant_id, length)] = RollingWindow(self.rollups, tenant_id, length)
+        window.advance(as_of)
+        return window
+
+    def summarize(
+        self,
+        tenant_id: str,
+        length: int,
+        as_of: date | None = None,
+        device_keys: Collection[str] | None = None,
+    ) -> dict[str, SignalSummary]:
+        window = self.window(tenant_id, length, as_of)
+        return window.summarize(device_keys) if window else {}
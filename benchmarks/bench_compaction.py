@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from dataclasses import replace
+from datetime import timedelta
+from typing import Any
+
+from app.retention import DEVICES_PER_STEP, CompactionReport, Compactor, RetentionPolicy
+from app.storage import SIGNAL_BACKENDS, InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_batches
+
+
+def _latencies_ms(store: InMemoryStore, batches: list) -> list[float]:
+    latencies = []
+    for batch in batches:
+        started = time.perf_counter()
+        store.ingest_telemetry(batch)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def _percentiles(latencies: list[float]) -> dict[str, float]:
+    ordered = sorted(latencies)
+    return {"p50_ms": statistics.median(ordered), "p99_ms": ordered[int(0.99 * (len(ordered) - 1))]}
+
+
+def _memory(store: InMemoryStore) -> dict[str, int]:
+    usage = store.memory_usage()
+    return {
+        "records": usage["records"],
+        "telemetry_bytes": usage["total_bytes"],
+        "rollup_sketch_bytes": usage["rollup_sketch_bytes"],
+        "daily_rollups": store.rollups.summary_count(store.rollups.tenants()[0]),
+    }
+
+
+def run(config: FleetConfig, policy: RetentionPolicy, backend: str, devices_per_step: int) -> dict[str, Any]:
+    store = InMemoryStore(aggregation_backend=backend)
+    for batch in generate_batches(config, 2000):
+        store.ingest_telemetry(batch)
+    started = time.perf_counter()
+    store.generate_recommendations(config.tenant_id)
+    results: dict[str, Any] = {
+        "devices": config.devices,
+        "days": config.days,
+        "backend": backend,
+        "raw_days": policy.raw_days,
+        "summary_days": policy.summary_days,
+        "before": {**_memory(store), "recommendation_run_s": time.perf_counter() - started},
+    }
+
+    # The next day's telemetry, half ingested alone and half while a compaction pass runs.
+    late = replace(config, days=1, start=config.start + timedelta(days=config.days), source="late")
+    batches = list(generate_batches(late, 200))
+    alone = _latencies_ms(store, batches[: len(batches) // 2])
+    compactor = Compactor(store, policy, devices_per_step)
+    reports: list[CompactionReport] = []
+    worker = threading.Thread(target=lambda: reports.append(compactor.run_once()))
+    worker.start()
+    during = _latencies_ms(store, batches[len(batches) // 2 :])
+    worker.join()
+
+    started = time.perf_counter()
+    store.generate_recommendations(config.tenant_id)
+    results["after"] = {**_memory(store), "recommendation_run_s": time.perf_counter() - started}
+    results["compaction"] = reports[0].as_dict()
+    results["ingest_latency"] = {"alone": _percentiles(alone), "during_compaction": _percentiles(during)}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Retention compaction: reclaimed memory, throughput, ingest impact.")
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--samples-per-day", type=int, default=96)
+    parser.add_argument("--raw-days", type=int, default=7)
+    parser.add_argument("--summary-days", type=int, default=730)
+    parser.add_argument("--backend", choices=SIGNAL_BACKENDS, default="rollup")
+    parser.add_argument("--devices-per-step", type=int, default=DEVICES_PER_STEP)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    policy = RetentionPolicy(args.raw_days, args.summary_days)
+    print(json.dumps(run(config, policy, args.backend, args.devices_per_step), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import Counter
+from dataclasses import replace
+from datetime import timedelta
+from collections.abc import Callable
+from itertools import chain, zip_longest
+from typing import Any
+
+from app.runner import shard_of
+from app.schemas import TelemetryBatchIn
+from app.servicenow_export import ImportSetTarget, ServiceNowExporter
+from app.servicenow_mock import MockImportSet
+from app.storage import TENANT_SHARDS, InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_batches
+
+# Every REPLAY_EVERY-th batch is sent twice, as a client retrying a timed-out request would.
+REPLAY_EVERY = 4
+
+Background = Callable[[InMemoryStore, list[str], threading.Event, Counter[str]], None]
+
+
+def _tenant_batches(config: FleetConfig, tenants: int, batch_size: int) -> list[TelemetryBatchIn]:
+    """Each tenant's batches, interleaved so concurrent clients spread over tenants."""
+    per_tenant = [
+        list(generate_batches(replace(config, tenant_id=f"tenant-{i}", seed=config.seed + i), batch_size))
+        for i in range(tenants)
+    ]
+    return [batch for batch in chain.from_iterable(zip_longest(*per_tenant)) if batch is not None]
+
+
+def _percentiles(latencies: list[float]) -> dict[str, float]:
+    ordered = sorted(latencies)
+    return {"p50_ms": statistics.median(ordered), "p99_ms": ordered[int(0.99 * (len(ordered) - 1))]}
+
+
+def _samples(store: InMemoryStore) -> Counter[str]:
+    return Counter(
+        {
+            tenant_id: sum(r.samples for days in store.rollups.devices(tenant_id).values() for r in days.values())
+            for tenant_id in store.rollups.tenants()
+        }
+    )
+
+
+def _runs(store: InMemoryStore, tenants: list[str], stop: threading.Event, counts: Counter[str]) -> None:
+    """A recommendation run per tenant in turn, approving a few of each run's recommendations meanwhile."""
+    while not stop.is_set():
+        for tenant_id in tenants:
+            recs = store.generate_recommendations(tenant_id)
+            counts["runs"] += 1
+            for rec in recs[:5]:
+                store.set_recommendation_status(rec.recommendation_id, "APPROVED")
+                counts["approvals"] += 1
+            counts["rounds"] += 1
+            if stop.is_set():
+                return
+
+
+def _exports(store: InMemoryStore, tenants: list[str], stop: threading.Event, counts: Counter[str]) -> None:
+    """A ServiceNow export per tenant in turn, against a local mock Import Set: the first is a full sync, the
+    rest send the daily summaries ingestion touched since."""
+    with MockImportSet(keep_rows=False) as mock:
+        sync = ServiceNowExporter(store, ImportSetTarget(mock.base_url))
+        try:
+            while not stop.is_set():
+                for tenant_id in tenants:
+                    counts["exported_rows"] += sync.export(tenant_id).rows
+                    counts["exports"] += 1
+                    counts["rounds"] += 1
+                    if stop.is_set():
+                        return
+        finally:
+            sync.close()
+
+
+def _loaded(history: list[TelemetryBatchIn], shards: int = TENANT_SHARDS) -> InMemoryStore:
+    store = InMemoryStore(shards=shards)
+    for batch in history:
+        store.ingest_telemetry(batch)
+    return store
+
+
+def _measure(
+    store: InMemoryStore, load: list[TelemetryBatchIn], clients: int, background: Background | None
+) -> dict[str, Any]:
+    """`clients` threads send `load` (with replays) while, optionally, `background` work goes on."""
+    before = _samples(store)
+    sends = [*load, *load[::REPLAY_EVERY]]
+    expected = Counter[str]()
+    for batch in load:
+        expected[batch.tenant_id] += len(batch.records)
+
+    cursor = iter(range(len(sends)))
+    cursor_lock = threading.Lock()
+    results: list[list[tuple[int, bool, float]]] = [[] for _ in range(clients)]
+
+    def client(n: int) -> None:
+        while True:
+            with cursor_lock:
+                i = next(cursor, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            accepted, deduped = store.ingest_telemetry(sends[i])
+            results[n].append((accepted, deduped, (time.perf_counter() - started) * 1000))
+
+    stop = threading.Event()
+    counts = Counter[str]()
+    worker = threading.Thread(target=background, args=(store, sorted(expected), stop, counts))
+    if background is not None:
+        # One round first, so the measured window always overlaps the background work.
+        worker.start()
+        while not counts["rounds"]:
+            time.sleep(0.001)
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    stop.set()
+    if background is not None:
+        worker.join()
+
+    done = [row for rows in results for row in rows]
+    accepted = sum(row[0] for row in done)
+    gained = _samples(store) - before
+    return {
+        "clients": clients,
+        "batches": len(done),
+        "seconds": seconds,
+        "accepted": accepted,
+        "records_per_s": accepted / seconds,
+        **_percentiles([row[2] for row in done]),
+        "runs": counts["runs"],
+        "runs_per_s": counts["runs"] / seconds,
+        "approvals": counts["approvals"],
+        "exports": counts["exports"],
+        "exported_rows": counts["exported_rows"],
+        # Exactly once: every record counted, every replay deduped, per tenant.
+        "lost_records": sum((expected - gained).values()),
+        "double_counted_records": sum((gained - expected).values()),
+        "replays_deduped": sum(row[1] for row in done) == len(sends) - len(load),
+        "accepted_matches": accepted == sum(expected.values()),
+    }
+
+
+def run_load(
+    history: list[TelemetryBatchIn],
+    load: list[TelemetryBatchIn],
+    clients: int,
+    shards: int,
+    background: Background | None,
+) -> dict[str, Any]:
+    return {"shards": shards, **_measure(_loaded(history, shards), load, clients, background)}
+
+
+def _worker(history: list, load: list, clients: int, background: Background | None, barrier: Any, out: Any) -> None:
+    store = _loaded(history)
+    barrier.wait()
+    out.put(_measure(store, load, clients, background))
+
+
+def run_workers(
+    history: list[TelemetryBatchIn],
+    load: list[TelemetryBatchIn],
+    workers: int,
+    clients: int,
+    background: Background | None,
+) -> dict[str, Any]:
+    """Worker processes that each own the tenants `shard_of` routes to them, as a tenant-hashing proxy in front
+    of several API workers would; every worker has its own store and `clients` threads."""
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(workers + 1)
+    out = context.Queue()
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(
+                [b for b in history if shard_of(b.tenant_id, workers) == k],
+                [b for b in load if shard_of(b.tenant_id, workers) == k],
+                clients,
+                background,
+                barrier,
+                out,
+            ),
+        )
+        for k in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    started = time.perf_counter()
+    parts = [out.get() for _ in processes]
+    seconds = time.perf_counter() - started
+    for process in processes:
+        process.join()
+    accepted = sum(part["accepted"] for part in parts)
+    owners = Counter(shard_of(tenant_id, workers) for tenant_id in {b.tenant_id for b in load})
+    return {
+        "workers": workers,
+        "clients_per_worker": clients,
+        "tenants_per_worker": [owners[k] for k in range(workers)],
+        "records_per_s": accepted / seconds,
+        "lost_records": sum(part["lost_records"] for part in parts),
+        "double_counted_records": sum(part["double_counted_records"] for part in parts),
+        "replays_deduped": all(part["replays_deduped"] for part in parts),
+    }
+
+
+def run(
+    config: FleetConfig, tenants: int, clients: list[int], workers: list[int], batch_size: int, shards: int
+) -> dict[str, Any]:
+    history = _tenant_batches(config, tenants, batch_size)
+    late = replace(config, days=1, start=config.start + timedelta(days=config.days), source="late")
+    load = _tenant_batches(late, tenants, batch_size)
+    results: dict[str, Any] = {
+        "tenants": tenants,
+        "devices_per_tenant": config.devices,
+        "history_records": sum(len(b.records) for b in history),
+        "load_records": sum(len(b.records) for b in load),
+        "load_batches": len(load),
+        "replayed_batches": len(load[::REPLAY_EVERY]),
+    }
+    scenarios: list[tuple[str, Background | None]] = [
+        ("ingest", None),
+        ("ingest_during_runs", _runs),
+        ("ingest_during_exports", _exports),
+    ]
+    for name, background in scenarios:
+        results[name] = [
+            run_load(history, load, n, lock_shards, background) for n in clients for lock_shards in (shards, 1)
+        ]
+    if "fork" in multiprocessing.get_all_start_methods():
+        results["workers"] = [run_workers(history, load, n, max(clients), None) for n in workers]
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Concurrent-client load test: ingest throughput and exactly-once counts, alone and during "
+        "runs or ServiceNow exports."
+    )
+    parser.add_argument("--tenants", type=int, default=8)
+    parser.add_argument("--devices", type=int, default=100, help="per tenant")
+    parser.add_argument("--days", type=int, default=2, help="history loaded before the measured day")
+    parser.add_argument("--samples-per-day", type=int, default=48)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--clients", default="1,2,4,8", help="client threads per store")
+    parser.add_argument("--workers", default="1,2,4", help="worker processes, each owning a share of the tenants")
+    parser.add_argument("--shards", type=int, default=TENANT_SHARDS)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    clients = [int(n) for n in args.clients.split(",")]
+    workers = [int(n) for n in args.workers.split(",")]
+    print(json.dumps(run(config, args.tenants, clients, workers, args.batch_size, args.shards), indent=2))
+
+
+if __name__ == "__main__":
+    main()
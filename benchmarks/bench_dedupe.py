@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Any
+
+import numpy as np
+
+from app.dedupe import ExpiringKeyIndex, record_key
+from benchmarks.fleet import FleetConfig, generate_batches
+
+START = date(2026, 1, 1)
+
+
+def set_bytes_per_key(sample: int) -> float:
+    """Footprint of the previous `set[tuple[str, str, str]]` of batch keys."""
+    tracemalloc.start()
+    keys = {("bench-tenant", "synthetic", f"batch-{i:012d}") for i in range(sample)}
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keys
+    return size / sample
+
+
+def lookup_latency(index: ExpiringKeyIndex, keys: np.ndarray, days: int, batch: int) -> dict[str, float]:
+    started = time.perf_counter()
+    for key in keys[:1000].tolist():
+        index.contains_key(key)
+    single = (time.perf_counter() - started) / 1000
+    new = 0
+    started = time.perf_counter()
+    for i in range(0, len(keys), batch):
+        new += int(index.add(START + timedelta(days=i // batch % days), keys[i : i + batch]).sum())
+    batched = (time.perf_counter() - started) / len(keys)
+    return {"new": new, "check_and_add_per_key_us": batched * 1e6, "contains_key_all_buckets_us": single * 1e6}
+
+
+def run(keys: int, days: int, batch: int, bloom: bool, seed: int) -> dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    index = ExpiringKeyIndex(horizon_days=days, bloom=bloom)
+    started = time.perf_counter()
+    inserted = 0
+    while inserted < keys:
+        count = min(batch, keys - inserted)
+        index.add(START + timedelta(days=inserted // batch % days), np.frombuffer(rng.bytes(16 * count), dtype="S16"))
+        inserted += count
+    insert_s = time.perf_counter() - started
+    nbytes = index.nbytes()
+
+    # Replays hit their own day's bucket; fresh keys are misses.
+    replay = np.random.default_rng(seed).bytes(16 * batch * days)
+    hits = lookup_latency(index, np.frombuffer(replay, dtype="S16"), days, batch)
+    misses = lookup_latency(index, np.frombuffer(rng.bytes(16 * batch * days), dtype="S16"), days, batch)
+    return {
+        "bloom": bloom,
+        "keys": len(index),
+        "insert_keys_per_s": keys / insert_s,
+        "bytes": nbytes,
+        "bytes_per_key": nbytes / keys,
+        "hits": hits,
+        "misses": misses,
+    }
+
+
+def record_hash_rate(records: int) -> float:
+    config = FleetConfig(devices=max(1, records // 12), samples_per_day=12)
+    batch = next(generate_batches(config, batch_size=records))
+    started = time.perf_counter()
+    for r in batch.records:
+        record_key(batch.tenant_id, r)
+    return len(batch.records) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Dedupe index memory and lookup latency at scale.")
+    parser.add_argument("--keys", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--set-sample", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    set_per_key = set_bytes_per_key(args.set_sample)
+    report = {
+        "keys": args.keys,
+        "days": args.days,
+        "python_set_bytes_per_key": set_per_key,
+        "python_set_bytes_estimate": set_per_key * args.keys,
+        "record_hashes_per_s": record_hash_rate(20_000),
+        "index": [run(args.keys, args.days, args.batch, bloom, args.seed) for bloom in (True, False)],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
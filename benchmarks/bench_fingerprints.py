@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any
+
+import numpy as np
+
+from app.capabilities import DeviceCapabilities
+from app.fingerprints import VectorIndex, fingerprints
+from app.reallocation import swap_pairs
+from app.recommend import score_rows
+from app.scoring import SignalArrays
+from benchmarks.bench_recommendations import random_signals
+
+
+def random_capabilities(devices: int, seed: int = 7) -> DeviceCapabilities:
+    rng = np.random.default_rng(seed)
+    return DeviceCapabilities(
+        vram_gb=rng.choice([0.0, 4.0, 8.0, 12.0, 24.0], devices),
+        ram_gb=rng.choice([8.0, 16.0, 32.0, 64.0], devices),
+        cores=rng.choice([4.0, 6.0, 8.0, 16.0], devices),
+    )
+
+
+def _timed(fn: Any) -> tuple[float, Any]:
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def run(devices: int, queries: int, k: int, probes: int) -> dict[str, Any]:
+    summaries = list(random_signals(devices).values())
+    signals = SignalArrays.from_summaries(summaries)
+    fingerprint_s, vectors = _timed(lambda: fingerprints(signals))
+    exact_build_s, exact = _timed(lambda: VectorIndex(vectors, lists=0))
+    ivf_build_s, ivf = _timed(lambda: VectorIndex(vectors, probes=probes))
+
+    sample = vectors[np.random.default_rng(0).choice(devices, queries, replace=False)]
+    results: dict[str, Any] = {
+        "devices": devices,
+        "fingerprint_s": fingerprint_s,
+        "exact": {"build_s": exact_build_s},
+        "ivf": {"build_s": ivf_build_s, "lists": ivf.lists, "probes": probes},
+    }
+    truth = exact.search(sample, k)[0]
+    for name, index in (("exact", exact), ("ivf", ivf)):
+        single = [_timed(lambda: index.search(q, k))[0] for q in sample[:200]]
+        batch_s, (ids, _) = _timed(lambda: index.search(sample, k))
+        results[name].update(
+            single_query_p50_ms=1000 * statistics.median(single),
+            batch_query_us=1e6 * batch_s / queries,
+            recall_at_k=float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ids, truth)])),
+        )
+
+    capabilities = random_capabilities(devices)
+    classifications = [row[1] for row in score_rows(summaries, capabilities=capabilities)]
+    pairing_s, pairs = _timed(lambda: swap_pairs(summaries, classifications, capabilities))
+    results["swap_pairs"] = {"s": pairing_s, "pairs": len(pairs)}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fingerprint index build time, query latency and swap pairing.")
+    parser.add_argument("--devices", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--probes", type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(run(args.devices, args.queries, args.k, args.probes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
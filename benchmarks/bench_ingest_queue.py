@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any
+
+from app.ingest_queue import IngestionQueue, QueueFullError
+from app.storage import InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_batches
+
+
+async def run(config: FleetConfig, batch_size: int, rate: float, capacity: int, workers: int) -> dict[str, Any]:
+    batches = list(generate_batches(config, batch_size))
+    queue = IngestionQueue(InMemoryStore(), capacity=capacity, workers=workers)
+    await queue.start()
+    samples: list[float] = []
+    interval = 1.0 / rate if rate > 0 else 0.0
+    started = time.perf_counter()
+    for i, batch in enumerate(batches):
+        target = started + i * interval
+        if (delay := target - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+        try:
+            await queue.submit(batch)
+        except QueueFullError:
+            pass
+        samples.append(queue.stats()["current_lag_s"])
+    await queue.join()
+    elapsed = time.perf_counter() - started
+    await queue.stop()
+    stats = queue.stats()
+    samples.sort()
+    return {
+        "batches": len(batches),
+        "batch_size": batch_size,
+        "offered_batches_per_s": rate,
+        "workers": workers,
+        "capacity": capacity,
+        "elapsed_s": elapsed,
+        "records_per_s": stats["records"] / elapsed,
+        "accepted_batches": stats["processed"],
+        "rejected_batches": stats["rejected"],
+        "failed_batches": stats["failed"],
+        "mean_lag_s": stats["mean_lag_s"],
+        "max_lag_s": stats["max_lag_s"],
+        "p95_sampled_queue_lag_s": samples[int(0.95 * (len(samples) - 1))] if samples else 0.0,
+        "meets_5_min_lag_target": stats["max_lag_s"] < 300,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offer telemetry batches to the ingestion queue and report lag.")
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--samples-per-day", type=int, default=48)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=50.0, help="offered batches per second (0 = as fast as possible)")
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, samples_per_day=args.samples_per_day)
+    result = asyncio.run(run(config, args.batch_size, args.rate, args.capacity, args.workers))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import time
+from collections.abc import Callable
+from typing import Any
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import REGISTRY, MetricsRegistry
+from app.profiler import SamplingProfiler
+from app.storage import InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_batches
+
+
+def _pipeline(config: FleetConfig, batches: list) -> Callable[[], None]:
+    def run() -> None:
+        store = InMemoryStore()
+        for batch in batches:
+            store.ingest_telemetry(batch)
+        store.generate_recommendations(config.tenant_id)
+
+    return run
+
+
+def _requests(client: TestClient, count: int) -> Callable[[], None]:
+    def run() -> None:
+        for _ in range(count):
+            client.get("/healthz")
+
+    return run
+
+
+def compare(work: Callable[[], None], setups: dict[str, Callable[[], Callable[[], None]]], repeat: int) -> dict:
+    """Best-of-`repeat` per setup, interleaved in alternating order so drift and leftover garbage hit every
+    setup alike; a setup returns its teardown."""
+    best = {name: float("inf") for name in setups}
+    for i in range(repeat):
+        for name, setup in list(setups.items())[:: 1 if i % 2 == 0 else -1]:
+            gc.collect()
+            teardown = setup()
+            started = time.perf_counter()
+            work()
+            best[name] = min(best[name], time.perf_counter() - started)
+            teardown()
+    return best
+
+
+def _metrics(enabled: bool) -> Callable[[], Callable[[], None]]:
+    def setup() -> Callable[[], None]:
+        REGISTRY.enabled = enabled
+        return lambda: setattr(REGISTRY, "enabled", True)
+
+    return setup
+
+
+def _profiling(interval_s: float) -> Callable[[], Callable[[], None]]:
+    def setup() -> Callable[[], None]:
+        profiler = SamplingProfiler()
+        profiler.start(interval_s)
+        return profiler.stop
+
+    return setup
+
+
+def update_costs(calls: int = 100_000) -> dict[str, float]:
+    """Per-call cost of the hot-path primitives, which the end-to-end comparisons are too noisy to resolve."""
+    histogram = MetricsRegistry().histogram("bench_seconds", "Benchmark.", ("stage",))
+    started = time.perf_counter()
+    for _ in range(calls):
+        histogram.observe(0.001, "bench")
+    observed = time.perf_counter()
+    for _ in range(calls):
+        with histogram.time("bench"):
+            pass
+    timed = time.perf_counter()
+    return {"observe_ns": 1e9 * (observed - started) / calls, "timed_block_ns": 1e9 * (timed - observed) / calls}
+
+
+def _overhead(timings: dict[str, float], baseline: str) -> dict[str, Any]:
+    base = timings[baseline]
+    return {
+        **{f"{name}_s": value for name, value in timings.items()},
+        **{f"{name}_overhead_pct": 100 * (value / base - 1) for name, value in timings.items() if name != baseline},
+    }
+
+
+def run(config: FleetConfig, batch_size: int, requests: int, repeat: int, budget_pct: float) -> dict[str, Any]:
+    batches = list(generate_batches(config, batch_size))
+    pipeline = _pipeline(config, batches)
+    results: dict[str, Any] = {"devices": config.devices, "records": config.total_records, "requests": requests}
+    results["update_costs"] = update_costs()
+    results["pipeline"] = _overhead(
+        compare(pipeline, {"disabled": _metrics(False), "enabled": _metrics(True)}, repeat), "disabled"
+    )
+    with TestClient(app) as client:
+        results["http"] = _overhead(
+            compare(_requests(client, requests), {"disabled": _metrics(False), "enabled": _metrics(True)}, repeat),
+            "disabled",
+        )
+    results["profiler"] = _overhead(
+        compare(pipeline, {"off": _metrics(True), "sampling_5ms": _profiling(0.005)}, repeat), "off"
+    )
+    # The profiler is opt-in, so only always-on instrumentation counts against the budget.
+    worst = max(results["pipeline"]["enabled_overhead_pct"], results["http"]["enabled_overhead_pct"])
+    results["budget_pct"] = budget_pct
+    results["within_budget"] = worst <= budget_pct
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cost of metrics instrumentation and the sampling profiler.")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--samples-per-day", type=int, default=24)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-pct", type=float, default=3.0)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    print(json.dumps(run(config, args.batch_size, args.requests, args.repeat, args.budget_pct), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Any
+
+from fastapi.testclient import TestClient
+
+from app.main import app, store
+from app.recommend import build_recommendations
+from app.scoring import SignalSummary
+
+
+def random_signals(devices: int, seed: int = 7) -> dict[str, SignalSummary]:
+    rng = random.Random(seed)
+    return {
+        f"DEV-{i:07d}": SignalSummary(
+            gpu_util_p95=rng.uniform(0, 100),
+            vram_used_p95_pct=rng.uniform(0, 100),
+            cpu_util_p95=rng.uniform(0, 100),
+            ram_used_p95=rng.uniform(0, 100),
+            paging_pressure_minutes=rng.randint(0, 300),
+            disk_latency_p95_ms=rng.uniform(0, 60),
+            disk_busy_minutes=rng.uniform(0, 600),
+            disk_queue_p95=rng.uniform(0, 4),
+            thermal_throttle_events=rng.randint(0, 6),
+            active_minutes=rng.randint(0, 1440),
+            light_app_mix_factor=rng.choice((0.7, 1.0)),
+        )
+        for i in range(devices)
+    }
+
+
+def _list_page(client: TestClient, tenant_id: str, limit: int) -> float:
+    """Server time for one page, as the client sees it; the body is not parsed."""
+    started = time.perf_counter()
+    client.get("/api/v1/recommendations", params={"tenant_id": tenant_id, "limit": limit}).content
+    return time.perf_counter() - started
+
+
+def _stream(client: TestClient, tenant_id: str, fmt: str) -> tuple[float, int]:
+    started = time.perf_counter()
+    with client.stream("GET", "/api/v1/recommendations/export", params={"tenant_id": tenant_id, "format": fmt}) as r:
+        size = sum(len(chunk) for chunk in r.iter_bytes())
+    return time.perf_counter() - started, size
+
+
+def run(devices: int, page_limit: int, repeat: int) -> dict[str, Any]:
+    tenant_id = f"bench-recs-{devices}"
+    summaries = random_signals(devices)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    store.upsert_recommendations(tenant_id, None, build_recommendations(tenant_id, summaries))
+    build_s = time.perf_counter() - started
+    retained = tracemalloc.get_traced_memory()[0] - before
+    # The same signals again: every device upserts onto its stored recommendation and nothing moves.
+    started = time.perf_counter()
+    rerun, _ = store.upsert_recommendations(tenant_id, None, build_recommendations(tenant_id, summaries))
+    rerun_s = time.perf_counter() - started
+    growth = tracemalloc.get_traced_memory()[0] - before - retained
+    tracemalloc.stop()
+
+    results: dict[str, Any] = {
+        "devices": devices,
+        "build_and_save_s": build_s,
+        "retained_bytes_per_recommendation": retained / devices,
+        "rerun": {"s": rerun_s, "changed": rerun.created + rerun.updated, "growth_bytes": growth},
+    }
+    with TestClient(app) as client:
+        best = min(_list_page(client, tenant_id, page_limit) for _ in range(repeat))
+        results["list_page"] = {"limit": page_limit, "ms": 1000 * best, "us_per_item": 1e6 * best / page_limit}
+        if any(getattr(r, "path", "") == "/api/v1/recommendations/export" for r in app.routes):
+            for fmt in ("ndjson", "json"):
+                best, size = min(_stream(client, tenant_id, fmt) for _ in range(repeat))
+                results[f"export_{fmt}"] = {"total_s": best, "bytes": size, "us_per_item": 1e6 * best / devices}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recommendation memory and list/export endpoint latency.")
+    parser.add_argument("--devices", type=int, default=100_000)
+    parser.add_argument("--page-limit", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.devices, args.page_limit, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from app.recommend import build_recommendations
+from app.replay import load_series, replay_recommendations
+from app.schemas import TelemetryBatchIn
+from app.segments import SegmentArchive
+from app.storage import InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_payloads
+
+
+def run(config: FleetConfig, batch_size: int, repeat: int) -> dict[str, Any]:
+    bodies = [json.dumps(payload) for payload in generate_payloads(config, batch_size)]
+    records = config.total_records
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = SegmentArchive(tmp)
+        batches = [TelemetryBatchIn.model_validate_json(body) for body in bodies]
+        started = time.perf_counter()
+        for batch in batches:
+            archive.append_batch(batch)
+        archive_s = time.perf_counter() - started
+        segment_bytes = sum(p.stat().st_size for p in Path(tmp).rglob("*") if p.is_file())
+
+        load_s = replay_s = float("inf")
+        for _ in range(repeat):
+            reader = SegmentArchive(tmp)
+            started = time.perf_counter()
+            load_series(reader, config.tenant_id)
+            load_s = min(load_s, time.perf_counter() - started)
+            started = time.perf_counter()
+            replay_recommendations(reader, config.tenant_id)
+            replay_s = min(replay_s, time.perf_counter() - started)
+
+    json_s = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        store = InMemoryStore(aggregation_backend="numpy")
+        for body in bodies:
+            store.ingest_telemetry(TelemetryBatchIn.model_validate_json(body))
+        build_recommendations(config.tenant_id, store.device_signals(config.tenant_id))
+        json_s = min(json_s, time.perf_counter() - started)
+
+    return {
+        "devices": config.devices,
+        "days": config.days,
+        "records": records,
+        "json_bytes": sum(len(body) for body in bodies),
+        "segment_bytes": segment_bytes,
+        "archive_records_per_s": records / archive_s,
+        "segment_load_records_per_s": records / load_s,
+        "replay_records_per_s": records / replay_s,
+        "json_rescore_records_per_s": records / json_s,
+        "speedup": json_s / replay_s,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-score history from binary segments vs re-parsing JSON.")
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--samples-per-day", type=int, default=24)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    print(json.dumps(run(config, args.batch_size, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Any
+
+from app.runner import RecommendationRunner
+from app.storage import InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_batches
+
+
+def build_store(config: FleetConfig, backend: str) -> InMemoryStore:
+    store = InMemoryStore(aggregation_backend=backend)
+    for batch in generate_batches(config, batch_size=20_000):
+        store.ingest_telemetry(batch)
+    return store
+
+
+def run(config: FleetConfig, backend: str, worker_counts: list[int], repeat: int) -> dict[str, Any]:
+    started = time.perf_counter()
+    store = build_store(config, backend)
+    results: dict[str, Any] = {
+        "devices": config.devices,
+        "days": config.days,
+        "records": config.total_records,
+        "backend": backend,
+        "build_s": time.perf_counter() - started,
+        "runs": [],
+    }
+    baseline = None
+    for workers in worker_counts:
+        runner = RecommendationRunner(store, workers=workers)
+        runs = []
+        try:
+            for _ in range(repeat):
+                cpu_started = time.process_time()
+                run_result = runner.run(config.tenant_id)[0]
+                runs.append((run_result, time.process_time() - cpu_started))
+        finally:
+            runner.close()
+        best, parent_cpu_s = min(runs, key=lambda r: r[0].elapsed_s)
+        baseline = baseline or best.devices_per_s
+        results["runs"].append(
+            {
+                "workers": workers,
+                "shards": best.shards,
+                "elapsed_s": best.elapsed_s,
+                "merge_s": best.merge_s,
+                "devices_per_s": best.devices_per_s,
+                "speedup": best.devices_per_s / baseline,
+                # CPU this process spent on the run: copying shards out and merging results. It stays serial
+                # however many workers there are, so with a core per worker elapsed_s tends to the larger of it
+                # and the workers' share.
+                "parent_cpu_s": parent_cpu_s,
+                "snapshot_s": sum(t.snapshot_s for t in best.shard_timings),
+                "slowest_shard_s": max(t.signals_s + t.scoring_s for t in best.shard_timings),
+            }
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recommendation run throughput at increasing worker counts.")
+    parser.add_argument("--devices", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--samples-per-day", type=int, default=12)
+    parser.add_argument("--backend", default="rollup")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="*", default=None)
+    args = parser.parse_args()
+    cpus = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, 2, 4, cpus})
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    print(json.dumps(run(config, args.backend, worker_counts, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import replace
+from datetime import timedelta
+from typing import Any
+
+from app.servicenow_export import ExportReport, ImportSetTarget, ServiceNowExporter
+from app.servicenow_mock import MockImportSet
+from app.storage import InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_batches
+
+
+def _summary(report: ExportReport, mock: MockImportSet) -> dict[str, Any]:
+    raw = sum(t.raw_bytes for t in report.tables)
+    wire = sum(t.wire_bytes for t in report.tables)
+    return {
+        "full_sync": report.full_sync,
+        "rows": report.rows,
+        "batches": sum(t.batches for t in report.tables),
+        "seconds": report.seconds,
+        "rows_per_s": report.rows / report.seconds if report.seconds else 0.0,
+        "raw_bytes": raw,
+        "wire_bytes": wire,
+        "compression_ratio": raw / wire if wire else 0.0,
+        "requests": mock.requests,
+        "retries": sum(t.retries for t in report.tables),
+    }
+
+
+def run(config: FleetConfig, concurrency: int, gzip_level: int, batch_rows: int) -> dict[str, Any]:
+    store = InMemoryStore()
+    for batch in generate_batches(config):
+        store.ingest_telemetry(batch)
+    store.generate_recommendations(config.tenant_id)
+    results: dict[str, Any] = {"devices": config.devices, "days": config.days, "concurrency": concurrency}
+    with MockImportSet(keep_rows=False) as mock:
+        target = ImportSetTarget(
+            mock.base_url, concurrency=concurrency, gzip_level=gzip_level, max_batch_rows=batch_rows
+        )
+        exporter = ServiceNowExporter(store, target)
+        results["full"] = _summary(exporter.export(config.tenant_id), mock)
+
+        store.generate_recommendations(config.tenant_id)
+        requests = mock.requests
+        results["unchanged_rerun"] = _summary(exporter.export(config.tenant_id), mock)
+        results["unchanged_rerun"]["requests"] = mock.requests - requests
+
+        # One more day of telemetry for a tenth of the fleet, then a run and a delta export.
+        late = config.start + timedelta(config.days)
+        extra = replace(config, devices=max(1, config.devices // 10), days=1, start=late, source="late")
+        for batch in generate_batches(extra):
+            store.ingest_telemetry(batch)
+        store.generate_recommendations(config.tenant_id)
+        requests = mock.requests
+        results["delta"] = _summary(exporter.export(config.tenant_id), mock)
+        results["delta"]["requests"] = mock.requests - requests
+        exporter.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ServiceNow Import Set export throughput against the local mock.")
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--samples-per-day", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--batch-rows", type=int, default=1000)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    print(json.dumps(run(config, args.concurrency, args.gzip_level, args.batch_rows), indent=2))
+
+
+if __name__ == "__main__":
+    main()
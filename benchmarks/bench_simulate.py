@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from dataclasses import replace
+from typing import Any
+
+from app.schemas import PolicyCreateIn, PolicyPatchIn
+from app.storage import InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_batches
+
+
+def run(config: FleetConfig, window_days: int | None, touched: int) -> dict[str, Any]:
+    store = InMemoryStore()
+    for batch in generate_batches(config, batch_size=20_000):
+        store.ingest_telemetry(batch)
+    policy = store.create_policy(PolicyCreateIn(tenant_id=config.tenant_id, name="bench"))
+
+    def simulate(step: str) -> dict[str, Any]:
+        started = time.perf_counter()
+        recs, report = store.simulate_policy(config.tenant_id, store.policies[policy.policy_id], window_days)
+        return {
+            "step": step,
+            "devices": len(recs),
+            "hits": report.hits,
+            "misses": report.misses,
+            "hit_rate": report.hit_rate,
+            "scoring_s": report.compute_s,
+            "time_saved_s": report.time_saved_s,
+            "elapsed_s": time.perf_counter() - started,
+        }
+
+    steps = [simulate("cold"), simulate("unchanged")]
+    # Same first day, different source: touches the first `touched` devices without moving the window.
+    for batch in generate_batches(replace(config, devices=touched, days=1, samples_per_day=1, source="touch")):
+        store.ingest_telemetry(batch)
+    steps.append(simulate(f"{touched}_devices_touched"))
+    store.patch_policy(policy.policy_id, PolicyPatchIn(thresholds={"overprovisioned_score": 70}))
+    steps.append(simulate("policy_patched"))
+    steps.append(simulate("unchanged"))
+    return {
+        "devices": config.devices,
+        "days": config.days,
+        "records": config.total_records,
+        "window_days": window_days,
+        "steps": steps,
+        "totals": store.score_cache.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Policy simulation latency with a cold, warm and invalidated cache.")
+    parser.add_argument("--devices", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--samples-per-day", type=int, default=12)
+    parser.add_argument("--window-days", type=int, default=None)
+    parser.add_argument("--touched", type=int, default=100)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    print(json.dumps(run(config, args.window_days, args.touched), indent=2))
+
+
+if __name__ == "__main__":
+    main()
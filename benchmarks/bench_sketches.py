@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any
+
+from app.rollups import P95, SKETCHED_METRICS, DailyRollupStore
+from app.sketches import SketchFactory
+from benchmarks.fleet import FleetConfig, generate_batches
+
+
+def run(config: FleetConfig, accuracy: float, relative_accuracy: float) -> dict[str, Any]:
+    stores = {
+        "exact": DailyRollupStore(SketchFactory("exact")),
+        "sketch": DailyRollupStore(SketchFactory("sketch", accuracy, relative_accuracy)),
+    }
+    timings: dict[str, dict[str, float]] = {mode: {"ingest_s": 0.0} for mode in stores}
+    for batch in generate_batches(config):
+        for mode, rollups in stores.items():
+            started = time.perf_counter()
+            rollups.add_batch(batch)
+            timings[mode]["ingest_s"] += time.perf_counter() - started
+
+    merged = {}
+    for mode, rollups in stores.items():
+        started = time.perf_counter()
+        merged[mode] = rollups.merged(config.tenant_id)
+        timings[mode]["merge_s"] = time.perf_counter() - started
+        timings[mode]["sketch_bytes"] = rollups.sketch_bytes()
+
+    errors: dict[str, dict[str, float]] = {}
+    for metric in SKETCHED_METRICS:
+        abs_errors = []
+        rel_errors = []
+        for device_key, exact in merged["exact"].items():
+            truth = getattr(exact, metric).quantile(P95)
+            estimate = getattr(merged["sketch"][device_key], metric).quantile(P95)
+            abs_errors.append(abs(estimate - truth))
+            if truth:
+                rel_errors.append(abs(estimate - truth) / truth)
+        errors[metric] = {
+            "max_abs_error": max(abs_errors),
+            "mean_abs_error": sum(abs_errors) / len(abs_errors),
+            "max_rel_error": max(rel_errors, default=0.0),
+        }
+
+    return {
+        "devices": config.devices,
+        "days": config.days,
+        "records": config.total_records,
+        "accuracy": accuracy,
+        "relative_accuracy": relative_accuracy,
+        "modes": timings,
+        "memory_ratio": timings["sketch"]["sketch_bytes"] / timings["exact"]["sketch_bytes"],
+        "p95_errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare exact and sketched p95 rollups on a synthetic fleet.")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--accuracy", type=float, default=0.5)
+    parser.add_argument("--relative-accuracy", type=float, default=0.01)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days)
+    print(json.dumps(run(config, args.accuracy, args.relative_accuracy), indent=2))
+
+
+if __name__ == "__main__":
+    main()
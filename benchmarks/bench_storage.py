@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from app.sqlite_store import SqliteStore
+from app.storage import InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_batches
+
+
+def measure(config: FleetConfig, batches: list, make_store) -> dict[str, Any]:
+    store = make_store()
+    started = time.perf_counter()
+    for batch in batches:
+        store.ingest_telemetry(batch)
+    ingest_s = time.perf_counter() - started
+    started = time.perf_counter()
+    recs = store.generate_recommendations(config.tenant_id)
+    run_s = time.perf_counter() - started
+    store.close()
+    return {
+        "ingest_s": ingest_s,
+        "ingest_records_per_s": config.total_records / ingest_s,
+        "recommendation_run_s": run_s,
+        "recommendations": len(recs),
+    }
+
+
+def run(config: FleetConfig, batch_size: int) -> dict[str, Any]:
+    batches = list(generate_batches(config, batch_size))
+    results: dict[str, Any] = {"devices": config.devices, "days": config.days, "records": config.total_records}
+    results["memory"] = measure(config, batches, InMemoryStore)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        results["sqlite"] = measure(config, batches, lambda: SqliteStore(path))
+        started = time.perf_counter()
+        SqliteStore(path).close()
+        results["sqlite"]["cold_start_s"] = time.perf_counter() - started
+        results["sqlite"]["db_bytes"] = sum(p.stat().st_size for p in Path(tmp).iterdir())
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest and recommendation run time: in-memory vs SQLite store.")
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--samples-per-day", type=int, default=24)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    print(json.dumps(run(config, args.batch_size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
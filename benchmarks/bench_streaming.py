@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from benchmarks.fleet import FleetConfig, generate_records
+
+ENDPOINTS = {
+    "batch": "/api/v1/ingestion/telemetry-batch",
+    "stream": "/api/v1/ingestion/telemetry-stream",
+}
+
+
+def write_bodies(config: FleetConfig, directory: Path) -> dict[str, Path]:
+    header = {
+        "schema_version": "1.0",
+        "tenant_id": config.tenant_id,
+        "source": config.source,
+        "batch_id": f"bench-{config.seed}",
+        "sent_at": config.start.isoformat().replace("+00:00", "Z"),
+    }
+    records = list(generate_records(config))
+    paths = {"batch": directory / "batch.json", "stream": directory / "stream.ndjson"}
+    paths["batch"].write_text(json.dumps({**header, "records": records}))
+    with paths["stream"].open("w") as f:
+        f.write(json.dumps(header) + "\n")
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return paths
+
+
+def _proc_status(pid: int, field: str) -> int:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith(field + ":"):
+            return int(line.split()[1]) * 1024
+    return 0
+
+
+def _file_chunks(path: Path, size: int = 1 << 16) -> Iterator[bytes]:
+    with path.open("rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+
+def measure(mode: str, path: Path, port: int, records: int) -> dict[str, Any]:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{base_url}/healthz")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        idle_rss = _proc_status(server.pid, "VmRSS")
+        content = path.read_bytes() if mode == "batch" else _file_chunks(path)
+        headers = {"content-type": "application/json" if mode == "batch" else "application/x-ndjson"}
+        started = time.perf_counter()
+        response = httpx.post(f"{base_url}{ENDPOINTS[mode]}", content=content, headers=headers, timeout=600)
+        elapsed = time.perf_counter() - started
+        response.raise_for_status()
+        peak_rss = _proc_status(server.pid, "VmHWM")
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "seconds": elapsed,
+        "records_per_s": records / elapsed,
+        "body_bytes": path.stat().st_size,
+        "idle_rss_mb": idle_rss / 2**20,
+        "peak_rss_mb": peak_rss / 2**20,
+        "peak_rss_growth_mb": (peak_rss - idle_rss) / 2**20,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Peak server RSS and throughput: JSON batch vs NDJSON stream.")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    devices = 100
+    config = FleetConfig(devices=devices, samples_per_day=max(1, args.records // devices))
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_bodies(config, Path(tmp))
+        results = {mode: measure(mode, paths[mode], args.port, config.total_records) for mode in ENDPOINTS}
+    print(json.dumps({"records": config.total_records, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
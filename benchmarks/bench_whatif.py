@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Any
+
+from app.schemas import PolicyCreateIn
+from app.storage import InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_batches
+
+
+def threshold_variants(count: int, seed: int = 0) -> list[dict[str, float]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "underpowered_fit": rng.uniform(35, 55),
+            "overprovisioned_fit": rng.uniform(65, 85),
+            "overprovisioned_score": rng.uniform(55, 75),
+            "gpu_util_ceiling": rng.uniform(85, 99),
+        }
+        for _ in range(count)
+    ]
+
+
+def run(config: FleetConfig, variants: int) -> dict[str, Any]:
+    store = InMemoryStore()
+    for batch in generate_batches(config, batch_size=20_000):
+        store.ingest_telemetry(batch)
+    policy = store.create_policy(PolicyCreateIn(tenant_id=config.tenant_id, name="bench"))
+    sweep = threshold_variants(variants)
+
+    started = time.perf_counter()
+    device_keys, _, _ = store.what_if(config.tenant_id, policy, sweep)
+    whatif_cold_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    store.what_if(config.tenant_id, policy, sweep)
+    whatif_warm_s = time.perf_counter() - started
+
+    # What one simulate call cost before the cache: aggregate, score, build and store recommendations.
+    started = time.perf_counter()
+    store.generate_recommendations(config.tenant_id)
+    single_run_s = time.perf_counter() - started
+
+    return {
+        "devices": len(device_keys),
+        "days": config.days,
+        "records": config.total_records,
+        "variants": variants,
+        "single_run_s": single_run_s,
+        "sequential_estimate_s": single_run_s * variants,
+        "whatif_cold_s": whatif_cold_s,
+        "whatif_warm_s": whatif_warm_s,
+        "cold_vs_single_run": whatif_cold_s / single_run_s,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch what-if over threshold variants versus one recommendation run.")
+    parser.add_argument("--devices", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--samples-per-day", type=int, default=4)
+    parser.add_argument("--variants", type=int, default=50)
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    print(json.dumps(run(config, args.variants), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import timedelta
+from typing import Any
+
+from app.rollups import DailyRollupStore
+from app.schemas import TelemetryBatchIn
+from app.sketches import SketchFactory
+from app.windows import WindowEngine
+from benchmarks.fleet import FleetConfig, generate_payloads
+
+
+def run(config: FleetConfig, window_days: int, sketch_mode: str, late_every: int, late_lag: int) -> dict[str, Any]:
+    rollups = DailyRollupStore(SketchFactory(sketch_mode))
+    engine = WindowEngine(rollups)
+    held_back: dict[int, list[dict[str, Any]]] = {}
+    incremental_s: list[float] = []
+    recompute_s: list[float] = []
+    ingest_s = 0.0
+
+    per_day = config.devices * config.daily_samples
+    for day, payload in enumerate(generate_payloads(config, batch_size=per_day)):
+        records = payload["records"]
+        if late_every:
+            held_back.setdefault(day + late_lag, []).extend(records[::late_every])
+            del records[::late_every]
+        records.extend(held_back.pop(day, []))
+        started = time.perf_counter()
+        rollups.add_batch(TelemetryBatchIn.model_validate(payload))
+        ingest_s += time.perf_counter() - started
+
+        if day + 1 < window_days:
+            continue
+        as_of = config.start.date() + timedelta(days=day)
+        started = time.perf_counter()
+        engine.summarize(config.tenant_id, window_days, as_of)
+        incremental_s.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        rollups.summarize(config.tenant_id, start=as_of - timedelta(days=window_days - 1), end=as_of)
+        recompute_s.append(time.perf_counter() - started)
+
+    steps = len(incremental_s)
+    return {
+        "devices": config.devices,
+        "history_days": config.days,
+        "window_days": window_days,
+        "sketch_mode": sketch_mode,
+        "late_fraction": 1 / late_every if late_every else 0.0,
+        "records": config.total_records,
+        "ingest_records_per_s": config.total_records / ingest_s,
+        "window_steps": steps,
+        "incremental_mean_ms": 1000 * sum(incremental_s[1:]) / max(1, steps - 1),
+        "initial_build_ms": 1000 * incremental_s[0] if steps else 0.0,
+        "recompute_mean_ms": 1000 * sum(recompute_s) / max(1, steps),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rolling window advance vs full recompute on a synthetic history.")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--samples-per-day", type=int, default=24)
+    parser.add_argument("--window", type=int, default=90)
+    parser.add_argument("--sketch-mode", default="sketch")
+    parser.add_argument("--late-every", type=int, default=20, help="hold back every Nth record (0 disables)")
+    parser.add_argument("--late-lag", type=int, default=3, help="days a held-back record arrives late")
+    args = parser.parse_args()
+    config = FleetConfig(devices=args.devices, days=args.days, samples_per_day=args.samples_per_day)
+    print(json.dumps(run(config, args.window, args.sketch_mode, args.late_every, args.late_lag), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import random
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from app.schemas import TelemetryBatchIn
+
+
+@dataclass(frozen=True)
+class WorkloadProfile:
+    name: str
+    gpu_util: tuple[float, float]
+    vram_used_mb: tuple[float, float]
+    cpu_util: tuple[float, float]
+    ram_used: tuple[float, float]
+    disk_latency_ms: tuple[float, float]
+    disk_busy: tuple[float, float]
+    disk_queue: tuple[float, float]
+    throttle_rate: float
+    apps: tuple[tuple[str, float], ...]
+
+
+PROFILES: dict[str, WorkloadProfile] = {
+    "office": WorkloadProfile(
+        "office", (8, 6), (500, 200), (18, 10), (40, 10), (3, 2), (8, 6), (0.2, 0.2), 0.001,
+        (("BROWSER_HEAVY", 0.5), ("OFFICE", 0.45), ("IDE", 0.05)),
+    ),
+    "developer": WorkloadProfile(
+        "developer", (15, 10), (1200, 500), (45, 20), (65, 12), (8, 5), (25, 15), (0.8, 0.5), 0.005,
+        (("IDE", 0.6), ("BROWSER_HEAVY", 0.3), ("OFFICE", 0.1)),
+    ),
+    "cad": WorkloadProfile(
+        "cad", (70, 20), (6000, 1500), (55, 20), (75, 12), (15, 10), (40, 20), (1.5, 1.0), 0.02,
+        (("CAD", 0.7), ("OFFICE", 0.2), ("BROWSER_HEAVY", 0.1)),
+    ),
+    "ml": WorkloadProfile(
+        "ml", (88, 10), (7600, 600), (80, 15), (90, 6), (30, 20), (60, 20), (3.0, 1.5), 0.05,
+        (("ML", 0.8), ("IDE", 0.2)),
+    ),
+}
+
+
+@dataclass(frozen=True)
+class FleetConfig:
+    devices: int = 100
+    days: int = 1
+    interval_minutes: int = 5
+    samples_per_day: int | None = None
+    tenant_id: str = "bench-tenant"
+    source: str = "synthetic"
+    seed: int = 42
+    profile_mix: tuple[tuple[str, float], ...] = (("office", 0.6), ("developer", 0.2), ("cad", 0.15), ("ml", 0.05))
+    # Replaces every profile's own app mix when set.
+    app_mix: tuple[tuple[str, float], ...] | None = None
+    start: datetime = field(default=datetime(2026, 1, 1, tzinfo=UTC))
+
+    @property
+    def daily_samples(self) -> int:
+        return self.samples_per_day or (24 * 60) // self.interval_minutes
+
+    @property
+    def total_records(self) -> int:
+        return self.devices * self.days * self.daily_samples
+
+
+def _bounded(rng: random.Random, spec: tuple[float, float], hi: float | None = None) -> float:
+    value = max(0.0, rng.gauss(*spec))
+    return round(min(value, hi) if hi is not None else value, 2)
+
+
+def device_profiles(config: FleetConfig) -> list[tuple[str, WorkloadProfile]]:
+    rng = random.Random(config.seed)
+    names = [name for name, _ in config.profile_mix]
+    weights = [weight for _, weight in config.profile_mix]
+    return [(f"DEV-{i:06d}", PROFILES[rng.choices(names, weights)[0]]) for i in range(config.devices)]
+
+
+def generate_records(config: FleetConfig) -> Iterator[dict[str, Any]]:
+    rng = random.Random(config.seed + 1)
+    devices = device_profiles(config)
+    step = timedelta(minutes=config.interval_minutes)
+    for day in range(config.days):
+        day_start = config.start + timedelta(days=day)
+        for sample in range(config.daily_samples):
+            observed_at = (day_start + sample * step).isoformat().replace("+00:00", "Z")
+            for device_key, p in devices:
+                apps = config.app_mix or p.apps
+                category = rng.choices([c for c, _ in apps], [w for _, w in apps])[0]
+                yield {
+                    "device_key": device_key,
+                    "observed_at": observed_at,
+                    "session": {"vdi": False, "interactive_ratio": round(rng.random(), 3)},
+                    "gpu": {
+                        "util_pct": _bounded(rng, p.gpu_util, 100),
+                        "vram_used_mb": _bounded(rng, p.vram_used_mb),
+                        "active_minutes": rng.randint(0, config.interval_minutes),
+                    },
+                    "cpu": {"util_pct": _bounded(rng, p.cpu_util, 100)},
+                    "ram": {"used_pct": _bounded(rng, p.ram_used, 100), "paging_pressure": int(rng.random() < 0.02)},
+                    "disk": {
+                        "latency_ms": _bounded(rng, p.disk_latency_ms),
+                        "busy_pct": _bounded(rng, p.disk_busy, 100),
+                        "queue_len": _bounded(rng, p.disk_queue),
+                    },
+                    "network": {"throughput_mbps": round(rng.uniform(0, 50), 2), "loss_proxy": 0.0},
+                    "thermal": {"throttle_event": rng.random() < p.throttle_rate, "on_battery": False, "docked": True},
+                    "apps": [{"category": category, "active_minutes": rng.randint(0, config.interval_minutes)}],
+                }
+
+
+def generate_payloads(config: FleetConfig, batch_size: int = 5000) -> Iterator[dict[str, Any]]:
+    records: list[dict[str, Any]] = []
+    batch_no = 0
+    for record in generate_records(config):
+        records.append(record)
+        if len(records) == batch_size:
+            yield _payload(config, batch_no, records)
+            batch_no += 1
+            records = []
+    if records:
+        yield _payload(config, batch_no, records)
+
+
+def generate_batches(config: FleetConfig, batch_size: int = 5000) -> Iterator[TelemetryBatchIn]:
+    for payload in generate_payloads(config, batch_size):
+        yield TelemetryBatchIn.model_validate(payload)
+
+
+def _payload(config: FleetConfig, batch_no: int, records: list[dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "schema_version": "1.0",
+        "tenant_id": config.tenant_id,
+        "source": config.source,
+        "batch_id": f"{config.seed}-{batch_no:08d}",
+        "sent_at": records[-1]["observed_at"],
+        "records": records,
+    }
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.schemas import TelemetryBatchIn
+from app.scoring import SignalArrays, compute_scores, score_batch
+from app.storage import InMemoryStore
+from benchmarks.fleet import FleetConfig, generate_payloads
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+# Metric names end in their unit, and the unit says which direction is a regression.
+HIGHER_IS_BETTER = ("_per_s",)
+LOWER_IS_BETTER = ("_ms", "_us", "_mib")
+
+Case = Callable[["Fleet", int], dict[str, float]]
+
+
+class Fleet:
+    """The synthetic fleet every case runs against, generated once per suite run."""
+
+    def __init__(self, config: FleetConfig, batch_size: int) -> None:
+        self.config = config
+        self.payloads = list(generate_payloads(config, batch_size))
+        self.batches = [TelemetryBatchIn.model_validate(p) for p in self.payloads]
+
+    def store(self) -> InMemoryStore:
+        store = InMemoryStore()
+        for batch in self.batches:
+            store.ingest_telemetry(batch)
+        return store
+
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _per_call(fn: Callable[[], Any], repeat: int, min_s: float = 0.05) -> float:
+    """Best per-call time, looping each measurement for at least `min_s` so fast calls rise above timer noise."""
+    calls = 1
+    while _best(lambda: [fn() for _ in range(calls)], 1) < min_s:
+        calls *= 2
+    return _best(lambda: [fn() for _ in range(calls)], repeat) / calls
+
+
+def _peak_mib(fn: Callable[[], Any]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def _percentiles_ms(latencies: list[float]) -> dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": 1000 * statistics.median(ordered),
+        "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+    }
+
+
+def case_ingest(fleet: Fleet, repeat: int) -> dict[str, float]:
+    latencies: list[float] = []
+
+    def ingest() -> None:
+        store = InMemoryStore()
+        for batch in fleet.batches:
+            started = time.perf_counter()
+            store.ingest_telemetry(batch)
+            latencies.append(time.perf_counter() - started)
+
+    best = _best(ingest, repeat)
+    return {
+        "records_per_s": fleet.config.total_records / best,
+        **{f"batch_{k}": v for k, v in _percentiles_ms(latencies).items()},
+        "peak_mib": _peak_mib(fleet.store),
+    }
+
+
+def case_generate_recommendations(fleet: Fleet, repeat: int) -> dict[str, float]:
+    # A fresh store per round: runs persist their recommendations, so reusing one would time a growing index.
+    tenant_id = fleet.config.tenant_id
+    best = float("inf")
+    for _ in range(repeat):
+        store = fleet.store()
+        best = min(best, _best(lambda: store.generate_recommendations(tenant_id), 1))
+    store = fleet.store()
+    return {
+        "devices_per_s": fleet.config.devices / best,
+        "run_ms": 1000 * best,
+        "peak_mib": _peak_mib(lambda: store.generate_recommendations(tenant_id)),
+    }
+
+
+def case_compute_scores(fleet: Fleet, repeat: int) -> dict[str, float]:
+    summaries = list(fleet.store().device_signals(fleet.config.tenant_id).values())
+    scalar = _per_call(lambda: [compute_scores(s) for s in summaries], repeat)
+    batch = _per_call(lambda: score_batch(SignalArrays.from_summaries(summaries)), repeat)
+    return {
+        "scalar_devices_per_s": len(summaries) / scalar,
+        "scalar_per_device_us": 1e6 * scalar / len(summaries),
+        "batch_devices_per_s": len(summaries) / batch,
+        "batch_per_device_us": 1e6 * batch / len(summaries),
+    }
+
+
+def case_http(fleet: Fleet, repeat: int) -> dict[str, float]:
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    ingest: list[float] = []
+    simulate: list[float] = []
+    best_ingest = float("inf")
+    with TestClient(app) as client:
+        for i in range(repeat):
+            # A fresh tenant per round, so batches are not deduped against the previous round.
+            tenant_id = f"{fleet.config.tenant_id}-http-{time.time_ns()}-{i}"
+            bodies = [json.dumps({**p, "tenant_id": tenant_id}).encode() for p in fleet.payloads]
+            headers = {"content-type": "application/json"}
+            gc.collect()
+            started = time.perf_counter()
+            for body in bodies:
+                sent = time.perf_counter()
+                client.post("/api/v1/ingestion/telemetry-batch", content=body, headers=headers)
+                ingest.append(time.perf_counter() - sent)
+            best_ingest = min(best_ingest, time.perf_counter() - started)
+
+            policy = client.post("/api/v1/admin/policies", json={"tenant_id": tenant_id, "name": "bench"}).json()
+            gc.collect()
+            sent = time.perf_counter()
+            client.post(f"/api/v1/admin/policies/{policy['policy_id']}/simulate", json={"tenant_id": tenant_id})
+            simulate.append(time.perf_counter() - sent)
+        params = {"tenant_id": tenant_id, "limit": 1000}
+        listing = _per_call(lambda: client.get("/api/v1/recommendations", params=params), repeat)
+    return {
+        "ingest_records_per_s": fleet.config.total_records / best_ingest,
+        **{f"ingest_{k}": v for k, v in _percentiles_ms(ingest).items()},
+        "simulate_ms": 1000 * min(simulate),
+        "list_ms": 1000 * listing,
+    }
+
+
+CASES: dict[str, Case] = {
+    "ingest": case_ingest,
+    "generate_recommendations": case_generate_recommendations,
+    "compute_scores": case_compute_scores,
+    "http": case_http,
+}
+
+
+def calibration_ms(repeat: int = 5) -> float:
+    """A fixed mixed Python/numpy workload; its time tracks how fast this machine is running right now."""
+    values = np.random.default_rng(0).random(200_000)
+
+    def work() -> None:
+        np.sort(values)
+        sum(i * i for i in range(200_000))
+
+    return 1000 * _best(work, repeat)
+
+
+def environment() -> dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "calibration_ms": calibration_ms(),
+    }
+
+
+def run(config: FleetConfig, batch_size: int, repeat: int, cases: list[str]) -> dict[str, Any]:
+    fleet = Fleet(config, batch_size)
+    # Round-tripped so it compares equal to a baseline read back from JSON.
+    settings = json.loads(json.dumps({**asdict(config), "start": config.start.isoformat(), "batch_size": batch_size}))
+    results: dict[str, Any] = {
+        "config": settings,
+        "environment": environment(),
+        "cases": {},
+    }
+    for name in cases:
+        results["cases"][name] = CASES[name](fleet, repeat)
+    results["environment"]["calibration_ms"] = min(results["environment"]["calibration_ms"], calibration_ms())
+    return results
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], threshold_pct: float, normalize: bool = True
+) -> list[dict[str, Any]]:
+    """Every metric present in both runs, with its change and whether it regressed beyond `threshold_pct`.
+
+    With `normalize`, timing metrics are first rescaled by the ratio of the two runs' calibration times,
+    so a baseline recorded on a faster or less loaded machine does not read as a regression.
+    Raises ValueError if the runs used different fleets, which would make the numbers incomparable.
+    """
+    if current["config"] != baseline["config"]:
+        raise ValueError("baseline was recorded with a different fleet config")
+    speed = 1.0
+    if normalize:
+        speed = current["environment"]["calibration_ms"] / baseline["environment"]["calibration_ms"]
+    rows = []
+    for case, metrics in current["cases"].items():
+        for metric, value in metrics.items():
+            base = baseline["cases"].get(case, {}).get(metric)
+            if base is None or not base:
+                continue
+            if metric.endswith("_per_s"):
+                value *= speed
+            elif metric.endswith(("_ms", "_us")):
+                value /= speed
+            change_pct = 100 * (value / base - 1)
+            if metric.endswith(HIGHER_IS_BETTER):
+                regressed = change_pct < -threshold_pct
+            elif metric.endswith(LOWER_IS_BETTER):
+                regressed = change_pct > threshold_pct
+            else:
+                regressed = False
+            rows.append(
+                {
+                    "case": case,
+                    "metric": metric,
+                    "baseline": base,
+                    "current": value,
+                    "change_pct": change_pct,
+                    "regressed": regressed,
+                }
+            )
+    return rows
+
+
+def parse_mix(spec: str) -> tuple[tuple[str, float], ...]:
+    """`name=weight,name=weight` as FleetConfig takes it."""
+    return tuple((name, float(weight)) for name, weight in (item.split("=") for item in spec.split(",")))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Ingest, scoring and HTTP benchmarks on a deterministic fleet, compared against a stored baseline."
+    )
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--interval-minutes", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--profile-mix", default=None, help="e.g. office=0.6,developer=0.2,cad=0.15,ml=0.05")
+    parser.add_argument("--app-mix", default=None, help="e.g. OFFICE=0.5,BROWSER_HEAVY=0.5; overrides profiles")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", nargs="*", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the baseline")
+    parser.add_argument("--threshold-pct", type=float, default=20.0)
+    parser.add_argument("--no-normalize", action="store_true", help="compare raw timings, without calibration")
+    args = parser.parse_args()
+    config = FleetConfig(
+        devices=args.devices,
+        days=args.days,
+        interval_minutes=args.interval_minutes,
+        seed=args.seed,
+        app_mix=parse_mix(args.app_mix) if args.app_mix else None,
+    )
+    if args.profile_mix:
+        config = replace(config, profile_mix=parse_mix(args.profile_mix))
+    results = run(config, args.batch_size, args.repeat, args.cases)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+    elif args.baseline.exists():
+        try:
+            results["comparison"] = compare(
+                results, json.loads(args.baseline.read_text()), args.threshold_pct, not args.no_normalize
+            )
+        except ValueError as exc:
+            results["comparison_error"] = str(exc)
+    print(json.dumps(results, indent=2))
+    if any(row["regressed"] for row in results.get("comparison", [])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
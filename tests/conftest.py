@@ -0,0 +1,44 @@
+import random
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.schemas import TelemetryBatchIn
+
+
+def _random_batch(seed: int, devices: int = 25, days: int = 1) -> TelemetryBatchIn:
+    rng = random.Random(seed)
+    start = datetime(2026, 2, 1, tzinfo=UTC)
+    records = []
+    for d in range(devices):
+        for i in range(rng.randint(1, 60)):
+            records.append(
+                {
+                    "device_key": f"WIN-{d}",
+                    "observed_at": start + timedelta(days=rng.randrange(days), minutes=5 * i),
+                    "session": {"interactive_ratio": rng.random()},
+                    "gpu": {
+                        "util_pct": rng.uniform(0, 100),
+                        "vram_used_mb": rng.uniform(0, 12000),
+                        "active_minutes": rng.randint(0, 5),
+                    },
+                    "cpu": {"util_pct": rng.uniform(0, 100)},
+                    "ram": {"used_pct": rng.uniform(0, 100), "paging_pressure": rng.randint(0, 4)},
+                    "disk": {
+                        "latency_ms": rng.uniform(0, 120),
+                        "busy_pct": rng.uniform(0, 100),
+                        "queue_len": rng.uniform(0, 6),
+                    },
+                    "network": {"throughput_mbps": 1.0, "loss_proxy": 0.0},
+                    "thermal": {"throttle_event": rng.random() < 0.1},
+                    "apps": [{"category": rng.choice(["cad", "IDE", "browser"]), "active_minutes": rng.randint(0, 5)}],
+                }
+            )
+    rng.shuffle(records)
+    return TelemetryBatchIn(tenant_id="tenant-a", source="s", batch_id=str(seed), sent_at=start, records=records)
+
+
+@pytest.fixture
+def random_batch() -> Callable[..., TelemetryBatchIn]:
+    return _random_batch
@@ -0,0 +1,72 @@
+import random
+from collections.abc import Callable
+
+import numpy as np
+import pytest
+
+from app.aggregation import summarize_devices
+from app.capabilities import DeviceCapabilities, apply_vram
+from app.schemas import TelemetryBatchIn, TelemetryRecord
+from app.scoring import SignalArrays
+from app.telemetry_store import TelemetryColumns
+
+
+def test_numpy_backend_matches_python_reference(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    columns = TelemetryColumns()
+    for seed in range(3):
+        columns.append_batch(random_batch(seed))
+    devices = columns.devices("tenant-a")
+
+    reference = summarize_devices(devices, backend="python")
+    batched = summarize_devices(devices, backend="numpy")
+    assert list(reference) == list(batched)
+    assert reference == batched
+
+
+def _baseline_p95(values: list[float]) -> float:
+    return sorted(values)[int(0.95 * (len(values) - 1))]
+
+
+def _baseline_vram_pct(records: list[TelemetryRecord], vram_mb: float) -> float:
+    return _baseline_p95([min(100.0, r.gpu.vram_used_mb / vram_mb * 100.0) for r in records])
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy"])
+def test_backends_match_the_baseline_formula(random_batch: Callable[..., TelemetryBatchIn], backend: str) -> None:
+    columns = TelemetryColumns()
+    by_device: dict[str, list[TelemetryRecord]] = {}
+    for seed in range(3):
+        batch = random_batch(seed, days=3)
+        columns.append_batch(batch)
+        for r in batch.records:
+            by_device.setdefault(r.device_key, []).append(r)
+    summaries = summarize_devices(columns.devices("tenant-a"), backend=backend)
+    assert sorted(summaries) == sorted(by_device)
+
+    for device_key, records in by_device.items():
+        summary = summaries[device_key]
+        assert summary.gpu_util_p95 == _baseline_p95([r.gpu.util_pct for r in records])
+        assert summary.cpu_util_p95 == _baseline_p95([r.cpu.util_pct for r in records])
+        assert summary.ram_used_p95 == _baseline_p95([r.ram.used_pct for r in records])
+        assert summary.disk_latency_p95_ms == _baseline_p95([r.disk.latency_ms for r in records])
+        assert summary.disk_queue_p95 == _baseline_p95([r.disk.queue_len for r in records])
+        assert summary.vram_used_p95_pct == _baseline_vram_pct(records, 8192.0)
+
+    # Cards from 2 to 24 GB, so some devices saturate the percentage and others stay well below it.
+    rng = random.Random(7)
+    device_keys = list(summaries)
+    vram_gb = np.array([rng.choice([2, 4, 6, 8, 12, 16, 24]) for _ in device_keys], dtype=np.float64)
+    assert len(set(vram_gb.tolist())) > 3
+    unknown = np.full(len(device_keys), np.nan)
+    signals = apply_vram(
+        SignalArrays.from_summaries([summaries[k] for k in device_keys]),
+        DeviceCapabilities(vram_gb, unknown, unknown),
+    )
+    assert signals.vram_used_p95_pct.tolist() == [
+        _baseline_vram_pct(by_device[k], gb * 1024.0) for k, gb in zip(device_keys, vram_gb.tolist())
+    ]
+
+
+def test_unknown_backend_rejected() -> None:
+    with pytest.raises(ValueError):
+        summarize_devices({}, backend="gpu")
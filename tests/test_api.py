@@ -54,8 +54,71 @@ def test_ingestion_idempotency_and_recommendations_flow() -> None:
     sim = client.post(f"/api/v1/admin/policies/{policy_id}/simulate", json={"tenant_id": "tenant-a"})
     assert sim.status_code == 200
     assert len(sim.json()["items"]) >= 1
+    assert sim.json()["cache"]["misses"] == len(sim.json()["items"])
+
+    again = client.post(f"/api/v1/admin/policies/{policy_id}/simulate", json={"tenant_id": "tenant-a"})
+    assert again.json()["cache"]["hit_rate"] == 1.0
+
+    sweep = client.post(
+        f"/api/v1/admin/policies/{policy_id}/what-if",
+        json={"tenant_id": "tenant-a", "variants": [{"name": "strict", "thresholds": {"underpowered_fit": 101}}]},
+    )
+    assert sweep.status_code == 200
+    strict = sweep.json()["variants"][0]
+    assert strict["name"] == "strict"
+    assert strict["classification_counts"]["UNDERPOWERED"] == sweep.json()["devices"]
+    bad = client.post(
+        f"/api/v1/admin/policies/{policy_id}/what-if",
+        json={"tenant_id": "tenant-a", "variants": [{"thresholds": {"underpowered_fit": "x"}}]},
+    )
+    assert bad.status_code == 422
 
     recommendation_id = sim.json()["items"][0]["recommendation_id"]
     approve = client.post(f"/api/v1/recommendations/{recommendation_id}/approve")
     assert approve.status_code == 200
     assert approve.json()["status"] == "APPROVED"
+
+
+def test_recommendation_list_paginates_with_cursor() -> None:
+    records = [
+        {
+            "device_key": f"PAGE-{i}",
+            "observed_at": "2026-02-20T02:05:00Z",
+            "session": {"vdi": False, "interactive_ratio": 0.8},
+            "gpu": {"util_pct": 10, "vram_used_mb": 400, "active_minutes": 2},
+            "cpu": {"util_pct": 22},
+            "ram": {"used_pct": 35, "paging_pressure": 0},
+            "disk": {"latency_ms": 2, "busy_pct": 8, "queue_len": 0.2},
+            "network": {"throughput_mbps": 5.0, "loss_proxy": 0.0},
+            "thermal": {"throttle_event": False},
+        }
+        for i in range(5)
+    ]
+    client.post(
+        "/api/v1/ingestion/telemetry-batch",
+        json={
+            "tenant_id": "tenant-page",
+            "source": "windows_collector",
+            "batch_id": "batch-1",
+            "sent_at": "2026-02-20T02:10:00Z",
+            "records": records,
+        },
+    )
+    policy_id = client.post("/api/v1/admin/policies", json={"tenant_id": "tenant-page", "name": "p"}).json()["policy_id"]
+    client.post(f"/api/v1/admin/policies/{policy_id}/simulate", json={"tenant_id": "tenant-page"})
+
+    seen: list[str] = []
+    cursor = None
+    while True:
+        params = {"tenant_id": "tenant-page", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/v1/recommendations", params=params).json()
+        assert len(page["items"]) <= 2
+        seen.extend(item["device_key"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == [f"PAGE-{i}" for i in range(5)]
+
+    assert client.get("/api/v1/recommendations", params={"tenant_id": "tenant-page", "cursor": "x"}).status_code == 400
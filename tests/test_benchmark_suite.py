@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.fleet import FleetConfig, generate_payloads
+from benchmarks.suite import compare, parse_mix
+
+
+def test_fleet_is_deterministic_and_app_mix_overrides_profiles() -> None:
+    config = FleetConfig(devices=5, days=1, samples_per_day=4)
+    assert list(generate_payloads(config, 7)) == list(generate_payloads(config, 7))
+
+    mixed = FleetConfig(devices=5, days=1, samples_per_day=4, app_mix=parse_mix("OFFICE=1"))
+    categories = {r["apps"][0]["category"] for p in generate_payloads(mixed) for r in p["records"]}
+    assert categories == {"OFFICE"}
+
+
+def test_compare_flags_regressions_by_metric_direction_after_calibration() -> None:
+    def run(calibration_ms: float, **cases: dict[str, float]) -> dict:
+        return {"config": {"devices": 10}, "environment": {"calibration_ms": calibration_ms}, "cases": cases}
+
+    baseline = run(10.0, ingest={"records_per_s": 1000.0, "batch_p95_ms": 10.0, "peak_mib": 50.0})
+    current = run(10.0, ingest={"records_per_s": 700.0, "batch_p95_ms": 11.0, "peak_mib": 80.0})
+    regressed = {row["metric"] for row in compare(current, baseline, 20.0) if row["regressed"]}
+    assert regressed == {"records_per_s", "peak_mib"}
+
+    # Same code on a machine running twice as slow: timings scale back, memory does not.
+    slower = run(20.0, ingest={"records_per_s": 500.0, "batch_p95_ms": 20.0, "peak_mib": 50.0})
+    assert not any(row["regressed"] for row in compare(slower, baseline, 20.0))
+    assert any(row["regressed"] for row in compare(slower, baseline, 20.0, normalize=False))
+
+    with pytest.raises(ValueError):
+        compare({**current, "config": {"devices": 20}}, baseline, 20.0)
@@ -0,0 +1,100 @@
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.capabilities import CapabilityIndex
+from app.main import app
+from app.recommend import build_recommendations
+from app.scoring import ScoringParams
+from app.schemas import CapabilityBatchIn, PolicyCreateIn, TelemetryBatchIn
+from app.storage import InMemoryStore
+
+CAPTURED = datetime(2026, 2, 1, tzinfo=UTC)
+
+
+def capability_batch(*snapshots: tuple[str, int, int, int, int]) -> CapabilityBatchIn:
+    return CapabilityBatchIn(
+        tenant_id="tenant-a",
+        source="sccm",
+        snapshots=[
+            {
+                "device_key": device_key,
+                "captured_at": CAPTURED + timedelta(hours=hours),
+                "cpu": {"model": "x86", "cores": cores},
+                "ram_gb": ram_gb,
+                "storage": {"type": "nvme", "total_gb": 512},
+                "gpu": {"vendor": "nv", "model": "rtx", "vram_gb": vram_gb, "driver": "1"},
+            }
+            for device_key, hours, cores, ram_gb, vram_gb in snapshots
+        ],
+    )
+
+
+def test_latest_snapshot_wins_regardless_of_arrival_order() -> None:
+    index = CapabilityIndex()
+    changed: list[set[str]] = []
+    index.subscribe(lambda tenant_id, device_keys: changed.append(device_keys))
+    index.add_batch(capability_batch(("WIN-1", 5, 8, 32, 8), ("WIN-2", 0, 4, 16, 0)))
+    index.add_batch(capability_batch(("WIN-1", 1, 16, 64, 24)))
+    index.add_batch(capability_batch(("WIN-2", 2, 6, 16, 4)))
+    assert index.get("tenant-a", "WIN-1").cpu.cores == 8
+    assert changed == [{"WIN-1", "WIN-2"}, {"WIN-2"}]
+
+    columns = index.columns("tenant-a", ["WIN-2", "WIN-9", "WIN-1"])
+    assert columns.vram_gb[[0, 2]].tolist() == [4, 8]
+    assert columns.known.tolist() == [True, False, True]
+    assert np.isnan(index.columns("tenant-b", ["WIN-1"]).ram_gb).all()
+
+
+def test_naive_and_aware_capture_times_compare_as_utc() -> None:
+    index = CapabilityIndex()
+    index.add_batch(capability_batch(("WIN-1", 5, 8, 32, 8)))
+    naive = capability_batch(("WIN-1", 4, 16, 64, 24), ("WIN-1", 6, 4, 16, 4))
+    for snapshot in naive.snapshots:
+        snapshot.captured_at = snapshot.captured_at.replace(tzinfo=None)
+    # Through validation, as the API and the SQLite reload build them.
+    index.add_batch(CapabilityBatchIn.model_validate(naive.model_dump()))
+    assert index.get("tenant-a", "WIN-1").cpu.cores == 4
+    assert index.get("tenant-a", "WIN-1").captured_at == CAPTURED + timedelta(hours=6)
+
+    client = TestClient(app)
+    body = capability_batch(("WIN-1", 5, 8, 32, 8)).model_dump(mode="json") | {"tenant_id": "tenant-naive"}
+    assert client.post("/api/v1/ingestion/capability-snapshots", json=body).status_code == 200
+    body["snapshots"][0]["captured_at"] = "2026-02-01T07:00:00"
+    assert client.post("/api/v1/ingestion/capability-snapshots", json=body).status_code == 200
+
+
+def test_scoring_uses_real_vram_and_capacity(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(0, devices=20, days=3))
+    summaries = store.device_signals("tenant-a")
+    baseline = {r.device_key: r for r in build_recommendations("tenant-a", summaries)}
+    store.ingest_capabilities(capability_batch(("WIN-0", 0, 8, 32, 48), ("WIN-1", 0, 4, 8, 2)))
+
+    recs = {r.device_key: r for r in store.generate_recommendations("tenant-a")}
+    assert recs["WIN-0"].top_reasons[0] != baseline["WIN-0"].top_reasons[0]
+    assert all(recs[k].top_reasons == baseline[k].top_reasons for k in summaries if k not in ("WIN-0", "WIN-1"))
+
+    everything_downsized = ScoringParams(
+        underpowered_fit=-1, critical_pressure=2, overprovisioned_fit=-1, overprovisioned_score=-1
+    )
+    capabilities = store.capabilities.columns("tenant-a", list(summaries))
+    savings = {
+        r.device_key: r.expected_savings_usd_annual
+        for r in build_recommendations("tenant-a", summaries, params=everything_downsized, capabilities=capabilities)
+    }
+    assert savings["WIN-1"] == 4 * 60 + 8 * 12 + 2 * 42
+    assert savings["WIN-2"] == 1200.0
+
+    policy = store.create_policy(PolicyCreateIn(tenant_id="tenant-a", name="p"))
+    _, _, (outcome,) = store.what_if("tenant-a", policy, [vars(everything_downsized)])
+    assert outcome.expected_savings_usd_annual == sum(savings.values())
+    store.simulate_policy("tenant-a", policy)
+    store.ingest_capabilities(capability_batch(("WIN-0", 1, 8, 32, 12)))
+    simulated, report = store.simulate_policy("tenant-a", policy)
+    assert (report.hits, report.misses) == (19, 1)
+    assert {r.device_key: r.top_reasons for r in simulated} == {
+        r.device_key: r.top_reasons for r in store.generate_recommendations("tenant-a")
+    }
@@ -0,0 +1,199 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from app.servicenow_export import ImportSetClient, ImportSetTarget, ServiceNowExporter
+from app.servicenow_mock import MockImportSet
+from app.sqlite_store import SqliteStore
+from app.storage import InMemoryStore
+
+
+def rollup_samples(store: InMemoryStore) -> int:
+    return sum(
+        rollup.samples
+        for tenant_id in store.rollups.tenants()
+        for days in store.rollups.devices(tenant_id).values()
+        for rollup in days.values()
+    )
+
+
+def test_concurrent_ingest_counts_every_record_once(random_batch, tmp_path) -> None:
+    batches = [
+        random_batch(seed, devices=6).model_copy(update={"tenant_id": f"tenant-{seed % 5}"}) for seed in range(40)
+    ]
+    expected = sum(len(batch.records) for batch in batches)
+    for store in (InMemoryStore(aggregation_backend="numpy"), SqliteStore(tmp_path / "itam.db")):
+        with ThreadPoolExecutor(8) as pool:
+            # Every batch twice: whichever copy loses the race must be deduped, not counted again.
+            results = list(pool.map(store.ingest_telemetry, batches + batches))
+        assert sum(accepted for accepted, _ in results) == expected
+        assert sum(deduped for _, deduped in results) == len(batches)
+        assert rollup_samples(store) == expected
+        if isinstance(store, SqliteStore):
+            store.close()
+        else:
+            assert store.telemetry.record_count() == expected
+
+
+def test_runs_read_while_ingestion_adds_devices(random_batch) -> None:
+    store = InMemoryStore()
+    batches = [random_batch(seed, devices=seed + 1, days=3) for seed in range(12)]
+    errors: list[Exception] = []
+    ingested = threading.Event()
+
+    def runs() -> None:
+        while not ingested.is_set():
+            try:
+                store.generate_recommendations("tenant-a")
+                store.generate_recommendations("tenant-a", window_days=30)
+            except Exception as exc:
+                errors.append(exc)
+                return
+
+    # Switch threads far more often than the default 5 ms so unguarded dict and buffer use shows up.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-4)
+    try:
+        runner = threading.Thread(target=runs)
+        runner.start()
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(store.ingest_telemetry, batches))
+        ingested.set()
+        runner.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(store.generate_recommendations("tenant-a", window_days=30)) == 12
+    assert rollup_samples(store) == sum(len(batch.records) for batch in batches)
+
+
+def test_exports_read_summaries_while_ingestion_updates_them(random_batch) -> None:
+    store = InMemoryStore()
+    # A few devices with deep exact-quantile arrays, so encoding a row takes long enough to overlap appends.
+    for seed in range(40):
+        store.ingest_telemetry(random_batch(seed, devices=4))
+    batches = [random_batch(seed, devices=4) for seed in range(40, 100)]
+    errors: list[Exception] = []
+    ingested = threading.Event()
+
+    def exports(sync: ServiceNowExporter) -> None:
+        while not ingested.is_set():
+            try:
+                # Each export re-encodes the (device, day) rollups the ingest threads keep appending to.
+                sync.export("tenant-a")
+            except Exception as exc:
+                errors.append(exc)
+                return
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-4)
+    with MockImportSet() as mock:
+        target = ImportSetTarget(mock.base_url)
+        sync = ServiceNowExporter(store, target, ImportSetClient(target))
+        exporter = threading.Thread(target=exports, args=(sync,))
+        exporter.start()
+        try:
+            with ThreadPoolExecutor(4) as pool:
+                results = list(pool.map(store.ingest_telemetry, batches))
+        finally:
+            ingested.set()
+            exporter.join()
+            sys.setswitchinterval(interval)
+            sync.close()
+    assert errors == []
+    assert sum(accepted for accepted, _ in results) == sum(len(batch.records) for batch in batches)
+
+
+def test_approvals_race_runs_without_being_lost(random_batch) -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(1, devices=40))
+    ids = [rec.recommendation_id for rec in store.generate_recommendations("tenant-a")]
+
+    def approve() -> None:
+        for recommendation_id in ids:
+            store.set_recommendation_status(recommendation_id, "APPROVED")
+
+    def rerun() -> None:
+        for _ in range(5):
+            store.generate_recommendations("tenant-a")
+            store.query_recommendations("tenant-a", status="PENDING")
+
+    threads = [threading.Thread(target=approve), threading.Thread(target=rerun), threading.Thread(target=rerun)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    approved, _ = store.query_recommendations("tenant-a", status="APPROVED")
+    assert sorted(rec.recommendation_id for rec in approved) == sorted(ids)
+    assert all(store.recommendations[x].status == "APPROVED" for x in ids)
+
+
+def test_tenant_lock_only_holds_off_its_own_shard(random_batch) -> None:
+    store = InMemoryStore(shards=4)
+    lock = store.tenant_lock("tenant-a")
+    other = next(t for t in (f"tenant-{i}" for i in range(100)) if store.tenant_lock(t) is not lock)
+    mine = threading.Thread(target=store.ingest_telemetry, args=(random_batch(1),))
+    theirs = threading.Thread(
+        target=store.ingest_telemetry, args=(random_batch(2).model_copy(update={"tenant_id": other}),)
+    )
+    with lock:
+        theirs.start()
+        theirs.join(timeout=10)
+        assert not theirs.is_alive() and store.rollups.devices(other)
+        mine.start()
+        mine.join(timeout=0.2)
+        assert mine.is_alive() and not store.rollups.devices("tenant-a")
+    mine.join(timeout=10)
+    assert len(store.rollups.devices("tenant-a")) == 25
+
+
+def test_sqlite_ingest_is_not_hit_by_another_tenants_compaction(random_batch, tmp_path) -> None:
+    store = SqliteStore(tmp_path / "itam.db")
+    lock = store.tenant_lock("tenant-a")
+    other = next(t for t in (f"tenant-{i}" for i in range(100)) if store.tenant_lock(t) is not lock)
+    store.ingest_telemetry(random_batch(0, days=3).model_copy(update={"tenant_id": other}))
+    dropped = threading.Event()
+    compactor = threading.Thread(
+        target=store.compact_devices,
+        args=(other, sorted(store.rollups.devices(other)), date(2026, 2, 3), date(2026, 2, 3)),
+    )
+
+    def on_rollup(tenant_id: str, touched: set) -> None:
+        # Midway through tenant-a's ingest, let the other tenant's retention drop its rollups.
+        if tenant_id == other:
+            dropped.set()
+        elif compactor.ident is None:
+            compactor.start()
+            dropped.wait(timeout=10)
+
+    store.rollups.subscribe(on_rollup)
+    batch = random_batch(1)
+    assert store.ingest_telemetry(batch) == (len(batch.records), False)
+    compactor.join(timeout=10)
+    assert dropped.is_set() and not compactor.is_alive()
+    store.close()
+    reopened = SqliteStore(tmp_path / "itam.db")
+    assert rollup_samples(reopened) == rollup_samples(store)
+    reopened.close()
+
+
+def test_sqlite_ingest_runs_while_another_tenant_updates_rollups(random_batch, tmp_path) -> None:
+    store = SqliteStore(tmp_path / "itam.db")
+    lock = store.tenant_lock("tenant-a")
+    other = next(t for t in (f"tenant-{i}" for i in range(100)) if store.tenant_lock(t) is not lock)
+    theirs = threading.Thread(
+        target=store.ingest_telemetry, args=(random_batch(1).model_copy(update={"tenant_id": other}),)
+    )
+
+    def on_rollup(tenant_id: str, touched: set) -> None:
+        # Midway through tenant-a's in-memory update, the other tenant's ingest commits.
+        if tenant_id == "tenant-a":
+            theirs.start()
+            theirs.join(timeout=10)
+
+    store.rollups.subscribe(on_rollup)
+    batch = random_batch(0)
+    assert store.ingest_telemetry(batch) == (len(batch.records), False)
+    assert not theirs.is_alive() and store.rollups.devices(other) and store.has_batch(other, "s", "1")
+    store.close()
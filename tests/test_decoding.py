@@ -0,0 +1,155 @@
+import copy
+import gc
+import json
+import threading
+from typing import Any
+
+import pytest
+from pydantic import ValidationError
+
+from app import decoding
+from app.decoding import DECODERS, decode_telemetry_batch, tune_gc
+
+RECORD: dict[str, Any] = {
+    "device_key": "WIN-1",
+    "observed_at": "2026-02-20T02:05:00Z",
+    "session": {"vdi": False, "interactive_ratio": 0.82},
+    "gpu": {"util_pct": 76, "vram_used_mb": 5300.5, "active_minutes": 5, "compute_pct": 20, "graphics_pct": 56},
+    "cpu": {"util_pct": 68},
+    "ram": {"used_pct": 79, "paging_pressure": 0},
+    "disk": {"latency_ms": 23, "busy_pct": 67, "queue_len": 1.7},
+    "network": {"throughput_mbps": 22.4, "loss_proxy": 0.01},
+    "thermal": {"throttle_event": False, "on_battery": True, "docked": False},
+    "apps": [{"publisher": "Autodesk", "process": "acad.exe", "category": "CAD", "active_minutes": 4}],
+}
+
+# (path, value) applied to the second record; `DELETE` removes the key instead.
+DELETE = object()
+MUTATIONS: list[tuple[tuple, Any]] = [
+    ((), None),
+    (("gpu", "util_pct"), "55"),
+    (("gpu", "util_pct"), 100.0001),
+    (("gpu", "util_pct"), -1),
+    (("gpu", "util_pct"), True),
+    (("gpu", "util_pct"), None),
+    (("gpu", "active_minutes"), 5.0),
+    (("gpu", "active_minutes"), 5.5),
+    (("gpu", "active_minutes"), "5"),
+    (("gpu", "compute_pct"), DELETE),
+    (("gpu", "compute_pct"), None),
+    (("gpu", "compute_pct"), 101),
+    (("gpu", "vram_used_mb"), 10**400),
+    (("gpu", "vram_used_mb"), 10**30 + 1),
+    (("gpu", "vram_used_mb"), 2**53 + 1),
+    (("gpu", "vram_used_mb"), 1e308 * 10),
+    (("gpu", "vram_used_mb"), float("nan")),
+    (("session", "interactive_ratio"), 1),
+    (("session", "interactive_ratio"), 1.5),
+    (("session", "vdi"), DELETE),
+    (("session", "vdi"), "true"),
+    (("session", "vdi"), 1),
+    (("thermal", "docked"), DELETE),
+    (("thermal",), {}),
+    (("cpu",), "busy"),
+    (("disk", "queue_len"), DELETE),
+    (("device_key",), 42),
+    (("device_key",), "\ud800"),
+    (("device_key",), "9" * 400),
+    (("observed_at",), "2026-02-20"),
+    (("observed_at",), "2026-02-20 02:05:00Z"),
+    (("observed_at",), "2026-02-20T02:05:00.123456+05:30"),
+    (("observed_at",), "2026-02-20T02:05:00.5"),
+    (("observed_at",), "2026-02-20T25:05:00Z"),
+    (("observed_at",), 1771553100),
+    (("apps",), DELETE),
+    (("apps",), "CAD"),
+    (("apps", 0, "category"), None),
+    (("apps", 0, "publisher"), 7),
+    (("apps", 0, "active_minutes"), -1),
+    (("extra",), {"ignored": True}),
+]
+
+
+def _mutate(record: dict[str, Any], path: tuple, value: Any) -> dict[str, Any]:
+    record = copy.deepcopy(record)
+    if not path:
+        return record
+    target = record
+    for key in path[:-1]:
+        target = target[key]
+    if value is DELETE:
+        del target[path[-1]]
+    else:
+        target[path[-1]] = value
+    return record
+
+
+def _decode(body: bytes, decoder: str) -> dict[str, Any] | str:
+    try:
+        return decode_telemetry_batch(body, decoder).model_dump(exclude_unset=True)
+    except (ValidationError, ValueError) as exc:
+        return type(exc).__name__
+
+
+@pytest.mark.parametrize("path,value", MUTATIONS)
+def test_decoders_agree_with_fastapi_parsing(path: tuple, value: Any) -> None:
+    batch = {
+        "tenant_id": "tenant-a",
+        "source": "s",
+        "batch_id": "b-1",
+        "sent_at": "2026-02-20T02:10:00Z",
+        "records": [RECORD, _mutate(RECORD, path, value)],
+    }
+    body = json.dumps(batch).encode()
+    expected = _decode(body, "fastapi")
+    for decoder in DECODERS:
+        assert _decode(body, decoder) == expected
+
+
+def test_decoders_reject_malformed_batches() -> None:
+    for body in (b"[]", b'{"tenant_id": "t"}', b"{", b'{"tenant_id": "t",}', b"{}\x01", "{}".encode("utf-16")):
+        for decoder in DECODERS:
+            assert _decode(body, decoder) == _decode(body, "fastapi")
+
+
+def test_fast_decoder_validates_bytes_without_json_loads(monkeypatch) -> None:
+    def json_loads(body: bytes) -> Any:
+        raise AssertionError("json.loads called")
+
+    batch = {"tenant_id": "t", "source": "s", "batch_id": "b", "sent_at": RECORD["observed_at"], "records": [RECORD]}
+    monkeypatch.setattr(decoding.json, "loads", json_loads)
+    assert decode_telemetry_batch(json.dumps(batch).encode(), "fast").records[0].device_key == "WIN-1"
+
+
+def test_overlapping_fast_decodes_leave_the_collector_on() -> None:
+    batch = {"tenant_id": "t", "source": "s", "batch_id": "b", "sent_at": RECORD["observed_at"]}
+    body = json.dumps({**batch, "records": [RECORD] * 500}).encode()
+    started = threading.Barrier(3)
+
+    def decode() -> None:
+        started.wait()
+        for _ in range(20):
+            decode_telemetry_batch(body, "fast")
+
+    threads = [threading.Thread(target=decode) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    during = gc.isenabled()
+    for thread in threads:
+        thread.join()
+    assert during and gc.isenabled()
+
+
+def test_tuned_gc_still_collects() -> None:
+    thresholds = gc.get_threshold()
+    try:
+        tune_gc(10_000)
+        assert gc.isenabled() and gc.get_threshold()[0] == 10_000 and gc.get_freeze_count() > 0
+        collections = gc.get_stats()[0]["collections"]
+        garbage = [[] for _ in range(30_000)]
+        assert gc.get_stats()[0]["collections"] > collections
+        del garbage
+    finally:
+        gc.unfreeze()
+        gc.set_threshold(*thresholds)
@@ -0,0 +1,110 @@
+import os
+from collections.abc import Callable
+from datetime import date, timedelta, timezone
+
+import numpy as np
+
+from app.dedupe import BloomFilter, DedupeIndex, ExpiringKeyIndex, record_key
+from app.schemas import TelemetryBatchIn
+from app.storage import InMemoryStore
+
+DAY = date(2026, 2, 1)
+
+
+def _keys(n: int) -> np.ndarray:
+    return np.frombuffer(os.urandom(16 * n), dtype="S16")
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    keys = _keys(5000)
+    bloom = BloomFilter(5000, fp_rate=0.01)
+    bloom.add(keys)
+    assert bloom.contains(keys).all()
+    assert bloom.contains(_keys(20000)).mean() < 0.03
+
+
+def test_index_reports_new_keys_across_merges() -> None:
+    for bloom in (True, False):
+        index = ExpiringKeyIndex(bloom=bloom, merge_every=100)
+        first = _keys(250)
+        assert index.add(DAY, first).all()
+        # Trailing NUL bytes survive the set/array round trip.
+        padded = np.array([b"\x01" * 15 + b"\x00", b"\x00" * 16], dtype="S16")
+        assert index.add(DAY, padded).all()
+        again = np.concatenate([first[::7], padded, first[:1]])
+        fresh = _keys(3)
+        assert not index.add(DAY, again).any()
+        assert index.add(DAY, np.concatenate([fresh, fresh])).tolist() == [True] * 3 + [False] * 3
+        assert len(index) == 255
+        assert index.contains(first).all()
+        assert index.contains_key(b"\x01" * 15 + b"\x00") and index.contains_key(first.tolist()[0])
+        assert not index.contains_key(os.urandom(16))
+
+
+def test_nul_terminated_batch_keys_stay_claimed_after_a_merge() -> None:
+    index = ExpiringKeyIndex()
+    key = b"\x02" * 14 + b"\x00\x00"
+    assert index.add_key(DAY, key)
+    # Enough further claims to move the key from the pending set into the sorted array.
+    for other in _keys(index.merge_every).tolist():
+        index.add_key(DAY, other)
+    assert index.contains_key(key)
+    assert not index.add_key(DAY, key)
+
+
+def test_released_batches_and_records_can_be_claimed_again(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    dedupe = DedupeIndex()
+    dedupe.records.merge_every = 50
+    batch = random_batch(0, devices=2)
+    assert dedupe.claim_batch("tenant-a", "s", "0") and len(dedupe.new_records(batch)) == len(batch.records)
+    dedupe.release(batch)
+    assert not dedupe.has_batch("tenant-a", "s", "0") and len(dedupe.records) == 0
+    assert dedupe.claim_batch("tenant-a", "s", "0") and len(dedupe.new_records(batch)) == len(batch.records)
+
+
+def test_buckets_expire_past_the_horizon() -> None:
+    index = ExpiringKeyIndex(horizon_days=2)
+    old = _keys(10)
+    index.add(DAY, old)
+    index.add(DAY + timedelta(days=2), _keys(1))
+    assert index.days() == [DAY, DAY + timedelta(days=2)]
+    index.add(DAY + timedelta(days=3), _keys(1))
+    assert index.days() == [DAY + timedelta(days=2), DAY + timedelta(days=3)]
+    assert not index.contains(old).any()
+    assert index.add(DAY, old).all() and index.late == 10
+
+
+def test_batch_keys_are_checked_across_buckets() -> None:
+    today = [DAY]
+    dedupe = DedupeIndex(clock=lambda: today[0])
+    assert dedupe.claim_batch("t", "s", "b1")
+    today[0] = DAY + timedelta(days=1)
+    assert dedupe.has_batch("t", "s", "b1")
+    assert not dedupe.claim_batch("t", "s", "b1")
+    assert dedupe.claim_batch("t", "s", "b2")
+    today[0] = DAY + timedelta(days=40)
+    assert dedupe.claim_batch("t", "s", "b1")
+
+
+def test_retried_records_are_not_double_counted(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    store = InMemoryStore()
+    batch = random_batch(0, devices=10)
+    assert store.ingest_telemetry(batch) == (len(batch.records), False)
+    counts = {d: len(s) for d, s in store.telemetry.devices("tenant-a").items()}
+    signals = store.device_signals("tenant-a")
+
+    partial = batch.records[: len(batch.records) // 2]
+    cest = timezone(timedelta(hours=2))
+    shifted = [r.model_copy(update={"observed_at": r.observed_at.astimezone(cest)}) for r in partial]
+    extra = random_batch(1, devices=2).records
+    retry = batch.model_copy(update={"batch_id": "retry", "records": shifted + extra})
+    assert store.ingest_telemetry(retry) == (len(extra), False)
+    assert store.ingest_telemetry(retry) == (0, True)
+
+    after = {d: len(s) for d, s in store.telemetry.devices("tenant-a").items()}
+    extra_counts = {d: sum(1 for r in extra if r.device_key == d) for d in after}
+    assert after == {d: counts[d] + extra_counts[d] for d in counts}
+    assert record_key("tenant-a", partial[0]) == record_key("tenant-a", shifted[0])
+    assert record_key("tenant-a", partial[0]) != record_key("tenant-b", partial[0])
+    untouched = [d for d in signals if not extra_counts[d]]
+    assert untouched and store.device_signals("tenant-a", device_keys=untouched) == {d: signals[d] for d in untouched}
@@ -0,0 +1,92 @@
+from collections.abc import Callable
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.capabilities import DeviceCapabilities
+from app.fingerprints import VectorIndex
+from app.main import app, store
+from app.recommend import build_recommendations
+from app.schemas import Action, TelemetryBatchIn
+from app.scoring import SignalSummary
+
+
+def test_ivf_index_agrees_with_exact_search() -> None:
+    rng = np.random.default_rng(3)
+    centres = rng.normal(size=(20, 7)) * 4
+    vectors = (centres[rng.integers(0, 20, 5000)] + rng.normal(size=(5000, 7))).astype(np.float32)
+    exact = VectorIndex(vectors, lists=0)
+    ivf = VectorIndex(vectors, lists=40, probes=6)
+
+    ids, dists = exact.search(vectors[:200], 5)
+    assert ids[:, 0].tolist() == list(range(200))
+    assert (np.diff(dists, axis=1) >= 0).all()
+    approx, _ = ivf.search(vectors[:200], 5)
+    recall = np.mean([len(set(a) & set(e)) / 5 for a, e in zip(approx, ids)])
+    assert recall > 0.95
+
+    short, short_dists = VectorIndex(vectors[:3], lists=0).search(vectors[0], 5)
+    assert short[0, 3:].tolist() == [-1, -1] and np.isinf(short_dists[0, 3:]).all()
+
+
+def signals(
+    gpu: float, cpu: float, ram: float, paging: float = 0, active: float = 300, disk_ms: float = 5
+) -> SignalSummary:
+    return SignalSummary(
+        gpu_util_p95=gpu,
+        vram_used_p95_pct=10,
+        cpu_util_p95=cpu,
+        ram_used_p95=ram,
+        paging_pressure_minutes=paging,
+        disk_latency_p95_ms=disk_ms,
+        disk_busy_minutes=10 if disk_ms < 80 else 600,
+        disk_queue_p95=0.5 if disk_ms < 80 else 6,
+        thermal_throttle_events=0,
+        active_minutes=active,
+        light_app_mix_factor=1.0,
+        vram_used_p95_mb=1000,
+    )
+
+
+def test_underpowered_and_overprovisioned_devices_swap_when_both_fit() -> None:
+    summaries = {
+        "CRAMPED": signals(gpu=20, cpu=98, ram=97, paging=200),
+        "IDLE-BIG": signals(gpu=5, cpu=10, ram=20, active=30),
+        "IDLE-SMALL": signals(gpu=5, cpu=10, ram=20, active=30),
+        "DISK-BOUND": signals(gpu=20, cpu=50, ram=50, disk_ms=200),
+    }
+    capabilities = DeviceCapabilities(
+        vram_gb=np.array([4.0, 8.0, 4.0, 4.0]),
+        ram_gb=np.array([8.0, 64.0, 8.0, 8.0]),
+        cores=np.array([4.0, 16.0, 4.0, 4.0]),
+    )
+    plain = {r.device_key: r for r in build_recommendations("tenant-a", summaries)}
+    assert [plain[k].action for k in summaries] == [Action.UPSIZE, Action.DOWNSIZE, Action.DOWNSIZE, Action.UPSIZE]
+
+    recs = {r.device_key: r for r in build_recommendations("tenant-a", summaries, capabilities=capabilities)}
+    assert {k for k, r in recs.items() if r.action == Action.REALLOCATE} == {"CRAMPED", "IDLE-BIG"}
+    assert recs["CRAMPED"].top_reasons[-1] == "Swap with IDLE-BIG"
+    assert recs["IDLE-BIG"].top_reasons[-1] == "Swap with CRAMPED"
+    # IDLE-BIG alone would be downsized, but the swap keeps its hardware in the fleet.
+    assert plain["IDLE-BIG"].expected_savings_usd_annual > 0
+    assert recs["IDLE-BIG"].expected_savings_usd_annual == recs["CRAMPED"].expected_savings_usd_annual == 0
+    assert recs["IDLE-SMALL"].expected_savings_usd_annual == 4 * 60 + 8 * 12 + 4 * 42
+    # IDLE-SMALL's hardware would not relieve CRAMPED, and no swap fixes a slow disk.
+    assert (recs["IDLE-SMALL"].action, recs["DISK-BOUND"].action) == (Action.DOWNSIZE, Action.UPSIZE)
+
+
+def test_similar_devices_endpoint(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    client = TestClient(app)
+    store.ingest_telemetry(random_batch(8).model_copy(update={"tenant_id": "tenant-peers"}))
+    fleet = store.fleet_fingerprints("tenant-peers")
+
+    body = client.get("/api/v1/devices/WIN-0/similar", params={"tenant_id": "tenant-peers", "k": 3}).json()
+    assert body["device_key"] == "WIN-0"
+    assert len(body["items"]) == 3 and "WIN-0" not in {item["device_key"] for item in body["items"]}
+    distances = [item["distance"] for item in body["items"]]
+    assert distances == sorted(distances)
+    missing = client.get("/api/v1/devices/NOPE/similar", params={"tenant_id": "tenant-peers"})
+    assert missing.status_code == 404
+
+    store.ingest_telemetry(random_batch(9).model_copy(update={"tenant_id": "tenant-peers"}))
+    assert store.fleet_fingerprints("tenant-peers") is not fleet
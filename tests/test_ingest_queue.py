@@ -0,0 +1,98 @@
+import asyncio
+import time
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.ingest_queue import IngestionQueue, QueueClosedError, QueueFullError
+from app.main import app
+from app.schemas import TelemetryBatchIn
+from app.storage import InMemoryStore, store
+
+
+def test_queue_processes_batches_and_reports_lag(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    local = InMemoryStore()
+    batches = [random_batch(seed, devices=3) for seed in range(5)]
+
+    async def scenario() -> dict:
+        queue = IngestionQueue(local, capacity=10, workers=3)
+        await queue.start()
+        for batch in batches:
+            await queue.submit(batch)
+        assert queue.is_duplicate(batches[0])
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    total = sum(len(b.records) for b in batches)
+    assert stats["processed"] == 5
+    assert stats["records"] == total
+    assert stats["depth"] == 0 and stats["in_flight"] == 0
+    assert stats["max_lag_s"] >= stats["mean_lag_s"] > 0
+    assert local.telemetry.record_count("tenant-a") == total
+
+
+def test_queue_rejects_when_full(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    async def scenario() -> IngestionQueue:
+        queue = IngestionQueue(InMemoryStore(), capacity=1, workers=1)
+        with pytest.raises(QueueClosedError):
+            await queue.submit(random_batch(0, devices=1))
+        await queue.start()
+        await queue.submit(random_batch(1, devices=1))
+        with pytest.raises(QueueFullError):
+            await queue.submit(random_batch(2, devices=1))
+        await queue.stop(drain=False)
+        return queue
+
+    queue = asyncio.run(scenario())
+    assert queue.rejected == 1
+    assert queue.enqueued == 1
+    assert queue.dropped + queue.processed == 1
+
+
+def test_failed_batches_are_logged_and_can_be_resent(
+    random_batch: Callable[..., TelemetryBatchIn], monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    local = InMemoryStore()
+    batch = random_batch(0, devices=2)
+    add_batch = local.rollups.add_batch
+
+    def failing(payload: TelemetryBatchIn) -> int:
+        monkeypatch.setattr(local.rollups, "add_batch", add_batch)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(local.rollups, "add_batch", failing)
+
+    async def scenario() -> dict:
+        queue = IngestionQueue(local, capacity=10, workers=1)
+        await queue.start()
+        await queue.submit(batch)
+        await queue.join()
+        assert not queue.is_duplicate(batch)
+        await queue.submit(batch)
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["failed"] == 1 and stats["last_error"] == "OSError: disk full"
+    assert stats["processed"] == 1 and stats["deduped"] == 0 and stats["records"] == len(batch.records)
+    assert "ingesting batch tenant-a/s/0 failed" in caplog.text
+    assert local.telemetry.record_count("tenant-a") == len(batch.records)
+
+
+def test_async_endpoint_acks_after_enqueue(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    batch = random_batch(31, devices=2).model_copy(update={"tenant_id": "tenant-queue"})
+    body = batch.model_dump(mode="json")
+    with TestClient(app) as client:
+        ack = client.post("/api/v1/ingestion/telemetry-batch/async", json=body)
+        assert ack.status_code == 202
+        assert ack.json()["status"] == "queued"
+        deadline = time.monotonic() + 5
+        while store.telemetry.record_count("tenant-queue") < len(batch.records) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.telemetry.record_count("tenant-queue") == len(batch.records)
+        assert client.post("/api/v1/ingestion/telemetry-batch/async", json=body).json()["deduped"] is True
+        stats = client.get("/api/v1/ingestion/queue").json()
+        assert stats["running"] is True
+        assert stats["processed"] >= 1
@@ -0,0 +1,71 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import INGESTED_RECORDS, STAGE_SECONDS, MetricsRegistry
+from app.profiler import SamplingProfiler
+from app.storage import InMemoryStore
+
+
+def test_registry_renders_prometheus_text_and_skips_updates_when_disabled() -> None:
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("path",))
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    registry.gauge("queue_depth", "Depth.", (), lambda: {(): 3})
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(7.0)
+
+    text = registry.render()
+    assert '# TYPE requests_total counter\nrequests_total{path="/a\\"b"} 3\n' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1\nlatency_seconds_bucket{le="1"} 2\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3\nlatency_seconds_sum 7.55\nlatency_seconds_count 3\n' in text
+    assert "# TYPE queue_depth gauge\nqueue_depth 3\n" in text
+
+    registry.enabled = False
+    requests.inc('/a"b')
+    with latency.time():
+        pass
+    assert requests.value('/a"b') == 3
+    assert latency.count() == 3
+
+
+def test_recommendation_run_stages_and_ingest_counts_are_recorded(random_batch) -> None:
+    store = InMemoryStore()
+    before_records = INGESTED_RECORDS.value()
+    before = {name: STAGE_SECONDS.count(name) for name in ("grouping", "percentiles", "scoring", "models")}
+    accepted, _ = store.ingest_telemetry(random_batch(1))
+    store.ingest_telemetry(random_batch(1))
+    store.generate_recommendations("tenant-a")
+
+    assert INGESTED_RECORDS.value() - before_records == accepted
+    assert all(STAGE_SECONDS.count(name) == count + 1 for name, count in before.items())
+
+
+def test_metrics_endpoint_reports_route_latency_by_template() -> None:
+    client = TestClient(app)
+    client.get("/api/v1/recommendations/does-not-exist")
+    text = client.get("/metrics").text
+
+    route = 'route="/api/v1/recommendations/{recommendation_id}",status="404"'
+    assert f'itam_http_request_duration_seconds_count{{method="GET",{route}}}' in text
+    assert 'itam_store_items{kind="recommendations"}' in text
+    assert "itam_recommendation_stage_seconds" in text
+
+
+def test_sampling_profiler_collects_stacks_while_running() -> None:
+    profiler = SamplingProfiler()
+    assert profiler.start(interval_s=0.001)
+    assert not profiler.start()
+    deadline = time.monotonic() + 0.2
+    while time.monotonic() < deadline:
+        sum(range(1000))
+    assert profiler.stop()
+    assert not profiler.stop()
+
+    status = profiler.status()
+    assert status["samples"] > 0 and not status["running"]
+    assert "test_metrics:test_sampling_profiler_collects_stacks_while_running" in profiler.collapsed()
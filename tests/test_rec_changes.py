@@ -0,0 +1,64 @@
+from dataclasses import replace
+
+from fastapi.testclient import TestClient
+
+from app.main import app, store
+from app.rec_changes import SCORE_TOLERANCE, stable_recommendation_id
+from app.schemas import Action, PolicyCreateIn
+from app.storage import InMemoryStore
+
+
+def test_runs_upsert_in_place_and_record_only_moved_devices(random_batch) -> None:
+    local = InMemoryStore()
+    local.ingest_telemetry(random_batch(5))
+    first = local.generate_recommendations("tenant-a")
+    first_run = local.recommendation_changes.latest("tenant-a")
+    assert first_run.created == len(first) == len(local.recommendations)
+    assert first[0].recommendation_id == stable_recommendation_id("tenant-a", first[0].device_key)
+
+    again = local.generate_recommendations("tenant-a")
+    assert [r is s for r, s in zip(again, first)] == [True] * len(first)
+    assert len(local.recommendations) == len(first)
+    assert local.recommendation_changes_since("tenant-a", None, first_run.run_id)[1] == []
+
+    local.set_recommendation_status(first[0].recommendation_id, "APPROVED")
+    local.set_recommendation_status(first[1].recommendation_id, "APPROVED")
+    nudged = replace(first[0], overprovision_score=first[0].overprovision_score + SCORE_TOLERANCE / 2)
+    moved = replace(first[0], overprovision_score=first[0].overprovision_score + 2 * SCORE_TOLERANCE)
+    other = Action.INVESTIGATE if first[1].action != Action.INVESTIGATE else Action.REFRESH
+    flipped = replace(first[1], action=other, status="PENDING")
+    run, current = local.upsert_recommendations("tenant-a", None, [nudged, flipped])
+    assert (run.created, run.updated) == (0, 1)
+    assert current[0] is first[0]
+    run, current = local.upsert_recommendations("tenant-a", None, [moved, flipped])
+    assert (run.created, run.updated) == (0, 1)
+    assert [r.status for r in current] == ["APPROVED", "PENDING"]
+
+    latest, changed = local.recommendation_changes_since("tenant-a", None, first_run.run_id)
+    assert latest is run
+    assert [r.device_key for r in changed] == [first[1].device_key, first[0].device_key]
+
+    policy = local.create_policy(PolicyCreateIn(tenant_id="tenant-a", name="strict"))
+    simulated, _ = local.simulate_policy("tenant-a", policy)
+    assert {r.policy_id for r in simulated} == {policy.policy_id}
+    assert len(local.recommendations) == 2 * len(first)
+    assert len(local.recommendation_changes_since("tenant-a", policy.policy_id)[1]) == len(simulated)
+
+
+def test_changes_feed_endpoint_syncs_incrementally(random_batch) -> None:
+    client = TestClient(app)
+    store.ingest_telemetry(random_batch(6).model_copy(update={"tenant_id": "tenant-changes"}))
+    recs = store.generate_recommendations("tenant-changes")
+
+    full = client.get("/api/v1/recommendations/changes", params={"tenant_id": "tenant-changes"}).json()
+    assert [item["recommendation_id"] for item in full["items"]] == [r.recommendation_id for r in recs]
+    assert full["run_id"] == store.recommendation_changes.latest("tenant-changes").run_id
+
+    store.generate_recommendations("tenant-changes")
+    params = {"tenant_id": "tenant-changes", "since_run_id": full["run_id"]}
+    delta = client.get("/api/v1/recommendations/changes", params=params).json()
+    assert delta["items"] == []
+    assert delta["run_id"] != full["run_id"]
+
+    params["since_run_id"] = "no-such-run"
+    assert client.get("/api/v1/recommendations/changes", params=params).status_code == 404
@@ -0,0 +1,51 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app, store
+from app.rec_compact import CompactRecommendation, encode_list, stream_json
+from app.schemas import RecommendationListOut
+from app.storage import InMemoryStore
+
+
+def test_compact_encoding_matches_pydantic_and_round_trips(random_batch) -> None:
+    local = InMemoryStore()
+    local.ingest_telemetry(random_batch(3))
+    recs = local.generate_recommendations("tenant-a")
+    assert any(r.risk_flags for r in recs)
+
+    models = [r.to_model() for r in recs]
+    expected = RecommendationListOut(items=models, next_cursor="7").model_dump_json().encode()
+    assert encode_list(recs, "7") == expected
+    assert b"".join(stream_json(recs)) == RecommendationListOut(items=models).model_dump_json().encode()
+
+    restored = [CompactRecommendation.from_model(m) for m in models]
+    assert [r.to_model() for r in restored] == models
+    # Equal flag sets and reason strings are shared between recommendations, not copied.
+    flagged = [r for r in restored if r.risk_flags]
+    assert all(r.risk_flags is flagged[0].risk_flags for r in flagged)
+
+    odd = models[0].model_copy(update={"risk_flags": ["THERMAL", "BATTERY"], "top_reasons": ["hand-written"]})
+    assert CompactRecommendation.from_model(odd).to_model() == odd
+
+
+def test_export_streams_every_match_in_list_order(random_batch) -> None:
+    client = TestClient(app)
+    store.ingest_telemetry(random_batch(4).model_copy(update={"tenant_id": "tenant-export"}))
+    store.generate_recommendations("tenant-export")
+
+    paged = []
+    params = {"tenant_id": "tenant-export", "limit": 7}
+    while True:
+        page = client.get("/api/v1/recommendations", params=params).json()
+        paged.extend(page["items"])
+        if not page["next_cursor"]:
+            break
+        params["cursor"] = page["next_cursor"]
+
+    ndjson = client.get("/api/v1/recommendations/export", params={"tenant_id": "tenant-export"})
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in ndjson.text.splitlines()] == paged
+
+    document = client.get("/api/v1/recommendations/export", params={"tenant_id": "tenant-export", "format": "json"})
+    assert document.json() == {"items": paged, "next_cursor": None}
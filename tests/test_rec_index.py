@@ -0,0 +1,89 @@
+import random
+from datetime import date
+
+from app.rec_index import RecommendationIndex
+from app.schemas import Action, Classification, Recommendation
+
+
+def make_rec(i: int, rng: random.Random) -> Recommendation:
+    return Recommendation(
+        recommendation_id=f"rec-{i}",
+        tenant_id=rng.choice(["tenant-a", "tenant-b"]),
+        device_key=f"WIN-{i}",
+        run_date=date(2026, 2, 20),
+        classification=rng.choice(list(Classification)),
+        action=rng.choice([Action.DOWNSIZE, Action.UPSIZE, Action.EXTEND_LIFE]),
+        confidence=rng.choice([0.7, 0.85, 0.9]),
+        workload_fit_score=50,
+        overprovision_score=50,
+        expected_savings_usd_annual=0,
+        risk_flags=[],
+        top_reasons=[],
+        status="PENDING",
+    )
+
+
+def brute_force(recs: dict[str, Recommendation], tenant_id: str, **filters) -> list[str]:
+    out = []
+    for rec in recs.values():
+        if rec.tenant_id != tenant_id:
+            continue
+        if filters.get("action") and rec.action != filters["action"]:
+            continue
+        if filters.get("classification") and rec.classification != filters["classification"]:
+            continue
+        if filters.get("status") and rec.status != filters["status"]:
+            continue
+        if filters.get("min_confidence") is not None and rec.confidence < filters["min_confidence"]:
+            continue
+        out.append(rec.recommendation_id)
+    return out
+
+
+def test_index_matches_full_scan_after_status_changes() -> None:
+    rng = random.Random(11)
+    index = RecommendationIndex()
+    recs = {}
+    for i in range(500):
+        rec = make_rec(i, rng)
+        recs[rec.recommendation_id] = rec
+        index.add(rec)
+    for rec in rng.sample(list(recs.values()), 100):
+        rec.status = rng.choice(["APPROVED", "OVERRIDDEN"])
+        index.update(rec)
+    removed = rng.sample(list(recs), 20)
+    for rec_id in removed:
+        index.remove(rec_id)
+        del recs[rec_id]
+
+    cases = [
+        {},
+        {"action": "DOWNSIZE"},
+        {"classification": "UNDERPOWERED", "min_confidence": 0.85},
+        {"status": "APPROVED"},
+        {"min_confidence": 0.9},
+        {"action": "UPSIZE", "status": "PENDING", "min_confidence": 0.8},
+    ]
+    for filters in cases:
+        ids, cursor = index.query("tenant-a", **filters)
+        assert ids == brute_force(recs, "tenant-a", **filters)
+        assert cursor is None
+
+
+def test_cursor_pagination_walks_all_results() -> None:
+    rng = random.Random(12)
+    index = RecommendationIndex()
+    recs = {}
+    for i in range(230):
+        rec = make_rec(i, rng)
+        recs[rec.recommendation_id] = rec
+        index.add(rec)
+
+    pages, after = [], None
+    while True:
+        ids, after = index.query("tenant-b", min_confidence=0.85, after=after, limit=25)
+        assert len(ids) <= 25
+        pages.extend(ids)
+        if after is None:
+            break
+    assert pages == brute_force(recs, "tenant-b", min_confidence=0.85)
@@ -0,0 +1,146 @@
+import time
+from dataclasses import asdict
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, store as app_store
+from app.retention import Compactor, RetentionPolicy
+from app.schemas import TelemetryBatchIn
+from app.scoring import SignalSummary
+from app.sqlite_store import SqliteStore
+from app.storage import InMemoryStore
+
+
+def assert_close(got: dict[str, SignalSummary], want: dict[str, SignalSummary]) -> None:
+    """Equal up to the order counters were summed in."""
+    assert set(got) == set(want)
+    for key, summary in got.items():
+        assert asdict(summary) == pytest.approx(asdict(want[key]))
+
+
+def dense_day(random_batch, day: int, devices: int) -> list[TelemetryBatchIn]:
+    """Enough batches on 2026-02-`day` that each device's rollup is worth bounding."""
+    shift = timedelta(days=day - 1)
+    batches = [random_batch(seed, devices=devices) for seed in range(100, 112)]
+    for batch in batches:
+        batch.records = [r.model_copy(update={"observed_at": r.observed_at + shift}) for r in batch.records]
+    return batches
+
+
+def test_compaction_drops_old_raw_samples_and_bounds_old_rollups(random_batch) -> None:
+    store = InMemoryStore(aggregation_backend="numpy")
+    for batch in [random_batch(seed, devices=8, days=10) for seed in range(3)] + dense_day(random_batch, 2, 8):
+        store.ingest_telemetry(batch)
+    raw_before = date(2026, 2, 8)
+    before = store.rollups.summarize("tenant-a")
+    recent = store.rollups.summarize("tenant-a", start=raw_before)
+    records = store.telemetry.record_count("tenant-a")
+    bytes_before = store.telemetry.memory_usage()["total_bytes"]
+    sketch_bytes = store.rollups.sketch_bytes()
+
+    report = Compactor(store, RetentionPolicy(raw_days=3, summary_days=30), devices_per_step=3).run_once()
+    assert report.steps == 3 and report.summaries == 0
+    assert report.raw_records == records - store.telemetry.record_count("tenant-a") > 0
+    assert 0 < report.raw_bytes <= bytes_before - store.telemetry.memory_usage()["total_bytes"]
+    # The dense day past the raw tier keeps bounded sketches. Sparse days, whose few samples take less room
+    # than histogram bins, and the raw tier stay exact.
+    assert report.sketches == 8
+    assert report.sketch_bytes == sketch_bytes - store.rollups.sketch_bytes() > 0
+    assert report.reclaimed_bytes == report.raw_bytes + report.sketch_bytes
+    assert store.rollups.summarize("tenant-a", start=raw_before) == recent
+    for device_key, summary in store.rollups.summarize("tenant-a").items():
+        assert asdict(summary) == pytest.approx(asdict(before[device_key]), rel=0.01, abs=0.5)
+    assert_close(store.windows.summarize("tenant-a", 30), store.rollups.summarize("tenant-a"))
+
+    # The raw backend now summarizes the raw tier, which is exactly the last three days of rollups.
+    assert_close(store.device_signals("tenant-a"), store.windows.summarize("tenant-a", 3))
+    for device_key, series in store.telemetry.devices("tenant-a").items():
+        window = store.rollups.merged("tenant-a", start=date(2026, 2, 8), device_keys=[device_key])[device_key]
+        assert series.app_minutes == window.app_minutes
+    again = Compactor(store, RetentionPolicy(raw_days=3, summary_days=30)).run_once()
+    assert again.raw_records == again.sketches == 0
+
+
+@pytest.fixture
+def tokyo_host(monkeypatch: pytest.MonkeyPatch):
+    """A host zone ahead of UTC, where naive `datetime.timestamp()` would not be UTC."""
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_naive_timestamps_share_the_utc_day_boundary(random_batch, tokyo_host) -> None:
+    store = InMemoryStore(aggregation_backend="numpy")
+    for seed in range(3):
+        batch = random_batch(seed, devices=8, days=10)
+        body = batch.model_dump()
+        for record in body["records"]:
+            record["observed_at"] = record["observed_at"].replace(tzinfo=None)
+        store.ingest_telemetry(TelemetryBatchIn.model_validate(body))
+    assert sorted(store.rollups.devices("tenant-a")["WIN-0"])[0] == date(2026, 2, 1)
+
+    Compactor(store, RetentionPolicy(raw_days=3, summary_days=30)).run_once()
+    assert_close(store.device_signals("tenant-a"), store.windows.summarize("tenant-a", 3))
+    for device_key, series in store.telemetry.devices("tenant-a").items():
+        window = store.rollups.merged("tenant-a", start=date(2026, 2, 8), device_keys=[device_key])[device_key]
+        assert len(series) == window.samples and series.app_minutes == window.app_minutes
+
+
+def test_summary_retention_reaches_windows_and_sqlite(random_batch, tmp_path) -> None:
+    store = SqliteStore(tmp_path / "itam.db")
+    for batch in [random_batch(1, devices=6, days=10), *dense_day(random_batch, 8, 6)]:
+        store.ingest_telemetry(batch)
+    window = store.windows.summarize("tenant-a", 30)
+    summaries = store.rollups.summary_count("tenant-a")
+
+    report = Compactor(store, RetentionPolicy(raw_days=2, summary_days=4)).run_once("tenant-a")
+    assert report.summaries == summaries - store.rollups.summary_count("tenant-a") > 0
+    assert report.summary_bytes > 0 and report.sketches == 6
+    assert all(day >= date(2026, 2, 7) for days in store.rollups.devices("tenant-a").values() for day in days)
+    assert store.rollups.summarize("tenant-a") != window
+    assert_close(store.windows.summarize("tenant-a", 30), store.rollups.summarize("tenant-a"))
+    store.close()
+
+    reopened = SqliteStore(tmp_path / "itam.db")
+    assert reopened.rollups.summary_count("tenant-a") == store.rollups.summary_count("tenant-a")
+    # The bounded sketches of the days past the raw tier were written back.
+    assert reopened.rollups.sketch_bytes() == store.rollups.sketch_bytes()
+    assert_close(reopened.rollups.summarize("tenant-a"), store.rollups.summarize("tenant-a"))
+    reopened.close()
+
+
+def test_background_compaction_survives_a_failing_pass(random_batch, monkeypatch) -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(1, days=3))
+    compact = store.compact_devices
+    calls = []
+
+    def flaky(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError("disk full")
+        return compact(*args)
+
+    monkeypatch.setattr(store, "compact_devices", flaky)
+    compactor = Compactor(store)
+    assert compactor.start(0.001)
+    deadline = time.monotonic() + 10
+    while not compactor.passes and time.monotonic() < deadline:
+        time.sleep(0.001)
+    status = compactor.status()
+    assert compactor.stop()
+    assert status["running"] and status["passes"] >= 1
+    assert status["failed"] == 1 and status["last_error"] == "RuntimeError: disk full"
+
+
+def test_compaction_endpoints(random_batch) -> None:
+    client = TestClient(app)
+    app_store.ingest_telemetry(random_batch(7, days=3).model_copy(update={"tenant_id": "tenant-compaction"}))
+    body = client.post("/api/v1/admin/compaction/run", params={"tenant_id": "tenant-compaction"}).json()
+    assert body["tenants"] == 1 and body["raw_records"] == 0
+    status = client.get("/api/v1/admin/compaction").json()
+    assert status["running"] is False and status["passes"] >= 1 and status["raw_days"] == 14
@@ -0,0 +1,52 @@
+from collections.abc import Callable
+from dataclasses import astuple
+from datetime import date
+
+import pytest
+
+from app.aggregation import summarize_devices
+from app.rollups import DailyRollupStore
+from app.schemas import TelemetryBatchIn
+from app.storage import InMemoryStore
+from app.telemetry_store import TelemetryColumns
+
+
+def test_rollup_signals_match_raw_aggregation(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    columns = TelemetryColumns()
+    rollups = DailyRollupStore()
+    for seed in range(3):
+        batch = random_batch(seed, days=7)
+        columns.append_batch(batch)
+        rollups.add_batch(batch)
+
+    assert rollups.summary_count("tenant-a") > len(columns.devices("tenant-a"))
+    raw = summarize_devices(columns.devices("tenant-a"), backend="python")
+    merged = rollups.summarize("tenant-a")
+    assert list(raw) == list(merged)
+    for device_key, expected in raw.items():
+        assert astuple(merged[device_key]) == pytest.approx(astuple(expected), rel=1e-12)
+
+
+def test_rollups_are_keyed_by_device_and_day(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    rollups = DailyRollupStore()
+    rollups.add_batch(random_batch(1, devices=2, days=3))
+    days = rollups.devices("tenant-a")["WIN-0"]
+    assert set(days) <= {date(2026, 2, 1), date(2026, 2, 2), date(2026, 2, 3)}
+    assert sum(r.samples for r in days.values()) == len(rollups.merged("tenant-a")["WIN-0"].gpu_util)
+
+    first_day = rollups.summarize("tenant-a", start=date(2026, 2, 1), end=date(2026, 2, 1))
+    assert set(first_day) <= {"WIN-0", "WIN-1"}
+
+
+def test_store_recommendations_from_rollups(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    rollup_store = InMemoryStore()
+    raw_store = InMemoryStore(aggregation_backend="numpy")
+    for seed in range(2):
+        rollup_store.ingest_telemetry(random_batch(seed, days=5))
+        raw_store.ingest_telemetry(random_batch(seed, days=5))
+
+    def view(store: InMemoryStore) -> list[tuple]:
+        recs = store.generate_recommendations("tenant-a")
+        return [(r.device_key, r.classification, r.action, r.workload_fit_score) for r in recs]
+
+    assert view(rollup_store) == view(raw_store)
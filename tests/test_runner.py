@@ -0,0 +1,77 @@
+import threading
+from collections.abc import Callable
+
+import pytest
+
+from app.metrics import RECOMMENDATIONS
+from app.runner import RecommendationRunner, shard_devices, shard_of
+from app.schemas import TelemetryBatchIn
+from app.sketches import SketchFactory
+from app.storage import InMemoryStore
+
+
+def test_shards_are_stable_and_cover_all_devices() -> None:
+    keys = [f"WIN-{i}" for i in range(100)]
+    buckets = shard_devices(keys, 7)
+    assert sorted(k for bucket in buckets for k in bucket) == sorted(keys)
+    assert all(shard_of(k, 7) == i for i, bucket in enumerate(buckets) for k in bucket)
+
+
+@pytest.mark.parametrize(
+    ("options", "window_days"),
+    [({}, None), ({}, 30), ({"sketch_mode": "sketch"}, None), ({"aggregation_backend": "numpy"}, None)],
+)
+def test_parallel_run_matches_serial(
+    random_batch: Callable[..., TelemetryBatchIn], options: dict, window_days: int | None
+) -> None:
+    store = InMemoryStore(**options)
+    for seed in range(3):
+        store.ingest_telemetry(random_batch(seed, devices=40, days=3))
+    # One day that retention bounded, so snapshots carry mixed exact and bounded sketches.
+    rollup = next(iter(store.rollups.devices("tenant-a")["WIN-0"].values()))
+    rollup.gpu_util = SketchFactory("sketch").bound("gpu_util", rollup.gpu_util)
+    serial = {r.device_key: r for r in store.generate_recommendations("tenant-a", window_days)}
+
+    runner = RecommendationRunner(store, workers=2, shards=5)
+    try:
+        runner.run("tenant-a", window_days)
+        pool = runner._pool
+        run, recs = runner.run("tenant-a", window_days)
+        assert runner._pool is pool
+    finally:
+        runner.close()
+    assert run.devices == len(serial) == 40
+    assert len(run.shard_timings) == 5
+    assert sum(t.devices for t in run.shard_timings) == 40
+    assert store.recommendation_runs[run.run_id] is run
+    for rec in recs:
+        expected = serial[rec.device_key]
+        assert store.recommendations[rec.recommendation_id] is rec
+        assert (rec.classification, rec.action, rec.workload_fit_score, rec.overprovision_score) == (
+            expected.classification,
+            expected.action,
+            expected.workload_fit_score,
+            expected.overprovision_score,
+        )
+
+
+def test_parallel_run_is_not_blocked_by_locks_other_threads_hold(random_batch) -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(1, devices=20))
+    done = threading.Event()
+
+    def run() -> None:
+        runner = RecommendationRunner(store, workers=2, shards=4)
+        try:
+            runner.run("tenant-a")
+        finally:
+            runner.close()
+        done.set()
+
+    # Workers count their recommendations under this lock; a fork taken while another thread holds it would
+    # hand them a copy that is never released.
+    with RECOMMENDATIONS._lock:
+        runner = threading.Thread(target=run, daemon=True)
+        runner.start()
+        assert done.wait(timeout=30)
+    runner.join()
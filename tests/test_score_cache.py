@@ -0,0 +1,74 @@
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.schemas import PolicyCreateIn, PolicyPatchIn, TelemetryBatchIn
+from app.scoring import DEFAULT_SCORING, ScoringParams
+from app.storage import InMemoryStore
+
+
+def _outcomes(recs: list) -> dict[str, tuple]:
+    return {
+        r.device_key: (r.classification, r.action, r.workload_fit_score, r.overprovision_score) for r in recs
+    }
+
+
+def _one_record(batch_id: str, device_key: str, day: int) -> TelemetryBatchIn:
+    observed_at = datetime(2026, 2, 1, 12, tzinfo=UTC) + timedelta(days=day)
+    record = {
+        "device_key": device_key,
+        "observed_at": observed_at,
+        "session": {"interactive_ratio": 0.5},
+        "gpu": {"util_pct": 99, "vram_used_mb": 100, "active_minutes": 5},
+        "cpu": {"util_pct": 99},
+        "ram": {"used_pct": 99, "paging_pressure": 4},
+        "disk": {"latency_ms": 100, "busy_pct": 100, "queue_len": 6},
+        "network": {"throughput_mbps": 1.0, "loss_proxy": 0.0},
+        "thermal": {"throttle_event": True},
+    }
+    return TelemetryBatchIn(tenant_id="tenant-a", source="s", batch_id=batch_id, sent_at=observed_at, records=[record])
+
+
+def test_policy_thresholds_override_scoring_defaults() -> None:
+    assert ScoringParams.from_thresholds({"gpu_util_high": 85}) is DEFAULT_SCORING
+    assert ScoringParams.from_thresholds({"underpowered_fit": 60}).underpowered_fit == 60
+    with pytest.raises(ValueError):
+        ScoringParams.from_thresholds({"cpu_util_floor": "high"})
+
+
+def test_simulation_reuses_scores_until_inputs_change(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(0, devices=30, days=3))
+    policy = store.create_policy(PolicyCreateIn(tenant_id="tenant-a", name="p", thresholds={"gpu_util_high": 85}))
+
+    recs, report = store.simulate_policy("tenant-a", policy)
+    assert (report.hits, report.misses) == (0, 30)
+    assert _outcomes(recs) == _outcomes(store.generate_recommendations("tenant-a"))
+
+    recs, report = store.simulate_policy("tenant-a", policy)
+    assert (report.hits, report.misses, report.hit_rate) == (30, 0, 1.0)
+    assert report.time_saved_s > 0
+
+    store.ingest_telemetry(_one_record("extra", "WIN-3", day=1))
+    recs, report = store.simulate_policy("tenant-a", policy)
+    assert (report.hits, report.misses) == (29, 1)
+    assert _outcomes(recs) == _outcomes(store.generate_recommendations("tenant-a"))
+
+    patched = store.patch_policy(policy.policy_id, PolicyPatchIn(thresholds={"underpowered_fit": 100}))
+    assert patched.version == 2
+    recs, report = store.simulate_policy("tenant-a", patched)
+    assert (report.hits, report.misses) == (0, 30)
+    assert {r.classification.value for r in recs} == {"UNDERPOWERED"}
+
+
+def test_windowed_simulation_reloads_when_window_moves(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(0, devices=10, days=3))
+    policy = store.create_policy(PolicyCreateIn(tenant_id="tenant-a", name="p"))
+    store.simulate_policy("tenant-a", policy, window_days=2)
+
+    store.ingest_telemetry(_one_record("later", "WIN-0", day=5))
+    recs, report = store.simulate_policy("tenant-a", policy, window_days=2)
+    assert report.hits == 0
+    assert _outcomes(recs) == _outcomes(store.generate_recommendations("tenant-a", window_days=2))
@@ -1,4 +1,15 @@
-from app.scoring import SignalSummary, classify_and_action, compute_scores
+import random
+
+from app.scoring import (
+    ACTIONS,
+    CLASSIFICATIONS,
+    SignalArrays,
+    SignalSummary,
+    classify_and_action,
+    compute_scores,
+    norm,
+    score_batch,
+)
 from app.schemas import Action, Classification
 
 
@@ -40,3 +51,67 @@ def test_overprovisioned_classification() -> None:
     classification, action = classify_and_action(scores)
     assert classification == Classification.OVERPROVISIONED
     assert action == Action.DOWNSIZE
+
+
+def reference_scores(s: SignalSummary) -> dict[str, float]:
+    gpu_pressure = 0.6 * norm(s.gpu_util_p95, 40, 95) + 0.4 * norm(s.vram_used_p95_pct, 50, 98)
+    cpu_pressure = norm(s.cpu_util_p95, 40, 95)
+    ram_pressure = 0.7 * norm(s.ram_used_p95, 60, 98) + 0.3 * norm(s.paging_pressure_minutes, 0, 180)
+    disk_score = (
+        0.5 * norm(s.disk_latency_p95_ms, 10, 80)
+        + 0.3 * norm(s.disk_busy_minutes, 30, 360)
+        + 0.2 * norm(s.disk_queue_p95, 1, 5)
+    )
+    thermal_penalty = norm(float(s.thermal_throttle_events), 0, 15)
+    stress = 0.30 * gpu_pressure + 0.25 * ram_pressure + 0.20 * disk_score + 0.20 * cpu_pressure + 0.05 * thermal_penalty
+    overprov = 100 * (
+        0.35 * (1 - gpu_pressure)
+        + 0.25 * (1 - cpu_pressure)
+        + 0.20 * (1 - ram_pressure)
+        + 0.10 * (1.0 - norm(s.active_minutes, 60, 480))
+        + 0.10 * s.light_app_mix_factor
+    )
+    return {
+        "gpu_pressure": gpu_pressure,
+        "cpu_pressure": cpu_pressure,
+        "ram_pressure": ram_pressure,
+        "disk_score": disk_score,
+        "fit": max(0.0, min(100.0, 100 - (stress * 100))),
+        "overprov": max(0.0, min(100.0, overprov)),
+    }
+
+
+def reference_classify(scores: dict[str, float]) -> tuple[Classification, Action]:
+    critical = max(scores["gpu_pressure"], scores["cpu_pressure"], scores["ram_pressure"], scores["disk_score"])
+    if scores["fit"] < 45 or critical > 0.90:
+        return Classification.UNDERPOWERED, Action.UPSIZE
+    if scores["fit"] > 75 and scores["overprov"] > 65:
+        return Classification.OVERPROVISIONED, Action.DOWNSIZE
+    return Classification.RIGHT_SIZED, Action.EXTEND_LIFE
+
+
+def test_batch_scoring_matches_scalar_formulas() -> None:
+    rng = random.Random(7)
+    summaries = [
+        SignalSummary(
+            gpu_util_p95=rng.choice([40.0, 95.0, rng.uniform(0, 100)]),
+            vram_used_p95_pct=rng.uniform(0, 100),
+            cpu_util_p95=rng.uniform(0, 100),
+            ram_used_p95=rng.uniform(0, 100),
+            paging_pressure_minutes=rng.randint(0, 300),
+            disk_latency_p95_ms=rng.uniform(0, 120),
+            disk_busy_minutes=rng.uniform(0, 500),
+            disk_queue_p95=rng.uniform(0, 8),
+            thermal_throttle_events=rng.randint(0, 20),
+            active_minutes=rng.randint(0, 700),
+            light_app_mix_factor=rng.random(),
+        )
+        for _ in range(2000)
+    ]
+    batch = score_batch(SignalArrays.from_summaries(summaries))
+    for i, s in enumerate(summaries):
+        expected = reference_scores(s)
+        assert {name: float(batch[name][i]) for name in expected} == expected
+        assert compute_scores(s) == expected
+        assert (CLASSIFICATIONS[batch["classification"][i]], ACTIONS[batch["action"][i]]) == reference_classify(expected)
+        assert classify_and_action(expected) == reference_classify(expected)
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.servicenow_export import (
+    ExportError,
+    ImportSetClient,
+    ImportSetTarget,
+    ServiceNowExporter,
+    batches,
+)
+from app.schemas import PolicyCreateIn, PolicyPatchIn
+from app.servicenow_mock import MockImportSet
+from app.storage import InMemoryStore
+
+
+def exporter(store: InMemoryStore, mock: MockImportSet, **options) -> ServiceNowExporter:
+    target = ImportSetTarget(mock.base_url, backoff_s=0.001, **{"max_batch_rows": 10, **options})
+    return ServiceNowExporter(store, target, ImportSetClient(target, sleep=lambda s: None))
+
+
+def test_batches_respect_row_and_byte_bounds() -> None:
+    rows = [json.dumps({"n": i}).encode() for i in range(25)]
+    bodies = list(batches(rows, max_rows=10, max_bytes=60))
+    assert sum(count for _, count in bodies) == 25
+    assert all(count <= 10 and (len(body) <= 60 + 14 or count == 1) for body, count in bodies)
+    assert [r for body, _ in bodies for r in json.loads(body)["records"]] == [{"n": i} for i in range(25)]
+
+
+def test_exports_everything_once_then_only_deltas(random_batch) -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(1, devices=12, days=3))
+    recs = store.generate_recommendations("tenant-a")
+    with MockImportSet() as mock:
+        sync = exporter(store, mock)
+        report = sync.export("tenant-a")
+        assert report.full_sync and report.run_id == store.recommendation_changes.latest("tenant-a").run_id
+        rec_table, summary_table = report.tables
+        assert rec_table.rows == len(recs) == mock.row_counts["u_imp_hw_recommendation"]
+        assert summary_table.rows == store.rollups.summary_count("tenant-a")
+        assert summary_table.rows == mock.row_counts["u_imp_hw_daily_summary"]
+        assert rec_table.batches == 2 and rec_table.wire_bytes < rec_table.raw_bytes
+        assert mock.wire_bytes == sum(t.wire_bytes for t in report.tables)
+        # Batches are posted concurrently, so they may land in any order.
+        assert {r["recommendation_id"] for r in mock.rows["u_imp_hw_recommendation"]} == {
+            r.recommendation_id for r in recs
+        }
+
+        assert sync.export("tenant-a").rows == 0
+        store.ingest_telemetry(random_batch(2, devices=3, days=1))
+        store.generate_recommendations("tenant-a")
+        delta = sync.export("tenant-a")
+        assert not delta.full_sync
+        assert delta.tables[1].rows == 3
+        run = store.recommendation_changes.latest("tenant-a")
+        assert delta.run_id == run.run_id and delta.tables[0].rows == run.created + run.updated
+        sync.close()
+
+
+def test_exports_policy_scopes_separately(random_batch) -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(6, devices=8, days=2))
+    default = store.generate_recommendations("tenant-a")
+    policy = store.create_policy(PolicyCreateIn(tenant_id="tenant-a", name="strict"))
+    scoped, _ = store.simulate_policy("tenant-a", policy)
+    with MockImportSet() as mock:
+        sync = exporter(store, mock)
+        report = sync.export("tenant-a", policy.policy_id)
+        assert report.full_sync and report.policy_id == policy.policy_id
+        assert report.run_id == store.recommendation_changes.latest("tenant-a", policy.policy_id).run_id
+        assert {r["recommendation_id"] for r in mock.rows["u_imp_hw_recommendation"]} == {
+            r.recommendation_id for r in scoped
+        }
+        assert sync.export("tenant-a").tables[0].rows == len(default)
+        assert sync.export("tenant-a", policy.policy_id).rows == 0
+
+        patched = store.patch_policy(policy.policy_id, PolicyPatchIn(thresholds={"gpu_util_ceiling": 50, "cpu_util_ceiling": 50}))
+        store.simulate_policy("tenant-a", patched)
+        run = store.recommendation_changes.latest("tenant-a", policy.policy_id)
+        delta = sync.export("tenant-a", policy.policy_id)
+        assert not delta.full_sync and delta.run_id == run.run_id
+        assert delta.tables[0].rows == run.created + run.updated > 0
+        assert sync.export("tenant-a").rows == 0
+        sync.close()
+
+
+def test_retries_transient_failures_and_keeps_checkpoint_on_failure(random_batch) -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(3, devices=5))
+    store.generate_recommendations("tenant-a")
+    with MockImportSet() as mock:
+        sync = exporter(store, mock, retries=2)
+        mock.fail_next(503, 429)
+        report = sync.export("tenant-a")
+        assert report.tables[0].retries == 2 and mock.row_counts["u_imp_hw_recommendation"] == 5
+
+        store.ingest_telemetry(random_batch(4, devices=2))
+        mock.fail_next(400)
+        with pytest.raises(ExportError, match="HTTP 400"):
+            sync.export("tenant-a")
+        mock.fail_next(503, 503, 503)
+        with pytest.raises(ExportError, match="gave up after 2 retries"):
+            sync.export("tenant-a")
+        assert sync.checkpoints[("tenant-a", None)] == report.run_id
+        assert sync.export("tenant-a").tables[1].rows == 2
+        sync.close()
+
+
+def test_export_endpoint(random_batch, monkeypatch) -> None:
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "servicenow", None)
+    assert client.post("/api/v1/admin/export/servicenow", params={"tenant_id": "tenant-a"}).status_code == 503
+
+    main.store.ingest_telemetry(random_batch(5).model_copy(update={"tenant_id": "tenant-export"}))
+    with MockImportSet() as mock:
+        sync = exporter(main.store, mock)
+        monkeypatch.setattr(main, "servicenow", sync)
+        body = client.post("/api/v1/admin/export/servicenow", params={"tenant_id": "tenant-export"}).json()
+        assert body["full_sync"] and [t["table"] for t in body["tables"]] == [
+            "u_imp_hw_recommendation",
+            "u_imp_hw_daily_summary",
+        ]
+        assert body["tables"][1]["rows"] == main.store.rollups.summary_count("tenant-export")
+        sync.close()
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from app.sketches import ExactQuantiles, LinearHistogram, LogHistogram, SketchFactory, from_bytes, merge_sketches
+
+
+def filled(sketch, values):
+    for v in values:
+        sketch.add(v)
+    return sketch
+
+
+def test_linear_histogram_within_absolute_accuracy() -> None:
+    rng = random.Random(3)
+    values = [rng.uniform(0, 100) for _ in range(5000)]
+    exact = filled(ExactQuantiles(), values)
+    sketch = filled(LinearHistogram(0, 100, accuracy=0.5), values)
+    for q in (0.5, 0.95, 0.99):
+        assert abs(sketch.quantile(q) - exact.quantile(q)) <= 0.5
+
+
+def test_log_histogram_within_relative_accuracy() -> None:
+    rng = random.Random(4)
+    values = [rng.lognormvariate(2, 1.5) for _ in range(5000)] + [0.0] * 50
+    exact = filled(ExactQuantiles(), values)
+    sketch = filled(LogHistogram(relative_accuracy=0.01), values)
+    for q in (0.5, 0.95, 0.99):
+        truth = exact.quantile(q)
+        assert abs(sketch.quantile(q) - truth) <= 0.01 * truth
+
+
+@pytest.mark.parametrize("make", [ExactQuantiles, lambda: LinearHistogram(0, 100, 0.25), LogHistogram])
+def test_merge_and_serialize_round_trip(make) -> None:
+    rng = random.Random(5)
+    left_values = [rng.uniform(0, 100) for _ in range(300)]
+    right_values = [rng.uniform(0, 100) for _ in range(700)]
+    merged = filled(make(), left_values).merge(filled(make(), right_values))
+    whole = filled(make(), left_values + right_values)
+    assert len(merged) == 1000
+    assert merged.quantile(0.95) == whole.quantile(0.95)
+
+    restored = from_bytes(merged.to_bytes())
+    assert type(restored) is type(merged)
+    assert restored.quantile(0.95) == merged.quantile(0.95)
+
+
+@pytest.mark.parametrize("metric", ["gpu_util", "disk_latency"])
+def test_bound_exact_sketches_and_merge_across_kinds(metric) -> None:
+    rng = random.Random(6)
+    old = [rng.uniform(-5, 110) for _ in range(400)] + [0.0] * 10
+    new = [rng.uniform(0, 100) for _ in range(600)]
+    bounded = SketchFactory("exact").bound(metric, filled(ExactQuantiles(), old))
+    assert bounded.to_bytes() == filled(SketchFactory("sketch")(metric), old).to_bytes()
+    assert SketchFactory("exact").bound(metric, bounded) is bounded
+
+    # Exact samples merged with a bounded sketch, either way round, land in the bounded bins.
+    whole = filled(SketchFactory("sketch")(metric), old + new).to_bytes()
+    assert merge_sketches(bounded.empty().merge(bounded), filled(ExactQuantiles(), new)).to_bytes() == whole
+    assert merge_sketches(filled(ExactQuantiles(), new), bounded).to_bytes() == whole
+
+
+def test_mismatched_histograms_do_not_merge() -> None:
+    with pytest.raises(ValueError):
+        LinearHistogram(0, 100, 0.5).merge(LinearHistogram(0, 100, 1.0))
+
+
+def test_factory_modes() -> None:
+    assert isinstance(SketchFactory("exact")("gpu_util"), ExactQuantiles)
+    assert isinstance(SketchFactory("sketch")("gpu_util"), LinearHistogram)
+    assert isinstance(SketchFactory("sketch")("disk_latency"), LogHistogram)
+    with pytest.raises(ValueError):
+        SketchFactory("tdigest")
@@ -0,0 +1,74 @@
+import sqlite3
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import astuple
+from pathlib import Path
+
+import pytest
+
+from app.schemas import PolicyCreateIn, TelemetryBatchIn
+from app.sqlite_store import SqliteStore
+from app.storage import InMemoryStore
+
+
+def assert_same_signals(actual: dict, expected: dict) -> None:
+    assert sorted(actual) == sorted(expected)
+    for device_key, signals in expected.items():
+        assert astuple(actual[device_key]) == pytest.approx(astuple(signals), rel=1e-12)
+
+
+def test_sqlite_store_survives_restart(tmp_path: Path, random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    path = tmp_path / "itam.db"
+    memory = InMemoryStore()
+    store = SqliteStore(path)
+    for seed in range(3):
+        batch = random_batch(seed, days=4)
+        assert store.ingest_telemetry(batch) == memory.ingest_telemetry(batch)
+    assert store.ingest_telemetry(random_batch(0, days=4)) == (0, True)
+    policy = store.create_policy(PolicyCreateIn(tenant_id="tenant-a", name="default"))
+    recs = store.generate_recommendations("tenant-a")
+    store.set_recommendation_status(recs[0].recommendation_id, "APPROVED")
+    store.close()
+
+    reopened = SqliteStore(path)
+    assert reopened.has_batch("tenant-a", "s", "1")
+    assert reopened.ingest_telemetry(random_batch(2, days=4)) == (0, True)
+    assert_same_signals(reopened.device_signals("tenant-a"), memory.device_signals("tenant-a"))
+    assert_same_signals(
+        reopened.device_signals("tenant-a", window_days=2), memory.device_signals("tenant-a", window_days=2)
+    )
+    assert reopened.get_policy(policy.policy_id) == policy
+    assert [r.recommendation_id for r in reopened.query_recommendations("tenant-a")[0]] == [
+        r.recommendation_id for r in recs
+    ]
+    assert reopened.recommendations[recs[0].recommendation_id].status == "APPROVED"
+    assert len(reopened.summary_rows("tenant-a", *sorted(reopened.rollups.devices("tenant-a")["WIN-0"])[::3])) > 0
+    reopened.close()
+
+
+def test_failed_commit_leaves_the_batch_unclaimed(
+    tmp_path: Path, random_batch: Callable[..., TelemetryBatchIn], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = SqliteStore(tmp_path / "itam.db")
+    transaction = store.pool.transaction
+
+    @contextmanager
+    def failing() -> Iterator[sqlite3.Connection]:
+        with transaction() as conn:
+            yield conn
+            raise sqlite3.OperationalError("disk I/O error")
+
+    batch = random_batch(0, days=2)
+    monkeypatch.setattr(store.pool, "transaction", failing)
+    with pytest.raises(sqlite3.OperationalError):
+        store.ingest_telemetry(batch)
+    assert not store.has_batch("tenant-a", "s", "0") and not store.rollups.devices("tenant-a")
+    monkeypatch.undo()
+    assert store.ingest_telemetry(batch) == (len(batch.records), False)
+    store.close()
+
+    memory = InMemoryStore()
+    memory.ingest_telemetry(batch)
+    reopened = SqliteStore(tmp_path / "itam.db")
+    assert_same_signals(reopened.device_signals("tenant-a"), memory.device_signals("tenant-a"))
+    reopened.close()
@@ -0,0 +1,56 @@
+import json
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.schemas import TelemetryBatchIn
+from app.storage import InMemoryStore, store
+from app.streaming import StreamError, ingest_ndjson
+
+client = TestClient(app)
+
+
+def to_ndjson(batch: TelemetryBatchIn) -> list[bytes]:
+    header = batch.model_dump(mode="json", exclude={"records"})
+    lines = [json.dumps(header).encode()]
+    lines.extend(r.model_dump_json().encode() for r in batch.records)
+    return [line + b"\n" for line in lines]
+
+
+def test_stream_endpoint_ingests_and_dedupes(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    batch = random_batch(21, devices=5).model_copy(update={"tenant_id": "tenant-stream"})
+    body = b"".join(to_ndjson(batch))
+
+    first = client.post("/api/v1/ingestion/telemetry-stream", content=body)
+    assert first.status_code == 200
+    assert first.json()["accepted_records"] == len(batch.records)
+    assert store.telemetry.record_count("tenant-stream") == len(batch.records)
+
+    second = client.post("/api/v1/ingestion/telemetry-stream", content=body)
+    assert second.json()["deduped"] is True
+    assert store.telemetry.record_count("tenant-stream") == len(batch.records)
+
+    bad = client.post("/api/v1/ingestion/telemetry-stream", content=b'{"tenant_id": "x"}\n')
+    assert bad.status_code == 422
+    assert bad.json()["detail"]["line"] == 1
+
+
+def test_failed_stream_retry_skips_committed_chunks(random_batch: Callable[..., TelemetryBatchIn]) -> None:
+    local = InMemoryStore()
+    batch = random_batch(22, devices=10)
+    lines = to_ndjson(batch)
+    broken = list(lines)
+    broken[25] = b'{"device_key": "WIN-0"}\n'
+
+    with pytest.raises(StreamError) as excinfo:
+        ingest_ndjson(local, broken, chunk_records=10)
+    assert excinfo.value.line == 26
+    assert excinfo.value.committed == 20
+    assert local.telemetry.record_count("tenant-a") == 20
+
+    retry = ingest_ndjson(local, lines, chunk_records=10)
+    assert retry.accepted == len(batch.records) - 20
+    assert local.telemetry.record_count("tenant-a") == len(batch.records)
+    assert ingest_ndjson(local, lines, chunk_records=10).duplicate
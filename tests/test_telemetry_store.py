@@ -0,0 +1,61 @@
+from datetime import UTC, datetime, timedelta
+
+from app.schemas import TelemetryBatchIn
+from app.storage import InMemoryStore
+from app.telemetry_store import TelemetryColumns
+
+
+def make_batch(batch_id: str, device_keys: list[str], samples: int = 3) -> TelemetryBatchIn:
+    start = datetime(2026, 2, 20, tzinfo=UTC)
+    records = []
+    for device_key in device_keys:
+        for i in range(samples):
+            records.append(
+                {
+                    "device_key": device_key,
+                    "observed_at": start + timedelta(minutes=5 * i),
+                    "session": {"vdi": False, "interactive_ratio": 0.8},
+                    "gpu": {"util_pct": 10 + i, "vram_used_mb": 400, "active_minutes": 2, "compute_pct": None},
+                    "cpu": {"util_pct": 22},
+                    "ram": {"used_pct": 35, "paging_pressure": 1},
+                    "disk": {"latency_ms": 2, "busy_pct": 8, "queue_len": 0.2},
+                    "network": {"throughput_mbps": 5.0, "loss_proxy": 0.0},
+                    "thermal": {"throttle_event": i == 0, "on_battery": True, "docked": False},
+                    "apps": [
+                        {"category": "cad", "active_minutes": 3},
+                        {"category": "BROWSER_HEAVY", "active_minutes": 2},
+                    ],
+                }
+            )
+    return TelemetryBatchIn(
+        tenant_id="tenant-a", source="windows_collector", batch_id=batch_id, sent_at=start, records=records
+    )
+
+
+def test_columns_are_grouped_per_device() -> None:
+    columns = TelemetryColumns()
+    assert columns.append_batch(make_batch("b1", ["WIN-1", "WIN-2"])) == 6
+    columns.append_batch(make_batch("b2", ["WIN-1"], samples=2))
+
+    devices = columns.devices("tenant-a")
+    assert sorted(devices) == ["WIN-1", "WIN-2"]
+    series = devices["WIN-1"]
+    assert len(series) == 5
+    assert list(series.gpu_util) == [10.0, 11.0, 12.0, 10.0, 11.0]
+    assert sum(series.throttle) == 2
+    assert series.app_minutes == {"CAD": 15, "BROWSER_HEAVY": 10}
+    assert series.row(-1).gpu_util == 11.0
+    assert series.row(0).gpu_compute != series.row(0).gpu_compute
+    assert columns.record_count("tenant-a") == 8
+
+
+def test_memory_usage_report() -> None:
+    store = InMemoryStore()
+    store.ingest_telemetry(make_batch("b1", ["WIN-1", "WIN-2"], samples=50))
+    report = store.memory_usage()
+    assert report["tenants"] == 1
+    assert report["devices"] == 2
+    assert report["records"] == 100
+    assert report["column_bytes"] > 0
+    assert report["total_bytes"] == report["column_bytes"] + report["overhead_bytes"]
+    assert len(store.generate_recommendations("tenant-a")) == 2
@@ -0,0 +1,47 @@
+from collections import Counter
+from collections.abc import Callable
+
+import pytest
+
+from app import whatif
+from app.recommend import build_recommendations
+from app.schemas import PolicyCreateIn, TelemetryBatchIn
+from app.scoring import ScoringParams
+from app.storage import InMemoryStore
+
+VARIANTS = [
+    {},
+    {"underpowered_fit": 60},
+    {"overprovisioned_fit": 40, "overprovisioned_score": 40},
+    {"cpu_util_ceiling": 60},
+]
+
+
+def test_variants_match_individual_simulations(
+    random_batch: Callable[..., TelemetryBatchIn], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(whatif, "CHUNK_DEVICES", 7)
+    store = InMemoryStore()
+    store.ingest_telemetry(random_batch(0, devices=30, days=3))
+    policy = store.create_policy(PolicyCreateIn(tenant_id="tenant-a", name="p", thresholds={"critical_pressure": 0.95}))
+
+    device_keys, baseline, outcomes = store.what_if("tenant-a", policy, VARIANTS)
+    assert len(device_keys) == 30 and len(outcomes) == len(VARIANTS)
+    assert store.recommendations == {}
+
+    summaries = store.device_signals("tenant-a")
+    base_params = ScoringParams(critical_pressure=0.95)
+    base = {r.device_key: r for r in build_recommendations("tenant-a", summaries, params=base_params)}
+    counts = Counter(r.classification.value for r in base.values())
+    assert baseline.classification_counts == {c: counts[c] for c in baseline.classification_counts}
+    for thresholds, outcome in zip(VARIANTS, outcomes):
+        params = ScoringParams.from_thresholds({"critical_pressure": 0.95, **thresholds})
+        recs = build_recommendations("tenant-a", summaries, params=params)
+        assert outcome.action_counts == {a: Counter(r.action.value for r in recs)[a] for a in outcome.action_counts}
+        assert outcome.expected_savings_usd_annual == sum(r.expected_savings_usd_annual for r in recs)
+        changed = [r.device_key for r in recs if r.classification != base[r.device_key].classification]
+        assert outcome.changed_devices == len(changed)
+        assert outcome.sample_changed_devices == changed[:10]
+        assert sum(outcome.transitions.values()) == len(changed)
+    assert outcomes[0].changed_devices == 0
+    assert all(outcome.changed_devices for outcome in outcomes[1:])